@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_alter_booking_status_default'),
+        ('contacts', '0020_dedup'),
+        ('organizations', '0005_apikey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['contact', 'created_at', 'id'], name='booking_contact_created_idx'),
+        ),
+    ]
@@ -75,6 +75,7 @@ class Booking(models.Model):
 
     class Meta:
         ordering = ["-start_time"]
+        indexes = [models.Index(fields=["contact", "created_at", "id"], name="booking_contact_created_idx")]
 
     def __str__(self) -> str:
         return f"{self.title} ({self.status})"
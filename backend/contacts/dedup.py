@@ -0,0 +1,441 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from collections import defaultdict
+from itertools import combinations
+from typing import Iterable
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Contact, ContactMerge, DedupJob, DuplicateCandidate, IdentityConflict, Segment
+from .services import IDENTIFIER_FIELDS, LOOKUP_CHUNK_SIZE, normalize_email, normalize_phone, restrictive_status
+
+DEDUP_SCAN_CHUNK_SIZE = int(getattr(settings, "DEDUP_SCAN_CHUNK_SIZE", 5000))
+# blocks larger than this are skipped: they are common names/placeholders, not duplicates
+DEDUP_MAX_BLOCK_SIZE = int(getattr(settings, "DEDUP_MAX_BLOCK_SIZE", 50))
+DEDUP_MIN_SCORE = float(getattr(settings, "DEDUP_MIN_SCORE", 0.6))
+DEDUP_DEFAULT_COUNTRY_CODE = str(getattr(settings, "DEDUP_DEFAULT_COUNTRY_CODE", "")).lstrip("+")
+DEDUP_IGNORED_NAMES = {
+    name.lower() for name in getattr(settings, "DEDUP_IGNORED_NAMES", ["Uploaded Contact", "Imported Contact", "Instagram User"])
+}
+MERGE_BATCH_SIZE = 1000
+# rows a contact may hold once per parent (model label -> parent field); a merge keeps the winner's row
+PER_SCOPE_ROWS = {"messaging.CampaignRecipient": "campaign", "messaging.CampaignUploadContact": "campaign"}
+
+SCAN_FIELDS = ["id", "full_name", *IDENTIFIER_FIELDS]
+# copied as a unit from a merged contact when the winner has no telegram chat
+TELEGRAM_FIELDS = ["telegram_status", "telegram_linked", "telegram_invited", "telegram_onboarded_at", "telegram_last_invite_at"]
+_NON_DIGIT = re.compile(r"\D")
+_NAME_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def email_key(value) -> str:
+    """Lower-cased address with any `+tag` dropped from the local part."""
+    email = normalize_email(value)
+    local, _, domain = email.partition("@")
+    if not domain:
+        return ""
+    return f"{local.split('+', 1)[0]}@{domain}"
+
+
+def phone_key(value) -> str:
+    """E.164-style `+<digits>`; numbers without a country code get DEDUP_DEFAULT_COUNTRY_CODE when set."""
+    phone = normalize_phone(value)
+    digits = _NON_DIGIT.sub("", phone)
+    if len(digits) < 6:
+        return ""
+    if not phone.startswith("+") and DEDUP_DEFAULT_COUNTRY_CODE:
+        digits = DEDUP_DEFAULT_COUNTRY_CODE + digits.lstrip("0")
+    return f"+{digits}"
+
+
+def name_tokens(value) -> list[str]:
+    text = unicodedata.normalize("NFKD", str(value or "")).encode("ascii", "ignore").decode().lower()
+    if text.strip() in DEDUP_IGNORED_NAMES:
+        return []
+    return sorted(_NAME_TOKEN.findall(text))
+
+
+def trigrams(tokens: list[str]) -> set[str]:
+    """pg_trgm-style trigrams: each word padded with two leading and one trailing space."""
+    grams = set()
+    for token in tokens:
+        padded = f"  {token} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def name_similarity(a: list[str], b: list[str]) -> float:
+    ga, gb = trigrams(a), trigrams(b)
+    if not ga or not gb:
+        return 0.0
+    return len(ga & gb) / len(ga | gb)
+
+
+def blocking_keys(full_name, email, phone) -> list[str]:
+    """
+    Keys that put likely duplicates in the same block: normalized email, E.164 phone, and for
+    names one key per word paired with the other words' initials ("smith|j" for both "Jon Smith"
+    and "John Smith"), so spelling variants of one word still meet.
+    """
+    keys = []
+    if email_key(email):
+        keys.append(f"e:{email_key(email)}")
+    if phone_key(phone):
+        keys.append(f"p:{phone_key(phone)}")
+    tokens = name_tokens(full_name)
+    for i, token in enumerate(tokens):
+        if len(token) < 2:
+            continue
+        initials = "".join(sorted(other[0] for j, other in enumerate(tokens) if j != i))
+        keys.append(f"n:{token}|{initials}")
+    return keys
+
+
+def score_pair(a: dict, b: dict) -> tuple[float, list[str]]:
+    """
+    0..1 likelihood that two contacts are the same person, with the matching signals.
+    A shared identifier is near-certain; otherwise the name trigram similarity decides, nudged up
+    when the identifiers complement each other (email on one row, WhatsApp on the other) and
+    down for each identifier that both rows hold with different values.
+    """
+    shared, conflicts = [], 0
+    for field in IDENTIFIER_FIELDS:
+        normalize = email_key if field == "email" else phone_key if field == "phone_whatsapp" else str
+        va = normalize(a[field]) if a[field] else ""
+        vb = normalize(b[field]) if b[field] else ""
+        if va and vb:
+            if va == vb:
+                shared.append(field)
+            else:
+                conflicts += 1
+    similarity = name_similarity(name_tokens(a["full_name"]), name_tokens(b["full_name"]))
+    if shared:
+        score = 0.9 + 0.1 * similarity
+    else:
+        score = 0.8 * similarity + (0.1 if not conflicts else -0.3 * conflicts)
+    reasons = shared + (["name"] if similarity >= 0.5 else [])
+    return round(min(max(score, 0.0), 1.0), 4), reasons
+
+
+def _fetch(org, ids: Iterable[int]) -> dict[int, dict]:
+    ids = sorted(ids)
+    records = {}
+    for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+        chunk = ids[start : start + LOOKUP_CHUNK_SIZE]
+        for row in Contact.objects.filter(organization=org, id__in=chunk).values(*SCAN_FIELDS):
+            records[row["id"]] = row
+    return records
+
+
+def run_dedup(job: DedupJob) -> None:
+    """
+    Blocking scan: one streamed pass builds blocks, only pairs inside a block are scored, and
+    candidates at or above `job.min_score` are stored. IdentityConflict rows also pair the
+    contact with whichever contact already owns the attempted identifier.
+    """
+    org = job.organization
+    blocks: dict[str, list[int]] = defaultdict(list)
+    scanned = 0
+    contacts = Contact.objects.filter(organization=org).order_by().values_list("id", "full_name", "email", "phone_whatsapp")
+    for contact_id, full_name, email, phone in contacts.iterator(chunk_size=DEDUP_SCAN_CHUNK_SIZE):
+        scanned += 1
+        for key in blocking_keys(full_name, email, phone):
+            blocks[key].append(contact_id)
+
+    pairs: set[tuple[int, int]] = set()
+    block_count = 0
+    for ids in blocks.values():
+        if 2 <= len(ids) <= DEDUP_MAX_BLOCK_SIZE:
+            block_count += 1
+            pairs.update(combinations(sorted(set(ids)), 2))
+
+    conflict_pairs: set[tuple[int, int]] = set()
+    conflicts = IdentityConflict.objects.filter(contact__organization=org, field__in=["email", "phone_whatsapp"])
+    for contact_id, field, value in conflicts.values_list("contact_id", "field", "attempted_value").iterator():
+        key = f"e:{email_key(value)}" if field == "email" else f"p:{phone_key(value)}"
+        for owner_id in blocks.get(key, ()):
+            if owner_id != contact_id:
+                conflict_pairs.add((min(contact_id, owner_id), max(contact_id, owner_id)))
+    pairs |= conflict_pairs
+    del blocks
+
+    records = _fetch(org, {cid for pair in pairs for cid in pair})
+    candidates = []
+    for a_id, b_id in pairs:
+        if a_id not in records or b_id not in records:
+            continue
+        score, reasons = score_pair(records[a_id], records[b_id])
+        if (a_id, b_id) in conflict_pairs:
+            score, reasons = max(score, 0.8), reasons + ["identity_conflict"]
+        if score >= job.min_score:
+            candidates.append(DuplicateCandidate(job=job, contact_a_id=a_id, contact_b_id=b_id, score=score, reasons=reasons))
+    DuplicateCandidate.objects.bulk_create(candidates, batch_size=MERGE_BATCH_SIZE)
+
+    job.scanned_count = scanned
+    job.block_count = block_count
+    job.pair_count = len(pairs)
+    job.candidate_count = len(candidates)
+    job.status = DedupJob.STATUS_COMPLETED
+    job.completed_at = timezone.now()
+    job.save(update_fields=["scanned_count", "block_count", "pair_count", "candidate_count", "status", "completed_at"])
+
+
+def clusters_from_pairs(pairs: Iterable[tuple[int, int]]) -> list[list[int]]:
+    """Union-find over candidate pairs so a~b and b~c merge as one cluster."""
+    parent: dict[int, int] = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    groups: dict[int, list[int]] = defaultdict(list)
+    for node in parent:
+        groups[find(node)].append(node)
+    return [sorted(members) for members in groups.values() if len(members) > 1]
+
+
+def pick_winner(contacts: list[Contact]) -> Contact:
+    """The contact with the most identifiers, then the oldest."""
+    return max(contacts, key=lambda c: (sum(1 for f in IDENTIFIER_FIELDS if getattr(c, f)), -c.id))
+
+
+def _merged_values(winner: Contact, losers: list[Contact]) -> list[str]:
+    """Fold `losers` into `winner` in memory; returns the fields that changed."""
+    changed = set()
+
+    def _set(field, value):
+        if getattr(winner, field) != value:
+            setattr(winner, field, value)
+            changed.add(field)
+
+    for loser in losers:
+        for field in IDENTIFIER_FIELDS:
+            if not getattr(winner, field) and getattr(loser, field):
+                _set(field, getattr(loser, field))
+                if field == "telegram_chat_id":
+                    for tg_field in TELEGRAM_FIELDS:
+                        _set(tg_field, getattr(loser, tg_field))
+        if not winner.full_name.strip() or winner.full_name.lower() in DEDUP_IGNORED_NAMES:
+            if loser.full_name.strip() and loser.full_name.lower() not in DEDUP_IGNORED_NAMES:
+                _set("full_name", loser.full_name)
+        for flag in ["whatsapp_opt_in", "whatsapp_blocked", "instagram_opt_in", "instagram_blocked"]:
+            _set(flag, getattr(winner, flag) or getattr(loser, flag))
+        for stamp in ["last_inbound_at", "last_outbound_at", "instagram_last_inbound_at", "instagram_last_outbound_at"]:
+            values = [v for v in (getattr(winner, stamp), getattr(loser, stamp)) if v]
+            _set(stamp, max(values) if values else None)
+        # most restrictive status wins so a merge can never re-subscribe someone
+        _set("status", restrictive_status(winner.status, loser.status))
+        for field in ["tags", "segments"]:
+            ours, theirs = getattr(winner, field), getattr(loser, field)
+            if isinstance(ours, list) and isinstance(theirs, list):
+                _set(field, ours + [item for item in theirs if item not in ours])
+        if isinstance(winner.metadata, dict) and isinstance(loser.metadata, dict):
+            _set("metadata", {**loser.metadata, **winner.metadata})
+        if loser.notes and loser.notes not in winner.notes:
+            _set("notes", "\n\n".join(part for part in (winner.notes, loser.notes) if part))
+    return sorted(changed)
+
+
+def _repoint(model, field_name: str, mapping: dict[int, int]) -> None:
+    """Set-based `UPDATE ... SET fk = winner WHERE fk = loser` for every loser in `mapping`."""
+    if not mapping:
+        return
+    if connection.vendor == "postgresql":
+        qn = connection.ops.quote_name
+        column = qn(model._meta.get_field(field_name).column)
+        items = list(mapping.items())
+        with connection.cursor() as cursor:
+            for start in range(0, len(items), MERGE_BATCH_SIZE):
+                batch = items[start : start + MERGE_BATCH_SIZE]
+                values = ", ".join(["(%s, %s)"] * len(batch))
+                cursor.execute(
+                    f"UPDATE {qn(model._meta.db_table)} AS t SET {column} = m.winner "
+                    f"FROM (VALUES {values}) AS m(loser, winner) WHERE t.{column} = m.loser",
+                    [value for pair in batch for value in pair],
+                )
+        return
+    by_winner: dict[int, list[int]] = defaultdict(list)
+    for loser, winner in mapping.items():
+        by_winner[winner].append(loser)
+    for winner, losers in by_winner.items():
+        model._base_manager.filter(**{f"{field_name}__in": losers}).update(**{field_name: winner})
+
+
+def _contact_foreign_keys():
+    """(model, field name) for every foreign key to Contact, including hidden (`related_name="+"`) ones."""
+    for rel in Contact._meta.get_fields(include_hidden=True):
+        # auto-created m2m through tables are carried over by _m2m_tables
+        if rel.one_to_many and rel.auto_created and not rel.related_model._meta.auto_created:
+            yield rel.related_model, rel.field.name
+
+
+def _drop_scoped_duplicates(model, field_name: str, scope_field: str, mapping: dict[int, int]) -> None:
+    """Delete a loser's row when its winner (or an earlier loser) already has one in the same scope."""
+    scope_column = model._meta.get_field(scope_field).attname
+    contact_column = model._meta.get_field(field_name).attname
+    rows = model._base_manager.filter(**{f"{field_name}__in": set(mapping) | set(mapping.values())}).values_list(
+        "pk", scope_column, contact_column
+    )
+    seen, duplicates = set(), []
+    for pk, scope_id, contact_id in sorted(rows, key=lambda row: (row[2] in mapping, row[0])):
+        key = (scope_id, mapping.get(contact_id, contact_id))
+        if key in seen and contact_id in mapping:
+            duplicates.append(pk)
+        seen.add(key)
+    if duplicates:
+        model._base_manager.filter(pk__in=duplicates).delete()
+
+
+def _m2m_tables():
+    """(through model, contact-side field, other-side field, other model) for every m2m touching Contact."""
+    for field in Contact._meta.many_to_many:
+        yield field.remote_field.through, field.m2m_field_name(), field.m2m_reverse_field_name(), field.related_model
+    for rel in Contact._meta.related_objects:
+        if rel.many_to_many:
+            yield rel.through, rel.field.m2m_reverse_field_name(), rel.field.m2m_field_name(), rel.related_model
+
+
+def _recount(model, through, other_field: str, ids: set[int]) -> None:
+    if not ids or not any(f.name == "member_count" for f in model._meta.fields):
+        return
+    counts = through.objects.filter(**{other_field: OuterRef("pk")}).order_by().values(other_field).annotate(n=Count("pk")).values("n")
+    model.objects.filter(id__in=ids).update(member_count=Coalesce(Subquery(counts), 0))
+
+
+def merge_contacts(org, plan: dict[int, list[int]], user=None) -> list[ContactMerge]:
+    """
+    Merge each `{winner_id: [loser_ids]}` entry. Every foreign key to a loser is re-pointed to its
+    winner with one UPDATE per table for the whole plan (conversations are folded into the winner's
+    threads), memberships are carried over, the winners absorb the losers' fields and the losers are deleted.
+    """
+    ids = set(plan) | {loser for losers in plan.values() for loser in losers}
+    with transaction.atomic():
+        contacts = {c.id: c for c in Contact.objects.select_for_update().filter(organization=org, id__in=ids).defer("search_vector")}
+        mapping = {
+            loser: winner
+            for winner, losers in plan.items()
+            if winner in contacts
+            for loser in losers
+            if loser in contacts and loser != winner
+        }
+        if not mapping:
+            return []
+        losers = set(mapping)
+
+        from messaging.conversations import fold_conversations
+        from messaging.models import Conversation
+
+        # conversations are unique per (contact, channel): a plain re-point would collide with the winner's
+        fold_conversations(mapping)
+        for model, field_name in _contact_foreign_keys():
+            if model in (DuplicateCandidate, Conversation):
+                continue
+            scope_field = PER_SCOPE_ROWS.get(model._meta.label)
+            if scope_field:
+                _drop_scoped_duplicates(model, field_name, scope_field, mapping)
+            _repoint(model, field_name, mapping)
+        affected = []
+        for through, contact_field, other_field, other_model in _m2m_tables():
+            rows = through.objects.filter(**{f"{contact_field}__in": losers}).values_list(other_field, contact_field)
+            carried = {(other_id, mapping[contact_id]) for other_id, contact_id in rows}
+            through.objects.bulk_create(
+                [through(**{f"{other_field}_id": other_id, f"{contact_field}_id": winner}) for other_id, winner in carried],
+                batch_size=MERGE_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            affected.append((other_model, through, other_field, {other_id for other_id, _ in carried}))
+
+        # pairs inside a merged cluster are resolved; pairs with outsiders now describe the winner
+        cluster_of = {**mapping, **{winner: winner for winner in set(mapping.values())}}
+        touching = list(
+            DuplicateCandidate.objects.filter(status=DuplicateCandidate.STATUS_PENDING)
+            .filter(Q(contact_a_id__in=losers) | Q(contact_b_id__in=losers))
+            .only("id", "contact_a_id", "contact_b_id")
+        )
+        resolved, moved = [], []
+        for candidate in touching:
+            cluster_a, cluster_b = cluster_of.get(candidate.contact_a_id), cluster_of.get(candidate.contact_b_id)
+            if cluster_a is not None and cluster_a == cluster_b:
+                resolved.append(candidate.id)
+            else:
+                candidate.contact_a_id = mapping.get(candidate.contact_a_id, candidate.contact_a_id)
+                candidate.contact_b_id = mapping.get(candidate.contact_b_id, candidate.contact_b_id)
+                moved.append(candidate)
+        DuplicateCandidate.objects.filter(id__in=resolved).update(status=DuplicateCandidate.STATUS_MERGED)
+        DuplicateCandidate.objects.bulk_update(moved, ["contact_a", "contact_b"], batch_size=MERGE_BATCH_SIZE)
+
+        snapshot_fields = [f.name for f in Contact._meta.concrete_fields if f.name not in ("search_vector", "organization")]
+        snapshots = {row["id"]: row for row in Contact.objects.filter(id__in=losers).values(*snapshot_fields)}
+        winners, records = [], []
+        changed_fields: set[str] = set()
+        for winner_id in {winner for winner in mapping.values()}:
+            winner = contacts[winner_id]
+            merged = sorted(loser for loser, w in mapping.items() if w == winner_id)
+            changed_fields.update(_merged_values(winner, [contacts[loser] for loser in merged]))
+            winners.append(winner)
+            records.append(
+                ContactMerge(
+                    organization=org,
+                    winner=winner,
+                    merged_ids=merged,
+                    snapshot=[snapshots[loser] for loser in merged if loser in snapshots],
+                    merged_by=user if user is not None and user.is_authenticated else None,
+                )
+            )
+
+        Contact.objects.filter(id__in=losers).delete()
+        if changed_fields:
+            Contact.objects.bulk_update(winners, sorted(changed_fields | {"updated_at"}), batch_size=MERGE_BATCH_SIZE)
+        for other_model, through, other_field, other_ids in affected:
+            _recount(other_model, through, other_field, other_ids)
+        merges = ContactMerge.objects.bulk_create(records)
+
+    from .tasks import refresh_segment
+
+    for segment_id in Segment.objects.filter(organization=org, materialized=True).values_list("id", flat=True):
+        transaction.on_commit(lambda segment_id=segment_id: refresh_segment.delay(segment_id))
+    return merges
+
+
+def merge_candidates(job: DedupJob, candidate_ids: Iterable[int] | None = None, min_score: float | None = None, user=None) -> int:
+    """Merge pending candidates of `job` (by id, or all at/above `min_score`) cluster by cluster; returns contacts removed."""
+    candidates = job.candidates.filter(status=DuplicateCandidate.STATUS_PENDING, contact_a__isnull=False, contact_b__isnull=False)
+    if candidate_ids is not None:
+        candidates = candidates.filter(id__in=list(candidate_ids))
+    if min_score is not None:
+        candidates = candidates.filter(score__gte=min_score)
+    clusters = clusters_from_pairs(candidates.values_list("contact_a_id", "contact_b_id"))
+    removed = 0
+    for start in range(0, len(clusters), MERGE_BATCH_SIZE):
+        batch = clusters[start : start + MERGE_BATCH_SIZE]
+        contacts = {
+            c.id: c
+            for c in Contact.objects.filter(organization=job.organization, id__in=[cid for cluster in batch for cid in cluster]).only(
+                "id", *IDENTIFIER_FIELDS
+            )
+        }
+        plan = {}
+        for cluster in batch:
+            members = [contacts[cid] for cid in cluster if cid in contacts]
+            if len(members) < 2:
+                continue
+            winner = pick_winner(members)
+            plan[winner.id] = [c.id for c in members if c.id != winner.id]
+        merges = merge_contacts(job.organization, plan, user=user)
+        removed += sum(len(merge.merged_ids) for merge in merges)
+    if removed:
+        DedupJob.objects.filter(pk=job.pk).update(merged_count=F("merged_count") + removed)
+    return removed
@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import tempfile
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.validators import validate_email
+from django.db import IntegrityError, connection, models, transaction
+from django.utils import timezone
+
+from .models import Contact, ContactGroup, ContactImportJob
+from .segments import queue_org_refresh
+from .services import (
+    IDENTIFIER_FIELDS,
+    STATUS_PRECEDENCE,
+    add_group_members,
+    match_contact,
+    normalize_email,
+    normalize_phone,
+    resolve_identifiers,
+    restrictive_status,
+)
+
+IMPORT_CHUNK_SIZE = int(getattr(settings, "CONTACT_IMPORT_CHUNK_SIZE", 2000))
+IMPORT_DEFAULT_NAME = "Imported Contact"
+STAGE_COLUMNS = ["row_no", "contact_id", "full_name", *IDENTIFIER_FIELDS, "status", "tags", "notes", "metadata"]
+_ALIASES = {
+    "name": "full_name",
+    "phone": "phone_whatsapp",
+    "whatsapp": "phone_whatsapp",
+    "telegram": "telegram_chat_id",
+    "instagram": "instagram_user_id",
+}
+_STATUSES = {value for value, _ in Contact.STATUS_CHOICES}
+_TAG_SEPARATORS = ("|", ";")
+
+
+@dataclass
+class ChunkResult:
+    rows: list[dict] = field(default_factory=list)
+    # (row number, message, raw record) for the error report
+    errors: list[tuple[int, str, dict | None]] = field(default_factory=list)
+
+
+def iter_records(fileobj, fmt: str) -> Iterator[tuple[int, dict | None, str]]:
+    """Yield (row number, record, parse error) from a binary file object, one line at a time."""
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    if fmt == ContactImportJob.FORMAT_CSV:
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record, ""
+        return
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, None, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(record, dict):
+            yield number, None, "Line is not a JSON object"
+            continue
+        yield number, record, ""
+
+
+def count_lines(fileobj) -> int:
+    """Cheap row estimate for progress reporting (binary newline count)."""
+    total = 0
+    for block in iter(lambda: fileobj.read(1 << 20), b""):
+        total += block.count(b"\n")
+    fileobj.seek(0)
+    return total
+
+
+def _chunked(iterable: Iterable, size: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _parse_tags(value) -> list[str]:
+    if isinstance(value, list):
+        return [str(tag).strip() for tag in value if str(tag).strip()]
+    text = str(value or "")
+    for separator in _TAG_SEPARATORS[1:]:
+        text = text.replace(separator, _TAG_SEPARATORS[0])
+    return [tag.strip() for tag in text.split(_TAG_SEPARATORS[0]) if tag.strip()]
+
+
+def _parse_metadata(value) -> dict:
+    if isinstance(value, dict):
+        return value
+    if not value:
+        return {}
+    parsed = json.loads(value)
+    if not isinstance(parsed, dict):
+        raise ValueError("metadata must be a JSON object")
+    return parsed
+
+
+def normalize_chunk(records: list[tuple[int, dict | None, str]]) -> ChunkResult:
+    """
+    Normalize and validate a chunk column by column.
+    Rows that fail any check go to the error report; the rest come back in canonical form.
+    """
+    result = ChunkResult()
+    numbers, raws = [], []
+    for number, record, error in records:
+        if error:
+            result.errors.append((number, error, record))
+            continue
+        numbers.append(number)
+        raws.append({_ALIASES.get(str(k).strip().lower(), str(k).strip().lower()): v for k, v in record.items() if k})
+
+    names = [str(r.get("full_name") or "").strip()[:255] for r in raws]
+    emails = [normalize_email(r.get("email")) for r in raws]
+    phones = [normalize_phone(r.get("phone_whatsapp")) for r in raws]
+    others = {f: [str(r.get(f) or "").strip() for r in raws] for f in IDENTIFIER_FIELDS[2:]}
+    statuses = [str(r.get("status") or "").strip().lower() for r in raws]
+    notes = [str(r.get("notes") or "") for r in raws]
+
+    errors: list[str | None] = [None] * len(raws)
+    for i, email in enumerate(emails):
+        if email:
+            try:
+                validate_email(email)
+            except ValidationError:
+                errors[i] = f"Invalid email: {email}"
+    for i, phone in enumerate(phones):
+        if phone and errors[i] is None and (len(phone) > 32 or not phone.lstrip("+").isdigit()):
+            errors[i] = f"Invalid phone: {phone}"
+    for i, status in enumerate(statuses):
+        if status and errors[i] is None and status not in _STATUSES:
+            errors[i] = f"Invalid status: {status}"
+    for i in range(len(raws)):
+        if errors[i] is None and not (emails[i] or phones[i] or any(col[i] for col in others.values())):
+            errors[i] = "Row has no identifier (email, phone, telegram or instagram id)"
+
+    for i, raw in enumerate(raws):
+        if errors[i] is None:
+            try:
+                tags = _parse_tags(raw.get("tags"))
+                metadata = _parse_metadata(raw.get("metadata"))
+            except ValueError as exc:
+                errors[i] = f"Invalid metadata: {exc}"
+        if errors[i] is not None:
+            result.errors.append((numbers[i], errors[i], raw))
+            continue
+        result.rows.append(
+            {
+                "row_no": numbers[i],
+                "contact_id": None,
+                "full_name": names[i],
+                "email": emails[i],
+                "phone_whatsapp": phones[i],
+                **{f: col[i] for f, col in others.items()},
+                "status": statuses[i],
+                "tags": tags,
+                "notes": notes[i],
+                "metadata": metadata,
+            }
+        )
+    return result
+
+
+def resolve_identities(org, chunk: ChunkResult) -> None:
+    """
+    Match rows to existing contacts with the same rule as campaign uploads (services.match_contact),
+    flagging rows that repeat an identifier already seen in the chunk. Identifiers that belong to a
+    different contact than the one a row resolved to are dropped from the row rather than moved.
+    """
+    existing = resolve_identifiers(org, chunk.rows)
+
+    def _report(row: dict) -> dict:
+        return {k: v for k, v in row.items() if k not in ("row_no", "contact_id")}
+
+    seen: dict[tuple[str, str], int] = {}
+    kept = []
+    for row in chunk.rows:
+        keys = [(f, row[f]) for f in IDENTIFIER_FIELDS if row[f]]
+        duplicate = next((seen[key] for key in keys if key in seen), None)
+        if duplicate is not None:
+            chunk.errors.append((row["row_no"], f"Duplicate of row {duplicate}", _report(row)))
+            continue
+        contact_id, matches = match_contact(existing, row)
+        if len(matches) > 1:
+            for f, value in keys:
+                if existing[f].get(value, contact_id) != contact_id:
+                    row[f] = ""
+        row["contact_id"] = contact_id
+        for key in keys:
+            seen[key] = row["row_no"]
+        kept.append(row)
+    chunk.rows = kept
+
+
+def _default_columns(explicit: set[str]) -> list[tuple[str, object]]:
+    """Column/value pairs for Contact fields the import does not set (model defaults, DB-ready)."""
+    columns = []
+    for model_field in Contact._meta.concrete_fields:
+        if model_field.primary_key or model_field.column in explicit:
+            continue
+        columns.append((model_field.column, model_field.get_db_prep_save(model_field.get_default(), connection)))
+    return columns
+
+
+def _unloaded(rows: list[dict], loaded: list[tuple]) -> list[dict]:
+    """New rows none of whose identifiers are among the `loaded` (id, *IDENTIFIER_FIELDS) rows: they lost a conflict."""
+    seen = {(f, value) for row in loaded for f, value in zip(IDENTIFIER_FIELDS, row[1:]) if value}
+    return [
+        row
+        for row in rows
+        if row["contact_id"] is None and not any((f, row[f]) in seen for f in IDENTIFIER_FIELDS if row[f])
+    ]
+
+
+def _copy_load(org, rows: list[dict], now) -> tuple[list[int], int, list[dict]]:
+    """
+    Postgres path: COPY the chunk into a temp staging table, then one INSERT ... ON CONFLICT DO NOTHING
+    for new contacts and one UPDATE ... FROM for matched ones.
+    Returns (inserted ids, updated count, new rows skipped by a conflict).
+    """
+    qn = connection.ops.quote_name
+    table = qn(Contact._meta.db_table)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(
+            [
+                json.dumps(row[col]) if col in ("tags", "metadata") else ("" if row[col] is None else row[col])
+                for col in STAGE_COLUMNS
+            ]
+        )
+    buffer.seek(0)
+
+    identifiers = ", ".join(f"{f} text" for f in IDENTIFIER_FIELDS)
+    explicit = {"organization_id", "full_name", *IDENTIFIER_FIELDS, "status", "tags", "notes", "metadata", "created_at", "updated_at"}
+    defaults = _default_columns(explicit)
+    insert_columns = ["organization_id", "full_name", *IDENTIFIER_FIELDS, "status", "tags", "notes", "metadata", "created_at", "updated_at"]
+    insert_columns += [column for column, _ in defaults]
+    select = ["%s", "COALESCE(NULLIF(s.full_name, ''), %s)", *[f"NULLIF(s.{f}, '')" for f in IDENTIFIER_FIELDS]]
+    select += ["COALESCE(NULLIF(s.status, ''), %s)", "s.tags", "COALESCE(s.notes, '')", "s.metadata", "%s", "%s"]
+    select += ["%s"] * len(defaults)
+    insert_params = [org.id, IMPORT_DEFAULT_NAME, Contact.STATUS_ACTIVE, now, now, *[value for _, value in defaults]]
+    # provided values replace name/notes; identifiers only fill blanks so a match never re-keys a contact
+    assignments = [f"{qn(f)} = COALESCE(NULLIF(s.{f}, ''), c.{qn(f)})" for f in ["full_name", "notes"]]
+    assignments += [f"{qn(f)} = COALESCE(NULLIF(c.{qn(f)}, ''), NULLIF(s.{f}, ''))" for f in IDENTIFIER_FIELDS]
+    # status only ever becomes more restrictive: a CSV saying "active" must not re-subscribe anyone
+    assignments.append(
+        "status = CASE WHEN array_position(%s::text[], s.status) < array_position(%s::text[], c.status) "
+        "THEN s.status ELSE c.status END"
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE contact_import_stage (row_no integer, contact_id bigint, full_name text, {identifiers}, "
+            "status text, tags jsonb, notes text, metadata jsonb) ON COMMIT DROP"
+        )
+        cursor.copy_expert(f"COPY contact_import_stage ({', '.join(STAGE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(qn(c) for c in insert_columns)}) "
+            f"SELECT {', '.join(select)} FROM contact_import_stage s WHERE s.contact_id IS NULL "
+            f"ON CONFLICT DO NOTHING RETURNING id, {', '.join(qn(f) for f in IDENTIFIER_FIELDS)}",
+            insert_params,
+        )
+        loaded = cursor.fetchall()
+        inserted = [row[0] for row in loaded]
+        cursor.execute(
+            f"UPDATE {table} AS c SET {', '.join(assignments)}, "
+            "tags = (SELECT COALESCE(jsonb_agg(DISTINCT t), '[]'::jsonb) FROM jsonb_array_elements("
+            "CASE WHEN jsonb_typeof(c.tags) = 'array' THEN c.tags ELSE '[]'::jsonb END || s.tags) AS t), "
+            "metadata = CASE WHEN jsonb_typeof(c.metadata) = 'object' THEN c.metadata ELSE '{}'::jsonb END || s.metadata, "
+            "updated_at = %s "
+            "FROM contact_import_stage s WHERE s.contact_id IS NOT NULL AND c.id = s.contact_id AND c.organization_id = %s",
+            [STATUS_PRECEDENCE, STATUS_PRECEDENCE, now, org.id],
+        )
+        updated = max(cursor.rowcount, 0)
+    return inserted, updated, _unloaded(rows, loaded)
+
+
+def _orm_load(org, rows: list[dict], now) -> tuple[list[int], int, list[dict]]:
+    """Portable path (SQLite in tests): bulk_create(ignore_conflicts) + bulk_update, same rules as _copy_load."""
+    new_rows = [row for row in rows if row["contact_id"] is None]
+    Contact.objects.bulk_create(
+        [
+            Contact(
+                organization=org,
+                full_name=row["full_name"] or IMPORT_DEFAULT_NAME,
+                **{f: row[f] or None for f in IDENTIFIER_FIELDS},
+                status=row["status"] or Contact.STATUS_ACTIVE,
+                tags=row["tags"],
+                notes=row["notes"],
+                metadata=row["metadata"],
+            )
+            for row in new_rows
+        ],
+        ignore_conflicts=True,
+    )
+    loaded: dict[int, tuple] = {}
+    for field_name in IDENTIFIER_FIELDS:
+        values = [row[field_name] for row in new_rows if row[field_name]]
+        if values:
+            created = Contact.objects.filter(organization=org, created_at__gte=now, **{f"{field_name}__in": values})
+            loaded.update((row[0], row) for row in created.values_list("id", *IDENTIFIER_FIELDS))
+
+    matched = {row["contact_id"]: row for row in rows if row["contact_id"] is not None}
+    contacts = list(Contact.objects.filter(organization=org, id__in=list(matched)))
+    for contact in contacts:
+        row = matched[contact.id]
+        for f in ["full_name", "notes"]:
+            if row[f]:
+                setattr(contact, f, row[f])
+        contact.status = restrictive_status(contact.status, row["status"])
+        for f in IDENTIFIER_FIELDS:
+            if row[f] and not getattr(contact, f):
+                setattr(contact, f, row[f])
+        contact.tags = list(dict.fromkeys([*(contact.tags if isinstance(contact.tags, list) else []), *row["tags"]]))
+        contact.metadata = {**(contact.metadata if isinstance(contact.metadata, dict) else {}), **row["metadata"]}
+        contact.updated_at = now
+    Contact.objects.bulk_update(contacts, ["full_name", *IDENTIFIER_FIELDS, "status", "notes", "tags", "metadata", "updated_at"])
+    return list(loaded), len(contacts), _unloaded(rows, list(loaded.values()))
+
+
+def load_chunk(org, rows: list[dict], group: ContactGroup | None = None) -> tuple[int, int, list[dict]]:
+    """
+    Write one resolved chunk atomically; returns (created, updated, skipped) where skipped are new
+    rows whose identifiers were taken by a concurrent write between resolve and insert.
+    """
+    if not rows:
+        return 0, 0, []
+    now = timezone.now()
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            inserted, updated, skipped = _copy_load(org, rows, now)
+        else:
+            inserted, updated, skipped = _orm_load(org, rows, now)
+        if group is not None:
+            member_ids = set(inserted) | {row["contact_id"] for row in rows if row["contact_id"]}
+            add_group_members(group, Contact.objects.filter(id__in=member_ids))
+    return len(inserted), updated, skipped
+
+
+def run_import(job: ContactImportJob) -> None:
+    """Stream the job's file in chunks: normalize -> resolve -> load, reporting progress after each chunk."""
+    org = job.organization
+    report = tempfile.SpooledTemporaryFile(max_size=1 << 20, mode="w+", newline="")
+    report_writer = csv.writer(report)
+    report_writer.writerow(["row", "error", "data"])
+    errors = loaded = 0
+    with job.file.open("rb") as fh:
+        estimate = count_lines(fh)
+        ContactImportJob.objects.filter(pk=job.pk).update(
+            total_rows=max(estimate - (1 if job.format == ContactImportJob.FORMAT_CSV else 0), 0)
+        )
+        processed = 0
+        for records in _chunked(iter_records(fh, job.format), IMPORT_CHUNK_SIZE):
+            chunk = normalize_chunk(records)
+            resolve_identities(org, chunk)
+            try:
+                created, updated, skipped = load_chunk(org, chunk.rows, job.group)
+            except IntegrityError as exc:
+                # a concurrent write took one of the identifiers; report the chunk rather than abort the job
+                chunk.errors.extend((row["row_no"], f"Conflict while loading: {exc}", row) for row in chunk.rows)
+                created = updated = 0
+                skipped = []
+            chunk.errors.extend(
+                (row["row_no"], "Not imported: identifier taken by a concurrent change", row) for row in skipped
+            )
+            for number, message, raw in sorted(chunk.errors, key=lambda e: e[0]):
+                report_writer.writerow([number, message, json.dumps(raw, default=str) if raw is not None else ""])
+            errors += len(chunk.errors)
+            loaded += created + updated
+            processed += len(records)
+            ContactImportJob.objects.filter(pk=job.pk).update(
+                processed_rows=processed,
+                created_count=models.F("created_count") + created,
+                updated_count=models.F("updated_count") + updated,
+                error_count=errors,
+            )
+    if loaded:
+        # the chunks are written without post_save, so segments are re-evaluated once for the whole file
+        queue_org_refresh(org.id)
+    job.refresh_from_db()
+    job.total_rows = processed
+    if errors:
+        report.seek(0)
+        job.error_report.save(f"import-{job.id}-errors.csv", File(report), save=False)
+    report.close()
+    job.status = ContactImportJob.STATUS_COMPLETED
+    job.completed_at = timezone.now()
+    job.save(update_fields=["total_rows", "error_report", "status", "completed_at", "updated_at"])
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:51
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE OR REPLACE FUNCTION contacts_contact_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.full_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.notes, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS contacts_contact_search_vector_trg ON contacts_contact;
+CREATE TRIGGER contacts_contact_search_vector_trg
+    BEFORE INSERT OR UPDATE OF full_name, notes ON contacts_contact
+    FOR EACH ROW EXECUTE FUNCTION contacts_contact_search_vector();
+
+UPDATE contacts_contact SET
+    search_vector = setweight(to_tsvector('simple', coalesce(full_name, '')), 'A') ||
+                    setweight(to_tsvector('simple', coalesce(notes, '')), 'C');
+
+CREATE INDEX IF NOT EXISTS contact_search_vector_gin ON contacts_contact USING gin (search_vector);
+-- expression matches Django's icontains SQL: UPPER(col::text) LIKE UPPER(pattern)
+CREATE INDEX IF NOT EXISTS contact_email_trgm ON contacts_contact USING gin (UPPER(email::text) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS contact_phone_trgm ON contacts_contact USING gin (UPPER(phone_whatsapp::text) gin_trgm_ops);
+"""
+
+REVERSE_SQL = """
+DROP INDEX IF EXISTS contact_phone_trgm;
+DROP INDEX IF EXISTS contact_email_trgm;
+DROP INDEX IF EXISTS contact_search_vector_gin;
+DROP TRIGGER IF EXISTS contacts_contact_search_vector_trg ON contacts_contact;
+DROP FUNCTION IF EXISTS contacts_contact_search_vector();
+"""
+
+
+def install_search(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(SEARCH_SQL)
+
+
+def remove_search(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(REVERSE_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0015_remove_contact_uniq_contact_email_per_org_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(install_search, remove_search),
+    ]
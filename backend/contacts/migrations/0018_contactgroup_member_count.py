@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:57
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_member_count(apps, schema_editor):
+    Contact = apps.get_model("contacts", "Contact")
+    ContactGroup = apps.get_model("contacts", "ContactGroup")
+    Through = Contact.groups.through
+    count = (
+        Through.objects.filter(contactgroup_id=models.OuterRef("pk"))
+        .order_by()
+        .values("contactgroup_id")
+        .annotate(n=models.Count("id"))
+        .values("n")
+    )
+    ContactGroup.objects.update(member_count=Coalesce(models.Subquery(count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0017_contact_import_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactgroup',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_member_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# segment rules compile tag/metadata conditions to jsonb containment (@>), which these serve
+INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS contact_tags_gin ON contacts_contact USING gin (tags jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS contact_metadata_gin ON contacts_contact USING gin (metadata jsonb_path_ops);
+"""
+
+REVERSE_SQL = """
+DROP INDEX IF EXISTS contact_metadata_gin;
+DROP INDEX IF EXISTS contact_tags_gin;
+"""
+
+
+def create_json_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(INDEX_SQL)
+
+
+def drop_json_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(REVERSE_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0018_contactgroup_member_count'),
+        ('organizations', '0005_apikey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Segment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('rules', models.JSONField(default=dict)),
+                ('materialized', models.BooleanField(default=False)),
+                ('member_count', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('contacts', models.ManyToManyField(blank=True, related_name='materialized_segments', to='contacts.contact')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_segments', to=settings.AUTH_USER_MODEL)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='organizations.organization')),
+            ],
+            options={
+                'ordering': ['name'],
+                'unique_together': {('organization', 'name')},
+            },
+        ),
+        migrations.RunPython(create_json_indexes, drop_json_indexes),
+    ]
@@ -0,0 +1,42 @@
+import re
+
+from django.db import migrations
+
+_PHONE_STRIP = re.compile(r"[\s\-().]")
+
+
+def _phone(value):
+    # frozen copy of contacts.services.normalize_phone at the time of this migration
+    phone = _PHONE_STRIP.sub("", value)
+    if phone.startswith("00"):
+        phone = "+" + phone[2:]
+    return phone
+
+
+def normalize_identifiers(apps, schema_editor):
+    """
+    Rewrite stored emails/phones in the canonical form uploads and imports look up. A value whose
+    canonical form already belongs to another contact in the org is left as is for the dedup scan.
+    """
+    Contact = apps.get_model("contacts", "Contact")
+    for field_name, pattern, normalize in [
+        ("email", r"[A-Z]|^\s|\s$", lambda value: value.strip().lower()),
+        ("phone_whatsapp", r"[\s().-]|^00", _phone),
+    ]:
+        stale = Contact.objects.filter(**{f"{field_name}__regex": pattern}).values_list("id", "organization_id", field_name)
+        for contact_id, organization_id, value in stale.iterator(chunk_size=2000):
+            canonical = normalize(value) or None
+            taken = canonical and Contact.objects.filter(organization_id=organization_id, **{field_name: canonical}).exists()
+            if not taken:
+                Contact.objects.filter(pk=contact_id).update(**{field_name: canonical})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0021_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_identifiers, migrations.RunPython.noop),
+    ]
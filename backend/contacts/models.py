@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import copy
+
+from django.contrib.postgres.search import SearchVectorField
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import validate_email
 from django.db import models
 from django.utils import timezone
@@ -21,6 +25,8 @@ class ContactGroup(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     color = models.CharField(max_length=20, choices=COLOR_CHOICES, blank=True)
+    # cached size of `contacts`; kept in step by the bulk membership services
+    member_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(
@@ -85,6 +91,8 @@ class Contact(models.Model):
     last_outbound_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # maintained by a Postgres trigger from full_name/notes (see migration 0016)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ["-updated_at"]
@@ -115,10 +123,38 @@ class Contact(models.Model):
                 name="uniq_contact_instagram_user_per_org",
             ),
         ]
+        indexes = [models.Index(fields=["organization", "full_name", "id"], name="contact_org_name_idx")]
 
     def __str__(self) -> str:
         return f"{self.full_name} ({self.status})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_saved_values()
+        return instance
+
+    def remember_saved_values(self, attnames=None) -> None:
+        """
+        Record the stored values of `attnames` (default: every loaded field) so a later full save()
+        can report what it changed. tags/metadata are copied because they are edited in place.
+        """
+        saved = getattr(self, "_saved_values", {})
+        for field in self._meta.concrete_fields:
+            if (attnames is None or field.attname in attnames) and field.attname in self.__dict__:
+                value = self.__dict__[field.attname]
+                saved[field.attname] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+        self._saved_values = saved
+
+    def changed_fields(self, update_fields=None) -> set[str] | None:
+        """Attnames a save just wrote, or None when unknown (a full save of a never-loaded instance)."""
+        if update_fields is not None:
+            return {self._meta.get_field(name).attname for name in update_fields}
+        saved = getattr(self, "_saved_values", None)
+        if saved is None:
+            return None
+        return {name for name, value in saved.items() if getattr(self, name) != value}
+
     def mark_inbound(self, payload: dict[str, str]) -> None:
         """Enrich a contact with inbound identifiers safely."""
         if payload.get("email"):
@@ -133,6 +169,32 @@ class Contact(models.Model):
         self.save(update_fields=["email", "phone_whatsapp", "telegram_chat_id", "instagram_scoped_id", "last_inbound_at", "updated_at"])
 
 
+class Segment(models.Model):
+    """A saved rule tree over contacts (see contacts.segments), optionally with materialized membership."""
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="segments")
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    rules = models.JSONField(default=dict)
+    # materialized segments keep `contacts` in step with `rules`; dynamic ones are evaluated at query time
+    materialized = models.BooleanField(default=False)
+    contacts = models.ManyToManyField(Contact, related_name="materialized_segments", blank=True)
+    member_count = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    created_by = models.ForeignKey(
+        "auth.User", null=True, blank=True, on_delete=models.SET_NULL, related_name="created_segments"
+    )
+
+    class Meta:
+        unique_together = ("organization", "name")
+        ordering = ["name"]
+
+    def __str__(self) -> str:
+        return f"{self.name}"
+
+
 class IdentityConflict(models.Model):
     """Track conflicting identity updates for audit/compliance."""
 
@@ -143,3 +205,120 @@ class IdentityConflict(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+
+
+class ContactImportJob(models.Model):
+    """A CSV/JSONL contact upload processed in chunks by a worker."""
+
+    STATUS_QUEUED = "queued"
+    STATUS_PROCESSING = "processing"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_PROCESSING, "Processing"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_FAILED, "Failed"),
+    ]
+    FORMAT_CSV = "csv"
+    FORMAT_JSONL = "jsonl"
+    FORMAT_CHOICES = [(FORMAT_CSV, "CSV"), (FORMAT_JSONL, "JSON Lines")]
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="contact_imports")
+    created_by = models.ForeignKey("auth.User", null=True, blank=True, on_delete=models.SET_NULL, related_name="contact_imports")
+    group = models.ForeignKey(ContactGroup, null=True, blank=True, on_delete=models.SET_NULL, related_name="imports")
+    file = models.FileField(upload_to="contact_imports/")
+    format = models.CharField(max_length=8, choices=FORMAT_CHOICES, default=FORMAT_CSV)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    error_report = models.FileField(upload_to="contact_imports/errors/", null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:
+        return f"ContactImportJob {self.id} ({self.status})"
+
+
+class DedupJob(models.Model):
+    """A duplicate-detection scan over an organization's contacts; results are DuplicateCandidate rows."""
+
+    STATUS_QUEUED = "queued"
+    STATUS_PROCESSING = "processing"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_PROCESSING, "Processing"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="dedup_jobs")
+    created_by = models.ForeignKey("auth.User", null=True, blank=True, on_delete=models.SET_NULL, related_name="dedup_jobs")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    min_score = models.FloatField(default=0.6)
+    scanned_count = models.PositiveIntegerField(default=0)
+    block_count = models.PositiveIntegerField(default=0)
+    pair_count = models.PositiveIntegerField(default=0)
+    candidate_count = models.PositiveIntegerField(default=0)
+    merged_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:
+        return f"DedupJob {self.id} ({self.status})"
+
+
+class DuplicateCandidate(models.Model):
+    """A scored pair of contacts that probably describe the same person."""
+
+    STATUS_PENDING = "pending"
+    STATUS_MERGED = "merged"
+    STATUS_DISMISSED = "dismissed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_MERGED, "Merged"),
+        (STATUS_DISMISSED, "Dismissed"),
+    ]
+
+    job = models.ForeignKey(DedupJob, on_delete=models.CASCADE, related_name="candidates")
+    # nulled when a contact is merged away so resolved pairs stay on record
+    contact_a = models.ForeignKey(Contact, null=True, on_delete=models.SET_NULL, related_name="+")
+    contact_b = models.ForeignKey(Contact, null=True, on_delete=models.SET_NULL, related_name="+")
+    score = models.FloatField()
+    reasons = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-score", "id"]
+        indexes = [models.Index(fields=["job", "status", "-score"], name="dup_candidate_job_idx")]
+
+
+class ContactMerge(models.Model):
+    """Audit record of contacts folded into `winner`; `snapshot` keeps the merged rows' own fields."""
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="contact_merges")
+    winner = models.ForeignKey(Contact, null=True, blank=True, on_delete=models.SET_NULL, related_name="merges")
+    merged_ids = models.JSONField(default=list)
+    snapshot = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
+    merged_by = models.ForeignKey("auth.User", null=True, blank=True, on_delete=models.SET_NULL, related_name="contact_merges")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import json
+import re
+from collections import Counter
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from rest_framework import filters
+
+from organizations.utils import get_current_org
+from .segments import metadata_path, segments_q
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+METADATA_PARAM_PREFIX = "metadata."
+TAG_FACET_LIMIT = 50
+# Non-Postgres databases (SQLite in tests) fall back to OR'ed icontains over these
+FALLBACK_FIELDS = ["full_name", "email", "phone_whatsapp", "telegram_chat_id", "instagram_scoped_id", "tags", "notes"]
+
+
+def prefix_query(term: str) -> SearchQuery | None:
+    """`jo smi` -> `jo:* & smi:*` so partially typed words still match the tsvector."""
+    tokens = _TOKEN.findall(term.lower())
+    if not tokens:
+        return None
+    return SearchQuery(" & ".join(f"{token}:*" for token in tokens), search_type="raw", config="simple")
+
+
+def search_contacts(queryset, term: str):
+    """
+    Ranked contact search.
+    Postgres: names/notes via the trigger-maintained `search_vector` (GIN), email/phone substrings via
+    `UPPER(col) LIKE` served by the pg_trgm indexes, exact chat/scoped ids via their btree indexes.
+    """
+    term = (term or "").strip()
+    if not term:
+        return queryset
+    if connection.vendor != "postgresql":
+        match = Q()
+        for field in FALLBACK_FIELDS:
+            match |= Q(**{f"{field}__icontains": term})
+        return queryset.filter(match)
+
+    query = prefix_query(term)
+    match = (
+        Q(email__icontains=term)
+        | Q(phone_whatsapp__icontains=term)
+        | Q(telegram_chat_id=term)
+        | Q(instagram_scoped_id=term)
+        | Q(tags__contains=[term])
+    )
+    if query is not None:
+        match |= Q(search_vector=query)
+    rank_terms = [TrigramSimilarity("email", term), TrigramSimilarity("phone_whatsapp", term)]
+    if query is not None:
+        rank_terms.insert(0, SearchRank(F("search_vector"), query))
+    return (
+        queryset.filter(match)
+        .annotate(search_rank=Greatest(*rank_terms))
+        .order_by(F("search_rank").desc(nulls_last=True), "-updated_at")
+    )
+
+
+class ContactSearchFilter(filters.SearchFilter):
+    """Drop-in for DRF's SearchFilter on contacts (same `?search=` param) backed by search_contacts."""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search_contacts(queryset, " ".join(terms))
+
+
+def tags_q(tags: list[str]) -> Q:
+    """Contacts carrying every tag: `tags @> '[...]'`, served by the jsonb_path_ops GIN index."""
+    if connection.vendor != "postgresql":
+        match = Q()
+        for tag in tags:
+            match &= Q(tags__icontains=json.dumps(tag))
+        return match
+    return Q(tags__contains=list(tags))
+
+
+def metadata_q(key: str, raw: str) -> Q:
+    """
+    `metadata.<dotted.key>=<raw>` as jsonb containment. Query-string values are strings, so a
+    value that parses as a JSON scalar (50, true) also matches its typed form.
+    """
+    values = [raw]
+    try:
+        parsed = json.loads(raw)
+    except ValueError:
+        parsed = raw
+    if parsed != raw and not isinstance(parsed, (dict, list)):
+        values.append(parsed)
+    match = Q(pk__in=[])
+    for value in values:
+        if connection.vendor == "postgresql":
+            match |= Q(metadata__contains=metadata_path(key, value))
+        else:
+            match |= Q(**{"metadata__" + "__".join(part for part in key.split(".") if part): value})
+    return match
+
+
+def attribute_filters_q(tags: list[str] | None = None, metadata: dict[str, str] | None = None) -> Q:
+    match = Q()
+    if tags:
+        match &= tags_q(tags)
+    for key, raw in (metadata or {}).items():
+        match &= metadata_q(key, raw)
+    return match
+
+
+def attribute_params(query_params) -> tuple[list[str], dict[str, str]]:
+    """(tags, metadata) from `?tag=a&tag=b&metadata.company_name=Acme`."""
+    tags = [tag for tag in query_params.getlist("tag") if tag]
+    metadata = {
+        key[len(METADATA_PARAM_PREFIX) :]: value
+        for key, value in query_params.items()
+        if key.startswith(METADATA_PARAM_PREFIX) and key[len(METADATA_PARAM_PREFIX) :].strip(".")
+    }
+    return tags, metadata
+
+
+class ContactAttributeFilter(filters.BaseFilterBackend):
+    """`?tag=` (all of, repeatable), `?metadata.<key>=` and `?segment=<id>` filters for the contact list."""
+
+    def filter_queryset(self, request, queryset, view):
+        tags, metadata = attribute_params(request.query_params)
+        if tags or metadata:
+            queryset = queryset.filter(attribute_filters_q(tags, metadata))
+        segment_ids = [int(sid) for sid in request.query_params.getlist("segment") if sid.isdigit()]
+        if segment_ids:
+            queryset = queryset.filter(segments_q(get_current_org(request), segment_ids))
+        return queryset
+
+
+def tag_facets(queryset, limit: int = TAG_FACET_LIMIT) -> list[dict]:
+    """Tag -> number of contacts in `queryset`, most common first, from one GROUP BY over the unnested arrays."""
+    base = queryset.prefetch_related(None).order_by().values("id", "tags")
+    if connection.vendor != "postgresql":
+        counts = Counter()
+        for tags in base.values_list("tags", flat=True).iterator():
+            if isinstance(tags, list):
+                counts.update({str(tag) for tag in tags})
+        return [{"tag": tag, "count": count} for tag, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]]
+    sql, params = base.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT tag, COUNT(DISTINCT c.id) AS n
+            FROM ({sql}) AS c
+            CROSS JOIN LATERAL jsonb_array_elements_text(
+                CASE WHEN jsonb_typeof(c.tags) = 'array' THEN c.tags ELSE '[]'::jsonb END
+            ) AS tag
+            GROUP BY tag
+            ORDER BY n DESC, tag
+            LIMIT %s
+            """,
+            [*params, limit],
+        )
+        return [{"tag": tag, "count": count} for tag, count in cursor.fetchall()]
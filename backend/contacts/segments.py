@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import operator
+from datetime import timedelta
+from functools import reduce
+from typing import Iterable
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import BooleanField, ExpressionWrapper, F, Q, Value
+from django.db.models.constants import LOOKUP_SEP
+from django.utils import timezone
+
+from .models import Contact, Segment
+
+SEGMENT_MAX_DEPTH = int(getattr(settings, "SEGMENT_MAX_DEPTH", 6))
+SEGMENT_MAX_RULES = int(getattr(settings, "SEGMENT_MAX_RULES", 50))
+_TAG_OPS = ("contains_all", "contains_any")
+_INBOUND_OPS = ("within_days", "older_than_days")
+_COMBINATORS = ("all", "any", "not")
+
+
+def _tag_list(value) -> list[str]:
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not value:
+        raise ValueError("tags value must be a non-empty list")
+    return [str(tag) for tag in value]
+
+
+def _days(value) -> int:
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("days must be an integer") from None
+    if days < 0:
+        raise ValueError("days must not be negative")
+    return days
+
+
+def metadata_path(key: str, value) -> dict:
+    """'company.size' -> {"company": {"size": value}} so nested keys still compile to one `@>`."""
+    parts = [part for part in str(key or "").split(".") if part]
+    if not parts:
+        raise ValueError("metadata rules need a key")
+    doc = value
+    for part in reversed(parts):
+        doc = {part: doc}
+    return doc
+
+
+def _compile_leaf(rule: dict, now) -> Q:
+    field, op, value = rule.get("field"), rule.get("op"), rule.get("value")
+    if field == "tags":
+        # jsonb containment (`tags @> '["vip"]'`) so a jsonb_path_ops GIN index can serve it
+        tags = _tag_list(value)
+        if op == "contains_all":
+            return Q(tags__contains=tags)
+        if op == "contains_any":
+            return reduce(operator.or_, (Q(tags__contains=[tag]) for tag in tags))
+        raise ValueError(f"tags op must be one of: {', '.join(_TAG_OPS)}")
+    if field == "status":
+        statuses = [value] if isinstance(value, str) else value
+        valid = {choice for choice, _ in Contact.STATUS_CHOICES}
+        if op != "in" or not statuses or not set(statuses) <= valid:
+            raise ValueError(f"status rules use op 'in' with values from: {', '.join(sorted(valid))}")
+        return Q(status__in=list(statuses))
+    if field == "last_inbound_at":
+        cutoff = now - timedelta(days=_days(value))
+        if op == "within_days":
+            return Q(last_inbound_at__gte=cutoff)
+        if op == "older_than_days":
+            return Q(last_inbound_at__lt=cutoff) | Q(last_inbound_at__isnull=True)
+        raise ValueError(f"last_inbound_at op must be one of: {', '.join(_INBOUND_OPS)}")
+    if field == "channel":
+        from messaging.audience import channel_eligibility_q
+
+        if op != "available":
+            raise ValueError("channel rules use op 'available'")
+        return channel_eligibility_q(str(value))
+    if field == "metadata":
+        if op != "equals":
+            raise ValueError("metadata rules use op 'equals'")
+        return Q(metadata__contains=metadata_path(rule.get("key"), value))
+    raise ValueError(f"Unknown rule field: {field}")
+
+
+def compile_rules(rules: dict, *, now=None) -> Q:
+    """
+    Compile a segment rule tree into one Q over Contact.
+
+    A node is a combinator -- {"all": [...]}, {"any": [...]}, {"not": node} -- or a leaf:
+      {"field": "tags", "op": "contains_all" | "contains_any", "value": ["vip", ...]}
+      {"field": "status", "op": "in", "value": ["active"]}
+      {"field": "last_inbound_at", "op": "within_days" | "older_than_days", "value": 30}
+      {"field": "channel", "op": "available", "value": "whatsapp"}
+      {"field": "metadata", "op": "equals", "key": "company.name", "value": "Acme"}
+    Raises ValueError for malformed trees.
+    """
+    now = now or timezone.now()
+    budget = [SEGMENT_MAX_RULES]
+
+    def _node(node, depth: int) -> Q:
+        if not isinstance(node, dict) or not node:
+            raise ValueError("each rule must be a non-empty object")
+        if depth > SEGMENT_MAX_DEPTH:
+            raise ValueError(f"rules nest deeper than {SEGMENT_MAX_DEPTH} levels")
+        combinator = [key for key in _COMBINATORS if key in node]
+        if combinator:
+            if len(node) != 1:
+                raise ValueError("a combinator node must have exactly one key")
+            key = combinator[0]
+            if key == "not":
+                return ~_node(node["not"], depth + 1)
+            children = node[key]
+            if not isinstance(children, list) or not children:
+                raise ValueError(f"'{key}' needs a non-empty list of rules")
+            compiled = [_node(child, depth + 1) for child in children]
+            return reduce(operator.and_ if key == "all" else operator.or_, compiled)
+        budget[0] -= 1
+        if budget[0] < 0:
+            raise ValueError(f"segments are limited to {SEGMENT_MAX_RULES} rules")
+        return _compile_leaf(node, now)
+
+    return _node(rules, 0)
+
+
+def _q_fields(q: Q) -> Iterable[str]:
+    for child in q.children:
+        if isinstance(child, Q):
+            yield from _q_fields(child)
+        else:
+            yield child[0].split(LOOKUP_SEP, 1)[0]
+
+
+def rule_fields(rule_trees: Iterable[dict]) -> set[str]:
+    """Contact fields the rule trees read; a save touching none of them cannot change membership."""
+    fields: set[str] = set()
+    for rules in rule_trees:
+        try:
+            fields.update(_q_fields(compile_rules(rules)))
+        except ValueError:
+            continue
+    return fields
+
+
+def queue_org_refresh(organization_id: int) -> None:
+    """One refresh of an org's segments after a bulk write (bulk_create, COPY and UPDATE send no post_save)."""
+    if not Segment.objects.filter(organization_id=organization_id, materialized=True).exists():
+        return
+    from .tasks import refresh_segments
+
+    transaction.on_commit(lambda: refresh_segments.delay(organization_id))
+
+
+def segment_queryset(segment: Segment):
+    """Contacts currently matching the segment's rules (ignores any materialized membership)."""
+    return Contact.objects.filter(organization_id=segment.organization_id).filter(compile_rules(segment.rules))
+
+
+def segment_members_q(segment: Segment) -> Q:
+    """Predicate for segment membership: the membership table once materialized, otherwise the rules."""
+    if segment.materialized and segment.refreshed_at:
+        through = Segment.contacts.through
+        return Q(id__in=through.objects.filter(segment_id=segment.id).values("contact_id"))
+    return compile_rules(segment.rules)
+
+
+def segments_q(org, segment_ids: Iterable[int]) -> Q:
+    """Contacts in any of the org's segments `segment_ids` (ids from other orgs are ignored)."""
+    q = Q(pk__in=[])
+    for segment in Segment.objects.filter(organization=org, id__in=list(segment_ids)):
+        q |= segment_members_q(segment)
+    return q
+
+
+def refresh_segment(segment: Segment) -> tuple[int, int]:
+    """
+    Bring a segment up to date. Materialized segments are diffed against the membership table in
+    two set-based statements (DELETE leavers, INSERT ... SELECT joiners); dynamic segments only
+    refresh their cached count. Returns (added, removed).
+    """
+    matching = segment_queryset(segment).order_by()
+    now = timezone.now()
+    if not segment.materialized:
+        Segment.objects.filter(pk=segment.pk).update(member_count=matching.count(), refreshed_at=now)
+        return 0, 0
+    through = Segment.contacts.through
+    current = through.objects.filter(segment_id=segment.id)
+    joiners = (
+        matching.exclude(id__in=current.values("contact_id"))
+        .annotate(_member_segment=Value(segment.id))
+        .values_list("_member_segment", "id")
+    )
+    sql, params = joiners.query.sql_with_params()
+    qn = connection.ops.quote_name
+    with transaction.atomic():
+        removed, _ = current.exclude(contact_id__in=matching.values("id")).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {qn(through._meta.db_table)} ({qn('segment_id')}, {qn('contact_id')}) {sql}", params)
+            added = max(cursor.rowcount, 0)
+        Segment.objects.filter(pk=segment.pk).update(member_count=current.count(), refreshed_at=now)
+    return added, removed
+
+
+def refresh_contact_segments(contact: Contact) -> None:
+    """
+    Re-evaluate one contact against every materialized segment of its organization in a single
+    query and apply the membership changes (used after a contact is saved).
+    """
+    segments = {}
+    for segment in Segment.objects.filter(organization_id=contact.organization_id, materialized=True, refreshed_at__isnull=False):
+        try:
+            segments[f"_seg_{segment.id}"] = (segment, compile_rules(segment.rules))
+        except ValueError:
+            continue
+    if not segments:
+        return
+    flags = (
+        Contact.objects.filter(pk=contact.pk)
+        .annotate(**{alias: ExpressionWrapper(q, output_field=BooleanField()) for alias, (_, q) in segments.items()})
+        .values(*segments)
+        .first()
+    )
+    if flags is None:
+        return
+    through = Segment.contacts.through
+    current = set(
+        through.objects.filter(contact_id=contact.pk, segment_id__in=[s.id for s, _ in segments.values()]).values_list(
+            "segment_id", flat=True
+        )
+    )
+    matched = {segment.id for alias, (segment, _) in segments.items() if flags[alias]}
+    joined, left = matched - current, current - matched
+    with transaction.atomic():
+        if joined:
+            through.objects.bulk_create([through(segment_id=sid, contact_id=contact.pk) for sid in joined], ignore_conflicts=True)
+            Segment.objects.filter(id__in=joined).update(member_count=F("member_count") + 1)
+        if left:
+            through.objects.filter(contact_id=contact.pk, segment_id__in=left).delete()
+            Segment.objects.filter(id__in=left).update(member_count=F("member_count") - 1)
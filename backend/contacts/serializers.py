@@ -4,12 +4,14 @@ from django.db import IntegrityError, transaction
 from rest_framework import serializers
 
 from organizations.utils import get_current_org
-from .models import Contact, IdentityConflict, ContactGroup
+from .models import Contact, ContactImportJob, ContactMerge, DedupJob, DuplicateCandidate, IdentityConflict, ContactGroup, Segment
+from .segments import compile_rules
+from .services import normalize_email, normalize_phone
 from messaging.models import ContactEngagement
 
 
 class ContactGroupSerializer(serializers.ModelSerializer):
-    contacts_count = serializers.IntegerField(read_only=True)
+    contacts_count = serializers.IntegerField(source="member_count", read_only=True)
 
     class Meta:
         model = ContactGroup
@@ -23,8 +25,9 @@ class ContactGroupSerializer(serializers.ModelSerializer):
             "updated_at",
             "created_by",
             "contacts_count",
+            "member_count",
         ]
-        read_only_fields = ["organization", "created_at", "updated_at", "created_by", "contacts_count"]
+        read_only_fields = ["organization", "created_at", "updated_at", "created_by", "contacts_count", "member_count"]
 
     def validate_name(self, value):
         request = self.context.get("request")
@@ -50,6 +53,48 @@ class ContactGroupSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
+class SegmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Segment
+        fields = [
+            "id",
+            "organization",
+            "name",
+            "description",
+            "rules",
+            "materialized",
+            "member_count",
+            "refreshed_at",
+            "created_at",
+            "updated_at",
+            "created_by",
+        ]
+        read_only_fields = ["organization", "member_count", "refreshed_at", "created_at", "updated_at", "created_by"]
+
+    def validate_name(self, value):
+        org = get_current_org(self.context.get("request"))
+        qs = Segment.objects.filter(organization=org, name__iexact=value)
+        if self.instance:
+            qs = qs.exclude(pk=self.instance.pk)
+        if qs.exists():
+            raise serializers.ValidationError("A segment with this name already exists in your organization.")
+        return value
+
+    def validate_rules(self, value):
+        try:
+            compile_rules(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
+    def create(self, validated_data):
+        request = self.context.get("request")
+        if request and request.user.is_authenticated:
+            validated_data["created_by"] = request.user
+        validated_data["organization"] = get_current_org(request)
+        return super().create(validated_data)
+
+
 class ContactSerializer(serializers.ModelSerializer):
     groups = serializers.PrimaryKeyRelatedField(
         many=True, queryset=ContactGroup.objects.all(), required=False, allow_empty=True
@@ -87,6 +132,12 @@ class ContactSerializer(serializers.ModelSerializer):
         if status != Contact.STATUS_ACTIVE and self.context.get("action") == "send_outbound":
             raise serializers.ValidationError("Outbound messaging is only allowed for active contacts.")
 
+        # Canonical identifiers so uploads and imports (contacts.services) match what is stored
+        if attrs.get("email"):
+            attrs["email"] = normalize_email(attrs["email"])
+        if attrs.get("phone_whatsapp"):
+            attrs["phone_whatsapp"] = normalize_phone(attrs["phone_whatsapp"])
+
         # Normalize blanks to None
         for field in ["phone_whatsapp", "telegram_chat_id", "instagram_scoped_id", "email"]:
             if field in attrs and not attrs.get(field):
@@ -155,3 +206,89 @@ class ContactEngagementSerializer(serializers.ModelSerializer):
         model = ContactEngagement
         fields = ["id", "channel", "subject", "status", "error", "created_at"]
         read_only_fields = fields
+
+
+class ContactImportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    has_error_report = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ContactImportJob
+        fields = [
+            "id",
+            "format",
+            "group",
+            "status",
+            "total_rows",
+            "processed_rows",
+            "progress",
+            "created_count",
+            "updated_count",
+            "error_count",
+            "has_error_report",
+            "error",
+            "created_by",
+            "created_at",
+            "started_at",
+            "completed_at",
+        ]
+        read_only_fields = fields
+
+    def get_progress(self, obj) -> int:
+        if obj.status == ContactImportJob.STATUS_COMPLETED:
+            return 100
+        if not obj.total_rows:
+            return 0
+        return min(99, int(obj.processed_rows * 100 / obj.total_rows))
+
+    def get_has_error_report(self, obj) -> bool:
+        return bool(obj.error_report)
+
+
+class DedupJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DedupJob
+        fields = [
+            "id",
+            "status",
+            "min_score",
+            "scanned_count",
+            "block_count",
+            "pair_count",
+            "candidate_count",
+            "merged_count",
+            "error",
+            "created_by",
+            "created_at",
+            "started_at",
+            "completed_at",
+        ]
+        read_only_fields = [f for f in fields if f != "min_score"]
+
+    def validate_min_score(self, value):
+        if not 0 < value <= 1:
+            raise serializers.ValidationError("min_score must be between 0 and 1.")
+        return value
+
+
+class DuplicateContactSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Contact
+        fields = ["id", "full_name", "email", "phone_whatsapp", "telegram_chat_id", "instagram_user_id", "status", "created_at"]
+
+
+class DuplicateCandidateSerializer(serializers.ModelSerializer):
+    contact_a = DuplicateContactSerializer(read_only=True)
+    contact_b = DuplicateContactSerializer(read_only=True)
+
+    class Meta:
+        model = DuplicateCandidate
+        fields = ["id", "contact_a", "contact_b", "score", "reasons", "status", "created_at"]
+        read_only_fields = fields
+
+
+class ContactMergeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ContactMerge
+        fields = ["id", "winner", "merged_ids", "merged_by", "created_at"]
+        read_only_fields = fields
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from django.db import connection, transaction
+from django.db.models import F, Value
+
+from .models import Contact, ContactGroup
+from .segments import queue_org_refresh
+
+UPSERT_BATCH_SIZE = 1000
+LOOKUP_CHUNK_SIZE = 5000
+# in match precedence: when a row's identifiers point at different contacts, the earliest field wins
+IDENTIFIER_FIELDS = ["email", "phone_whatsapp", "telegram_chat_id", "instagram_scoped_id", "instagram_user_id"]
+_PHONE_STRIP = re.compile(r"[\s\-().]")
+# most restrictive first: merges and imports may only move a contact down this list, never re-subscribe it
+STATUS_PRECEDENCE = [Contact.STATUS_BLOCKED, Contact.STATUS_UNSUBSCRIBED, Contact.STATUS_BOUNCED, Contact.STATUS_ACTIVE]
+
+
+def normalize_email(value) -> str:
+    return (str(value or "")).strip().lower()
+
+
+def normalize_phone(value) -> str:
+    phone = _PHONE_STRIP.sub("", str(value or ""))
+    if phone.startswith("00"):
+        phone = "+" + phone[2:]
+    return phone
+
+
+def restrictive_status(*statuses: str) -> str:
+    """The most restrictive of `statuses` (blanks ignored); unknown values rank below active."""
+    rank = {status: index for index, status in enumerate(STATUS_PRECEDENCE)}
+    return min((s for s in statuses if s), key=lambda s: rank.get(s, len(STATUS_PRECEDENCE)))
+
+
+@dataclass
+class UpsertResult:
+    # contact id per input row (None when the row had no usable identifier)
+    contact_ids: list[int | None] = field(default_factory=list)
+    created: int = 0
+    matched: int = 0
+
+    @property
+    def unique_ids(self) -> list[int]:
+        return list(dict.fromkeys(cid for cid in self.contact_ids if cid is not None))
+
+
+def normalize_rows(entries: Iterable[dict], default_name: str = "Uploaded Contact") -> list[dict]:
+    """Single pass over raw upload rows producing {full_name, email, phone_whatsapp}."""
+    return [
+        {
+            "full_name": (entry.get("name") or entry.get("full_name") or "").strip() or default_name,
+            "email": normalize_email(entry.get("email")),
+            "phone_whatsapp": normalize_phone(entry.get("phone") or entry.get("phone_whatsapp")),
+        }
+        for entry in entries
+    ]
+
+
+def _chunks(values: list, size: int = LOOKUP_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def resolve_identifiers(org, rows: Iterable[dict], fields: Iterable[str] = IDENTIFIER_FIELDS) -> dict[str, dict[str, int]]:
+    """Existing contact id per (already normalized) identifier value, with one `__in` query per field and chunk."""
+    rows = list(rows)
+    existing: dict[str, dict[str, int]] = {}
+    for field_name in fields:
+        found: dict[str, int] = {}
+        for chunk in _chunks(sorted({row[field_name] for row in rows if row.get(field_name)})):
+            found.update(Contact.objects.filter(organization=org, **{f"{field_name}__in": chunk}).values_list(field_name, "id"))
+        existing[field_name] = found
+    return existing
+
+
+def match_contact(existing: dict[str, dict[str, int]], row: dict) -> tuple[int | None, set[int]]:
+    """
+    The contact a row resolves to (first matching field in IDENTIFIER_FIELDS order wins) and every
+    contact any of its identifiers matched. Campaign uploads and contact imports share this rule.
+    """
+    matches = [existing[f][row[f]] for f in existing if row.get(f) and row[f] in existing[f]]
+    return (matches[0] if matches else None), set(matches)
+
+
+def bulk_upsert_contacts(org, entries: Iterable[dict], *, default_name: str = "Uploaded Contact") -> UpsertResult:
+    """
+    Resolve or create contacts for a batch of rows with a fixed number of queries:
+    one `__in` lookup per identifier, one `bulk_create(ignore_conflicts=True)`,
+    then a re-resolve of the inserted identifiers (ignore_conflicts does not return pks).
+    Email wins over phone when both match different contacts (see match_contact).
+    """
+    rows = normalize_rows(entries, default_name=default_name)
+    fields = ["email", "phone_whatsapp"]
+    existing = resolve_identifiers(org, rows, fields)
+
+    def _lookup(row):
+        return match_contact(existing, row)[0]
+
+    result = UpsertResult()
+    pending: dict[tuple[str, str], dict] = {}
+    seen_email: set[str] = set()
+    seen_phone: set[str] = set()
+    for row in rows:
+        if not row["email"] and not row["phone_whatsapp"]:
+            continue
+        if _lookup(row):
+            result.matched += 1
+            continue
+        if row["email"] in seen_email or row["phone_whatsapp"] in seen_phone:
+            continue
+        if row["email"]:
+            seen_email.add(row["email"])
+        if row["phone_whatsapp"]:
+            seen_phone.add(row["phone_whatsapp"])
+        pending[(row["email"], row["phone_whatsapp"])] = row
+
+    if pending:
+        known_ids = {pk for found in existing.values() for pk in found.values()}
+        Contact.objects.bulk_create(
+            [
+                Contact(
+                    organization=org,
+                    full_name=row["full_name"],
+                    email=row["email"] or None,
+                    phone_whatsapp=row["phone_whatsapp"] or None,
+                )
+                for row in pending.values()
+            ],
+            batch_size=UPSERT_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        for field_name, found in resolve_identifiers(org, pending.values(), fields).items():
+            existing[field_name].update(found)
+        result.created = len({_lookup(row) for row in pending.values()} - known_ids - {None})
+        if result.created:
+            queue_org_refresh(org.id)
+
+    result.contact_ids = [_lookup(row) if (row["email"] or row["phone_whatsapp"]) else None for row in rows]
+    return result
+
+
+def filter_contacts(org, spec: dict | None):
+    """
+    Contacts matching a filter expression:
+    {"status", "search", "group_ids", "tags", "created_after", ...} (see messaging.audience.audience_filters_q).
+    Raises ValueError for unknown keys or bad values.
+    """
+    from messaging.audience import audience_filters_q, group_members_q
+    from .search import search_contacts
+
+    spec = dict(spec or {})
+    if not spec:
+        raise ValueError("filter must not be empty")
+    qs = Contact.objects.filter(organization=org)
+    status = spec.pop("status", None)
+    if status:
+        qs = qs.filter(status=status)
+    group_ids = spec.pop("group_ids", None)
+    if group_ids:
+        qs = qs.filter(group_members_q([int(gid) for gid in group_ids]))
+    search = spec.pop("search", None)
+    qs = qs.filter(audience_filters_q(spec))
+    if search:
+        qs = search_contacts(qs, search)
+    return qs
+
+
+def add_group_members(group: ContactGroup, contacts) -> int:
+    """
+    Add every contact in `contacts` (a queryset) to `group` with one INSERT ... SELECT into the
+    membership table, skipping existing members and other orgs' contacts. Returns rows added.
+    """
+    through = ContactGroup.contacts.through
+    candidates = (
+        contacts.filter(organization_id=group.organization_id)
+        .exclude(id__in=through.objects.filter(contactgroup_id=group.id).values("contact_id"))
+        .order_by()
+        .annotate(_member_group=Value(group.id))
+        .values_list("_member_group", "id")
+        .distinct()
+    )
+    sql, params = candidates.query.sql_with_params()
+    qn = connection.ops.quote_name
+    # a concurrent add can insert the same pair after the NOT IN check; those rows are not counted
+    on_conflict = " ON CONFLICT DO NOTHING" if connection.vendor == "postgresql" else ""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {qn(through._meta.db_table)} ({qn('contactgroup_id')}, {qn('contact_id')}) {sql}{on_conflict}",
+                params,
+            )
+            added = max(cursor.rowcount, 0)
+        if added:
+            ContactGroup.objects.filter(pk=group.pk).update(member_count=F("member_count") + added)
+    return added
+
+
+def remove_group_members(group: ContactGroup, contacts) -> int:
+    """Remove every contact in `contacts` from `group` with one DELETE; returns rows removed."""
+    through = ContactGroup.contacts.through
+    with transaction.atomic():
+        removed, _ = through.objects.filter(contactgroup_id=group.id, contact_id__in=contacts.order_by().values("id")).delete()
+        if removed:
+            ContactGroup.objects.filter(pk=group.pk).update(member_count=F("member_count") - removed)
+    return removed
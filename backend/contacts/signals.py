@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Contact, ContactGroup, Segment
+from .segments import rule_fields
+
+Membership = Contact.groups.through
+
+
+def _bump(group_ids, delta: int) -> None:
+    if group_ids and delta:
+        ContactGroup.objects.filter(id__in=list(group_ids)).update(member_count=F("member_count") + delta)
+
+
+@receiver(m2m_changed, sender=Membership)
+def maintain_member_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep ContactGroup.member_count in step with contact.groups / group.contacts changes.
+    Django reports only newly added ids on add, but the requested ids on remove, so removals
+    are measured in pre_* and applied in post_*.
+    """
+    if action == "post_add":
+        if reverse:
+            _bump([instance.pk], len(pk_set or ()))
+        else:
+            _bump(pk_set, 1)
+    elif action in ("pre_remove", "pre_clear"):
+        if reverse:
+            members = Membership.objects.filter(contactgroup_id=instance.pk)
+            if action == "pre_remove":
+                members = members.filter(contact_id__in=pk_set or ())
+            instance._member_count_removed = members.count()
+        else:
+            memberships = Membership.objects.filter(contact_id=instance.pk)
+            if action == "pre_remove":
+                memberships = memberships.filter(contactgroup_id__in=pk_set or ())
+            instance._member_count_groups = list(memberships.values_list("contactgroup_id", flat=True))
+    elif action in ("post_remove", "post_clear"):
+        if reverse:
+            _bump([instance.pk], -getattr(instance, "_member_count_removed", 0))
+        else:
+            _bump(getattr(instance, "_member_count_groups", ()), -1)
+
+
+@receiver(pre_delete, sender=Contact)
+def release_memberships(sender, instance, **kwargs):
+    """Membership rows vanish by cascade (no m2m_changed), so account for them here."""
+    _bump(Membership.objects.filter(contact_id=instance.pk).values_list("contactgroup_id", flat=True), -1)
+    segment_ids = Segment.contacts.through.objects.filter(contact_id=instance.pk).values_list("segment_id", flat=True)
+    Segment.objects.filter(id__in=list(segment_ids)).update(member_count=F("member_count") - 1)
+
+
+@receiver(post_save, sender=Contact)
+def queue_segment_refresh(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """
+    Re-evaluate materialized segments for a saved contact once the write is committed; skipped when
+    the save left every field the org's segment rules read unchanged.
+    """
+    changed = None if created else instance.changed_fields(update_fields)
+    # later saves of this instance are compared against what was just written
+    instance.remember_saved_values(changed if update_fields is not None else None)
+    if raw:
+        return
+    rule_trees = list(
+        Segment.objects.filter(organization_id=instance.organization_id, materialized=True).values_list("rules", flat=True)
+    )
+    if not rule_trees or (changed is not None and not changed & rule_fields(rule_trees)):
+        return
+    from .tasks import refresh_contact_segments
+
+    contact_id = instance.pk
+    transaction.on_commit(lambda: refresh_contact_segments.delay(contact_id))
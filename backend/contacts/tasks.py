@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import logging
+
+from celery import shared_task
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from monitoring.models import MonitoringAlert
+from monitoring.utils import record_alert
+from .models import Contact, ContactGroup, ContactImportJob, DedupJob, Segment
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def import_contacts(job_id: int):
+    """Process an uploaded contact file; progress and the error report live on the job."""
+    from .importer import run_import
+
+    try:
+        job = ContactImportJob.objects.select_related("organization", "group").get(pk=job_id)
+    except ContactImportJob.DoesNotExist:
+        return
+    if job.status != ContactImportJob.STATUS_QUEUED:
+        return
+    job.status = ContactImportJob.STATUS_PROCESSING
+    job.started_at = timezone.now()
+    job.save(update_fields=["status", "started_at", "updated_at"])
+    try:
+        run_import(job)
+    except Exception as exc:
+        ContactImportJob.objects.filter(pk=job.pk).update(
+            status=ContactImportJob.STATUS_FAILED, error=str(exc)[:2000], completed_at=timezone.now()
+        )
+        record_alert(
+            organization=job.organization,
+            category="contact_import_failed",
+            message=f"Contact import {job.id} failed: {exc}",
+            severity=MonitoringAlert.SEVERITY_ERROR,
+            metadata={"import_id": job.id},
+        )
+        raise
+    # bulk-loaded rows bypass the per-contact save hook
+    for segment_id in Segment.objects.filter(organization=job.organization, materialized=True).values_list("id", flat=True):
+        refresh_segment.delay(segment_id)
+
+
+@shared_task
+def reconcile_group_member_counts():
+    """Periodic safety net: correct any ContactGroup.member_count that drifted from the membership table."""
+    counts = (
+        Contact.groups.through.objects.filter(contactgroup_id=OuterRef("pk"))
+        .order_by()
+        .values("contactgroup_id")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    drifted = list(
+        ContactGroup.objects.annotate(actual=Coalesce(Subquery(counts), 0))
+        .exclude(member_count=F("actual"))
+        .values_list("id", "actual")
+    )
+    for group_id, actual in drifted:
+        ContactGroup.objects.filter(pk=group_id).update(member_count=actual)
+    if drifted:
+        logger.warning("contacts.member_count_drift groups=%s", [group_id for group_id, _ in drifted])
+    return len(drifted)
+
+
+@shared_task
+def refresh_segment(segment_id: int):
+    from .segments import refresh_segment as _refresh
+
+    segment = Segment.objects.filter(pk=segment_id).first()
+    if segment is None:
+        return None
+    added, removed = _refresh(segment)
+    return {"added": added, "removed": removed}
+
+
+@shared_task
+def refresh_segments(organization_id: int | None = None):
+    """
+    Periodic refresh: relative-date rules (last_inbound_at within N days) drift without any contact write.
+    With `organization_id`, only that org's segments (queued once after a bulk contact load).
+    """
+    segments = Segment.objects.all()
+    if organization_id is not None:
+        segments = segments.filter(organization_id=organization_id)
+    for segment_id in segments.values_list("id", flat=True):
+        refresh_segment.delay(segment_id)
+
+
+@shared_task
+def refresh_contact_segments(contact_id: int):
+    from .segments import refresh_contact_segments as _refresh_contact
+
+    contact = Contact.objects.filter(pk=contact_id).only("id", "organization_id").first()
+    if contact is not None:
+        _refresh_contact(contact)
+
+
+@shared_task
+def run_dedup(job_id: int):
+    """Scan an organization for duplicate contacts; candidates are stored on the job."""
+    from .dedup import run_dedup as _run
+
+    try:
+        job = DedupJob.objects.select_related("organization").get(pk=job_id)
+    except DedupJob.DoesNotExist:
+        return
+    if job.status != DedupJob.STATUS_QUEUED:
+        return
+    job.status = DedupJob.STATUS_PROCESSING
+    job.started_at = timezone.now()
+    job.save(update_fields=["status", "started_at"])
+    try:
+        _run(job)
+    except Exception as exc:
+        DedupJob.objects.filter(pk=job.pk).update(status=DedupJob.STATUS_FAILED, error=str(exc)[:2000], completed_at=timezone.now())
+        record_alert(
+            organization=job.organization,
+            category="contact_dedup_failed",
+            message=f"Contact dedup {job.id} failed: {exc}",
+            severity=MonitoringAlert.SEVERITY_ERROR,
+            metadata={"dedup_job_id": job.id},
+        )
+        raise
+
+
+@shared_task
+def merge_duplicates(job_id: int, candidate_ids: list[int] | None = None, min_score: float | None = None, user_id: int | None = None):
+    from django.contrib.auth.models import User
+
+    from .dedup import merge_candidates
+
+    job = DedupJob.objects.select_related("organization").filter(pk=job_id).first()
+    if job is None:
+        return 0
+    user = User.objects.filter(pk=user_id).first() if user_id else None
+    return merge_candidates(job, candidate_ids=candidate_ids, min_score=min_score, user=user)
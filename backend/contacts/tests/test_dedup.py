@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from contacts.dedup import blocking_keys, clusters_from_pairs, email_key, merge_contacts, phone_key, pick_winner, score_pair
+from contacts.models import Contact, ContactMerge
+from corbi.testing import OrgAPITestMixin
+from messaging.models import Campaign, CampaignRecipient, CampaignUploadContact, Conversation
+
+
+def _row(full_name="", **identifiers):
+    return {
+        "full_name": full_name,
+        "email": "",
+        "phone_whatsapp": "",
+        "telegram_chat_id": "",
+        "instagram_scoped_id": "",
+        "instagram_user_id": "",
+        **identifiers,
+    }
+
+
+class ScoringTests(TestCase):
+    def test_keys_normalize_identifiers(self):
+        self.assertEqual(email_key(" Ada+news@Example.com "), "ada@example.com")
+        self.assertEqual(email_key("not-an-email"), "")
+        self.assertEqual(phone_key("+1 (555) 000-1111"), "+15550001111")
+        self.assertEqual(phone_key("123"), "")
+
+    def test_name_keys_let_spelling_variants_meet(self):
+        self.assertIn("n:smith|j", set(blocking_keys("Jon Smith", "", "")) & set(blocking_keys("John Smith", "", "")))
+        self.assertEqual(blocking_keys("Uploaded Contact", "", ""), [])
+
+    def test_shared_identifier_outscores_name_similarity(self):
+        shared, reasons = score_pair(_row("Ada", email="ada+x@example.com"), _row("Someone", email="ADA@example.com"))
+        self.assertGreaterEqual(shared, 0.9)
+        self.assertEqual(reasons, ["email"])
+        similar, reasons = score_pair(
+            _row("Ada Lovelace", email="a@example.com"), _row("Ada Lovelace", phone_whatsapp="+15550001111")
+        )
+        self.assertEqual((similar, reasons), (0.9, ["name"]))
+        conflicting, _ = score_pair(_row("Ada Lovelace", email="a@example.com"), _row("Ada Lovelace", email="b@example.com"))
+        self.assertLess(conflicting, similar)
+
+    def test_clusters_are_connected_components(self):
+        self.assertEqual(sorted(clusters_from_pairs([(3, 1), (1, 2), (5, 6)])), [[1, 2, 3], [5, 6]])
+
+
+class MergeContactsTests(OrgAPITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.winner = Contact.objects.create(organization=self.org, full_name="Ada", email="ada@example.com")
+        self.loser = Contact.objects.create(organization=self.org, full_name="Ada L", phone_whatsapp="+15550001111")
+
+    def _conversation(self, contact, channel, at, snippet, unread=0, direction=Conversation.DIR_INBOUND):
+        return Conversation.objects.create(
+            organization=self.org,
+            contact=contact,
+            channel=channel,
+            last_message_at=at,
+            last_snippet=snippet,
+            last_direction=direction,
+            unread_count=unread,
+        )
+
+    def test_winner_has_the_most_identifiers_then_the_lowest_id(self):
+        richer = Contact.objects.create(
+            organization=self.org, full_name="Ada", email="a@example.com", phone_whatsapp="+15550009999"
+        )
+        self.assertEqual(pick_winner([self.winner, self.loser, richer]), richer)
+        self.assertEqual(pick_winner([self.loser, self.winner]), self.winner)
+
+    def test_winner_absorbs_identifiers_and_the_stricter_status(self):
+        Contact.objects.filter(pk=self.loser.pk).update(status=Contact.STATUS_UNSUBSCRIBED, tags=["vip"])
+        merge_contacts(self.org, {self.winner.id: [self.loser.id]})
+        self.winner.refresh_from_db()
+        self.assertEqual(self.winner.phone_whatsapp, "+15550001111")
+        self.assertEqual(self.winner.status, Contact.STATUS_UNSUBSCRIBED)
+        self.assertIn("vip", self.winner.tags)
+        self.assertEqual(ContactMerge.objects.get().snapshot[0]["id"], self.loser.id)
+
+    def test_folds_conversations_on_the_same_channel(self):
+        now = timezone.now()
+        old = now - timedelta(hours=2)
+        self._conversation(self.winner, "whatsapp", old, "old", unread=1, direction=Conversation.DIR_OUTBOUND)
+        self._conversation(self.loser, "whatsapp", now, "newest", unread=2)
+        email = self._conversation(self.loser, "email", now, "mail", unread=1)
+
+        merges = merge_contacts(self.org, {self.winner.id: [self.loser.id]})
+
+        self.assertEqual(len(merges), 1)
+        self.assertFalse(Contact.objects.filter(pk=self.loser.pk).exists())
+        threads = {conv.channel: conv for conv in Conversation.objects.filter(organization=self.org)}
+        self.assertEqual(set(threads), {"whatsapp", "email"})
+        whatsapp = threads["whatsapp"]
+        self.assertEqual(whatsapp.contact_id, self.winner.id)
+        self.assertEqual(whatsapp.unread_count, 3)
+        self.assertEqual(whatsapp.last_message_at, now)
+        self.assertEqual((whatsapp.last_snippet, whatsapp.last_direction), ("newest", Conversation.DIR_INBOUND))
+        self.assertEqual(threads["email"].id, email.id)
+        self.assertEqual(threads["email"].contact_id, self.winner.id)
+
+    def test_losers_sharing_a_channel_collapse_into_one_thread(self):
+        other = Contact.objects.create(organization=self.org, full_name="A. Lovelace", telegram_chat_id="42")
+        now = timezone.now()
+        self._conversation(self.loser, "telegram", now - timedelta(minutes=5), "first", unread=1)
+        self._conversation(other, "telegram", now, "second", unread=4)
+
+        merge_contacts(self.org, {self.winner.id: [self.loser.id, other.id]})
+
+        conv = Conversation.objects.get(organization=self.org)
+        self.assertEqual((conv.contact_id, conv.channel), (self.winner.id, "telegram"))
+        self.assertEqual((conv.unread_count, conv.last_snippet), (5, "second"))
+        self.assertEqual(ContactMerge.objects.get().merged_ids, sorted([self.loser.id, other.id]))
+
+    def test_per_campaign_rows_keep_the_winners_and_repoint_the_rest(self):
+        shared = Campaign.objects.create(organization=self.org, name="shared", channel="whatsapp")
+        only_loser = Campaign.objects.create(organization=self.org, name="loser", channel="whatsapp")
+        kept = CampaignRecipient.objects.create(campaign=shared, contact=self.winner)
+        CampaignRecipient.objects.create(campaign=shared, contact=self.loser)
+        moved = CampaignRecipient.objects.create(campaign=only_loser, contact=self.loser)
+        CampaignUploadContact.objects.create(campaign=shared, contact=self.winner)
+        CampaignUploadContact.objects.create(campaign=shared, contact=self.loser)
+        staged = CampaignUploadContact.objects.create(campaign=only_loser, contact=self.loser)
+
+        merge_contacts(self.org, {self.winner.id: [self.loser.id]})
+
+        self.assertEqual(
+            sorted(CampaignRecipient.objects.values_list("id", "contact_id")), sorted([(kept.id, self.winner.id), (moved.id, self.winner.id)])
+        )
+        self.assertEqual(CampaignUploadContact.objects.filter(contact=self.winner).count(), 2)
+        self.assertEqual(CampaignUploadContact.objects.get(pk=staged.pk).contact_id, self.winner.id)
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+
+from contacts.models import Contact, ContactGroup
+from contacts.services import add_group_members
+from contacts.tasks import reconcile_group_member_counts
+from corbi.testing import OrgAPITestMixin
+from organizations.models import Organization
+
+
+class GroupMembersAPITests(OrgAPITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.group = ContactGroup.objects.create(organization=self.org, name="VIP")
+        self.active = [Contact.objects.create(organization=self.org, full_name=f"A{i}") for i in range(3)]
+        self.blocked = Contact.objects.create(organization=self.org, full_name="B", status=Contact.STATUS_BLOCKED)
+
+    def _post(self, action, body):
+        return self.client.post(f"/api/contact-groups/{self.group.id}/{action}/", body, format="json")
+
+    def test_add_and_remove_by_id_list(self):
+        ids = [c.id for c in self.active[:2]]
+        self.assertEqual(self._post("add_members", {"contact_ids": ids}).json(), {"added": 2, "member_count": 2})
+        # existing members are skipped, not double counted
+        again = self._post("add_members", {"contact_ids": [*ids, self.active[2].id]}).json()
+        self.assertEqual(again, {"added": 1, "member_count": 3})
+        self.assertEqual(self._post("remove_members", {"contact_ids": ids}).json(), {"removed": 2, "member_count": 1})
+        self.assertEqual(list(self.group.contacts.values_list("id", flat=True)), [self.active[2].id])
+
+    def test_add_and_remove_by_filter(self):
+        added = self._post("add_members", {"filter": {"status": Contact.STATUS_ACTIVE}}).json()
+        self.assertEqual(added, {"added": 3, "member_count": 3})
+        self.assertNotIn(self.blocked, self.group.contacts.all())
+        self._post("add_members", {"contact_ids": [self.blocked.id]})
+        removed = self._post("remove_members", {"filter": {"status": Contact.STATUS_BLOCKED}}).json()
+        self.assertEqual(removed, {"removed": 1, "member_count": 3})
+
+    def test_other_orgs_contacts_are_never_added(self):
+        other = Organization.objects.create(name="Other")
+        stranger = Contact.objects.create(organization=other, full_name="S")
+        self.assertEqual(add_group_members(self.group, Contact.objects.filter(id=stranger.id)), 0)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.member_count, 0)
+
+    def test_postgres_insert_ignores_conflicting_pairs(self):
+        cursor = mock.MagicMock(rowcount=0)
+        with mock.patch.object(connection, "vendor", "postgresql"), mock.patch.object(connection, "cursor") as open_cursor:
+            open_cursor.return_value.__enter__.return_value = cursor
+            self.assertEqual(add_group_members(self.group, Contact.objects.all()), 0)
+        (insert,) = [c.args[0] for c in cursor.execute.call_args_list if c.args[0].startswith("INSERT")]
+        self.assertTrue(insert.endswith("ON CONFLICT DO NOTHING"))
+
+
+class MemberCountSignalTests(OrgAPITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.groups = [ContactGroup.objects.create(organization=self.org, name=f"G{i}") for i in range(2)]
+        self.contacts = [Contact.objects.create(organization=self.org, full_name=f"C{i}") for i in range(3)]
+
+    def _counts(self):
+        return [g.member_count for g in ContactGroup.objects.filter(id__in=[g.id for g in self.groups]).order_by("id")]
+
+    def test_forward_add_remove_and_clear(self):
+        contact = self.contacts[0]
+        contact.groups.add(*self.groups)
+        contact.groups.add(self.groups[0])
+        self.assertEqual(self._counts(), [1, 1])
+        contact.groups.remove(self.groups[0])
+        self.assertEqual(self._counts(), [0, 1])
+        contact.groups.clear()
+        self.assertEqual(self._counts(), [0, 0])
+
+    def test_reverse_add_remove_and_clear(self):
+        group = self.groups[0]
+        group.contacts.add(*self.contacts)
+        group.contacts.add(self.contacts[0])
+        self.assertEqual(self._counts(), [3, 0])
+        # removing a non-member does not decrement
+        group.contacts.remove(self.contacts[0], Contact.objects.create(organization=self.org, full_name="X"))
+        self.assertEqual(self._counts(), [2, 0])
+        group.contacts.clear()
+        self.assertEqual(self._counts(), [0, 0])
+
+    def test_contact_delete_releases_its_memberships(self):
+        self.contacts[0].groups.add(*self.groups)
+        self.contacts[1].groups.add(self.groups[0])
+        self.contacts[0].delete()
+        self.assertEqual(self._counts(), [1, 0])
+
+    def test_reconcile_repairs_drift(self):
+        self.groups[0].contacts.add(*self.contacts)
+        ContactGroup.objects.filter(pk=self.groups[0].pk).update(member_count=99)
+        ContactGroup.objects.filter(pk=self.groups[1].pk).update(member_count=5)
+        self.assertEqual(reconcile_group_member_counts(), 2)
+        self.assertEqual(self._counts(), [3, 0])
+        self.assertEqual(reconcile_group_member_counts(), 0)
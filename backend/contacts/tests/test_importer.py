@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import csv
+import io
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from contacts.importer import load_chunk, normalize_chunk, resolve_identities, run_import
+from contacts.models import Contact, ContactGroup, ContactImportJob
+from corbi.testing import OrgAPITestMixin, TempMediaMixin
+
+
+class ImportTests(TempMediaMixin, OrgAPITestMixin, TestCase):
+    """Runs the COPY path on PostgreSQL and the ORM fallback elsewhere; both must behave the same."""
+
+    def _import(self, text: str, fmt: str = ContactImportJob.FORMAT_CSV, group=None) -> ContactImportJob:
+        job = ContactImportJob.objects.create(organization=self.org, format=fmt, group=group)
+        job.file.save(f"import.{fmt}", ContentFile(text.encode()))
+        run_import(job)
+        job.refresh_from_db()
+        return job
+
+    def _report(self, job) -> list[list[str]]:
+        with job.error_report.open("r") as fh:
+            return list(csv.reader(io.StringIO(fh.read())))[1:]
+
+    def test_creates_updates_and_reports(self):
+        Contact.objects.create(organization=self.org, full_name="Old", email="old@example.com", tags=["a"])
+        group = ContactGroup.objects.create(organization=self.org, name="g")
+        job = self._import(
+            "name,email,phone,tags,status\n"
+            "Jo,jo@example.com,+65 1234 5678,vip|new,\n"
+            ",OLD@example.com,,b,\n"
+            "Bad,not-an-email,,,\n"
+            "Dup,jo@example.com,,,\n"
+            "NoId,,,,\n"
+            "X,x@example.com,,,weird\n",
+            group=group,
+        )
+        self.assertEqual(job.status, ContactImportJob.STATUS_COMPLETED)
+        self.assertEqual((job.created_count, job.updated_count, job.error_count), (1, 1, 4))
+        jo = Contact.objects.get(email="jo@example.com")
+        self.assertEqual((jo.phone_whatsapp, jo.tags), ("+6512345678", ["vip", "new"]))
+        old = Contact.objects.get(email="old@example.com")
+        self.assertEqual((old.full_name, sorted(old.tags)), ("Old", ["a", "b"]))
+        self.assertEqual(group.contacts.count(), 2)
+        messages = [row[1] for row in self._report(job)]
+        self.assertIn("Duplicate of row 2", messages)
+        self.assertTrue(any(m.startswith("Invalid email") for m in messages))
+        self.assertTrue(any(m.startswith("Invalid status") for m in messages))
+
+    def test_jsonl(self):
+        job = self._import('{"full_name":"J","telegram_chat_id":"55","metadata":{"k":1}}\nnot json\n', ContactImportJob.FORMAT_JSONL)
+        self.assertEqual((job.created_count, job.error_count), (1, 1))
+        self.assertEqual(Contact.objects.get(telegram_chat_id="55").metadata, {"k": 1})
+
+    def test_import_never_resubscribes_or_unblocks(self):
+        statuses = {
+            "unsub@example.com": Contact.STATUS_UNSUBSCRIBED,
+            "bounced@example.com": Contact.STATUS_BOUNCED,
+            "blocked@example.com": Contact.STATUS_BLOCKED,
+            "active@example.com": Contact.STATUS_ACTIVE,
+        }
+        for email, status in statuses.items():
+            Contact.objects.create(organization=self.org, full_name=email, email=email, status=status)
+        self._import(
+            "email,status\n"
+            "unsub@example.com,active\n"
+            "bounced@example.com,unsubscribed\n"
+            "blocked@example.com,bounced\n"
+            "active@example.com,blocked\n"
+        )
+        self.assertEqual(
+            dict(Contact.objects.values_list("email", "status")),
+            {
+                "unsub@example.com": Contact.STATUS_UNSUBSCRIBED,
+                "bounced@example.com": Contact.STATUS_UNSUBSCRIBED,
+                "blocked@example.com": Contact.STATUS_BLOCKED,
+                "active@example.com": Contact.STATUS_BLOCKED,
+            },
+        )
+
+    def test_rows_losing_an_insert_conflict_are_reported(self):
+        chunk = normalize_chunk([(2, {"email": "race@example.com"}, ""), (3, {"email": "fine@example.com"}, "")])
+        resolve_identities(self.org, chunk)
+        # another writer takes the address between resolve and load
+        Contact.objects.create(organization=self.org, full_name="Racer", email="race@example.com")
+        created, updated, skipped = load_chunk(self.org, chunk.rows)
+        self.assertEqual((created, updated), (1, 0))
+        self.assertEqual([row["row_no"] for row in skipped], [2])
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from unittest import skipUnless
+
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase
+
+from contacts.models import Contact
+from contacts.search import attribute_params, prefix_query, search_contacts
+from corbi.testing import OrgAPITestMixin
+
+
+class SearchMixin(OrgAPITestMixin):
+    def _search(self, term):
+        return list(search_contacts(Contact.objects.filter(organization=self.org), term).values_list("id", flat=True))
+
+
+class SearchTests(SearchMixin, TestCase):
+    def test_matches_any_fallback_field(self):
+        by_name = Contact.objects.create(organization=self.org, full_name="Ada Lovelace")
+        by_email = Contact.objects.create(organization=self.org, full_name="X", email="ada@example.com")
+        Contact.objects.create(organization=self.org, full_name="Grace Hopper")
+        self.assertEqual(set(self._search("ada")), {by_name.id, by_email.id})
+
+    def test_blank_term_returns_the_queryset(self):
+        Contact.objects.create(organization=self.org, full_name="Ada")
+        self.assertEqual(search_contacts(Contact.objects.all(), "  ").count(), 1)
+
+    def test_prefix_query_ands_every_token(self):
+        self.assertEqual(prefix_query("Jo  Smi-th").source_expressions[-1].value, "jo:* & smi:* & th:*")
+        self.assertIsNone(prefix_query("  -- "))
+
+
+@skipUnless(connection.vendor == "postgresql", "tsvector/pg_trgm search needs PostgreSQL")
+class PostgresSearchTests(SearchMixin, TestCase):
+    def test_partial_words_match_the_search_vector(self):
+        ada = Contact.objects.create(organization=self.org, full_name="Ada Lovelace", notes="analytical engine")
+        Contact.objects.create(organization=self.org, full_name="Adam Smith")
+        self.assertEqual(self._search("lov ad"), [ada.id])
+        self.assertEqual(self._search("analyt"), [ada.id])
+
+    def test_closer_matches_rank_first(self):
+        loose = Contact.objects.create(organization=self.org, full_name="B", email="ada@x.io.archive.example.com")
+        exact = Contact.objects.create(organization=self.org, full_name="A", email="ada@x.io")
+        self.assertEqual(self._search("ada@x.io"), [exact.id, loose.id])
+
+    def test_phone_and_email_substrings_use_icontains(self):
+        phone = Contact.objects.create(organization=self.org, full_name="P", phone_whatsapp="+15550001111")
+        email = Contact.objects.create(organization=self.org, full_name="E", email="Someone@Example.com")
+        self.assertEqual(self._search("5550001"), [phone.id])
+        self.assertEqual(self._search("EXAMPLE.C"), [email.id])
+
+
+class AttributeParamsTests(TestCase):
+    def test_attribute_params_split_tags_and_metadata(self):
+        tags, metadata = attribute_params(QueryDict("tag=vip&tag=&tag=b2b&metadata.company.name=Acme&metadata.=x&q=1"))
+        self.assertEqual(tags, ["vip", "b2b"])
+        self.assertEqual(metadata, {"company.name": "Acme"})
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.test import TestCase
+from django.utils import timezone
+
+from contacts import segments
+from contacts.importer import run_import
+from contacts.models import Contact, ContactImportJob, Segment
+from contacts.segments import compile_rules, metadata_path, rule_fields
+from contacts.services import bulk_upsert_contacts
+from corbi.testing import OrgAPITestMixin, TempMediaMixin
+
+
+class CompileRulesTests(TestCase):
+    def test_leaves_compile_to_containment_lookups(self):
+        self.assertEqual(
+            compile_rules({"field": "tags", "op": "contains_all", "value": ["vip", "b2b"]}), Q(tags__contains=["vip", "b2b"])
+        )
+        self.assertEqual(
+            compile_rules({"field": "tags", "op": "contains_any", "value": ["vip", "b2b"]}),
+            Q(tags__contains=["vip"]) | Q(tags__contains=["b2b"]),
+        )
+        self.assertEqual(
+            compile_rules({"field": "metadata", "op": "equals", "key": "company.name", "value": "Acme"}),
+            Q(metadata__contains={"company": {"name": "Acme"}}),
+        )
+
+    def test_combinators_nest(self):
+        now = timezone.now()
+        rules = {
+            "all": [
+                {"field": "status", "op": "in", "value": "active"},
+                {"not": {"field": "last_inbound_at", "op": "within_days", "value": 7}},
+            ]
+        }
+        expected = Q(status__in=["active"]) & ~Q(last_inbound_at__gte=now - timedelta(days=7))
+        self.assertEqual(compile_rules(rules, now=now), expected)
+
+    def test_malformed_trees_raise_value_error(self):
+        for rules in [
+            {},
+            {"all": []},
+            {"all": [{"field": "status", "op": "in", "value": ["active"]}], "any": []},
+            {"field": "status", "op": "in", "value": ["nope"]},
+            {"field": "tags", "op": "equals", "value": ["vip"]},
+            {"field": "tags", "op": "contains_all", "value": []},
+            {"field": "last_inbound_at", "op": "within_days", "value": -1},
+            {"field": "metadata", "op": "equals", "key": ".", "value": 1},
+            {"field": "unknown", "op": "in", "value": 1},
+        ]:
+            with self.subTest(rules=rules), self.assertRaises(ValueError):
+                compile_rules(rules)
+
+    def test_depth_and_rule_limits(self):
+        leaf = {"field": "status", "op": "in", "value": ["active"]}
+        deep = leaf
+        for _ in range(segments.SEGMENT_MAX_DEPTH + 1):
+            deep = {"not": deep}
+        with self.assertRaises(ValueError):
+            compile_rules(deep)
+        with self.assertRaises(ValueError):
+            compile_rules({"any": [leaf] * (segments.SEGMENT_MAX_RULES + 1)})
+        compile_rules({"any": [leaf] * segments.SEGMENT_MAX_RULES})
+
+    def test_metadata_path_skips_empty_parts(self):
+        self.assertEqual(metadata_path("a..b", 1), {"a": {"b": 1}})
+
+
+class CompileRulesQueryTests(OrgAPITestMixin, TestCase):
+    def test_inbound_and_status_rules_select_matching_contacts(self):
+        now = timezone.now()
+        recent = Contact.objects.create(organization=self.org, full_name="Recent", last_inbound_at=now - timedelta(days=1))
+        stale = Contact.objects.create(organization=self.org, full_name="Stale", last_inbound_at=now - timedelta(days=60))
+        never = Contact.objects.create(organization=self.org, full_name="Never", status="unsubscribed")
+        contacts = Contact.objects.filter(organization=self.org)
+
+        def ids(rules):
+            return set(contacts.filter(compile_rules(rules, now=now)).values_list("id", flat=True))
+
+        self.assertEqual(ids({"field": "last_inbound_at", "op": "within_days", "value": 30}), {recent.id})
+        self.assertEqual(ids({"field": "last_inbound_at", "op": "older_than_days", "value": 30}), {stale.id, never.id})
+        unsubscribed = {"field": "status", "op": "in", "value": ["unsubscribed"]}
+        active_lately = {"field": "last_inbound_at", "op": "within_days", "value": 30}
+        self.assertEqual(ids({"any": [unsubscribed, active_lately]}), {recent.id, never.id})
+
+
+class SegmentRefreshQueueTests(TempMediaMixin, OrgAPITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Segment.objects.create(
+            organization=self.org,
+            name="vip on whatsapp",
+            materialized=True,
+            refreshed_at=timezone.now(),
+            rules={"all": [{"field": "tags", "op": "contains_all", "value": ["vip"]}, {"field": "channel", "op": "available", "value": "whatsapp"}]},
+        )
+
+    def test_rule_fields_cover_channel_predicates(self):
+        self.assertEqual(
+            rule_fields(Segment.objects.values_list("rules", flat=True)), {"tags", "phone_whatsapp", "whatsapp_blocked"}
+        )
+        self.assertEqual(rule_fields([{"field": "nope"}]), set())
+
+    def test_saves_queue_a_refresh_only_when_a_rule_field_changed(self):
+        with mock.patch("contacts.tasks.refresh_contact_segments.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                contact = Contact.objects.create(organization=self.org, full_name="Ada")
+            self.assertEqual(delay.call_count, 1)
+            contact = Contact.objects.get(pk=contact.pk)
+            with self.captureOnCommitCallbacks(execute=True):
+                contact.notes = "met at the fair"
+                contact.save()
+                contact.save(update_fields=["full_name"])
+            self.assertEqual(delay.call_count, 1)
+            with self.captureOnCommitCallbacks(execute=True):
+                contact.tags.append("vip")
+                contact.save()
+                # compared against the previous save, not the original load
+                contact.save()
+            self.assertEqual(delay.call_count, 2)
+            with self.captureOnCommitCallbacks(execute=True):
+                contact.whatsapp_blocked = True
+                contact.save(update_fields=["whatsapp_blocked"])
+            self.assertEqual(delay.call_count, 3)
+
+    def test_bulk_loads_queue_one_org_refresh(self):
+        with mock.patch("contacts.tasks.refresh_segments.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                bulk_upsert_contacts(self.org, [{"phone": "+15550001111"}, {"phone": "+15550002222"}])
+            delay.assert_called_once_with(self.org.id)
+            delay.reset_mock()
+            job = ContactImportJob.objects.create(organization=self.org, format=ContactImportJob.FORMAT_CSV)
+            job.file.save("import.csv", ContentFile(b"name,email\nA,a@example.com\nB,b@example.com\n"))
+            with self.captureOnCommitCallbacks(execute=True):
+                run_import(job)
+            delay.assert_called_once_with(self.org.id)
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from django.test import TestCase
+
+from contacts.importer import ChunkResult, resolve_identities
+from contacts.models import Contact
+from contacts.services import bulk_upsert_contacts, normalize_phone
+from corbi.testing import OrgAPITestMixin
+
+
+class NormalizeTests(TestCase):
+    def test_phone_drops_separators_and_international_prefix(self):
+        self.assertEqual(normalize_phone(" +1 (555) 000-1234 "), "+15550001234")
+        self.assertEqual(normalize_phone("0044 20.7946.0000"), "+442079460000")
+        self.assertEqual(normalize_phone(None), "")
+
+
+class BulkUpsertTests(OrgAPITestMixin, TestCase):
+    def test_matches_existing_and_creates_the_rest(self):
+        known = Contact.objects.create(organization=self.org, full_name="Known", email="known@example.com")
+        result = bulk_upsert_contacts(
+            self.org,
+            [
+                {"email": " KNOWN@example.com "},
+                {"phone": "+1 555 000 1111", "name": "New"},
+                {"phone": "+15550001111"},
+                {"name": "no identifier"},
+            ],
+        )
+        new = Contact.objects.get(phone_whatsapp="+15550001111")
+        self.assertEqual(result.contact_ids, [known.id, new.id, new.id, None])
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.unique_ids, [known.id, new.id])
+
+    def test_email_wins_when_identifiers_match_different_contacts(self):
+        by_email = Contact.objects.create(organization=self.org, full_name="E", email="e@example.com")
+        Contact.objects.create(organization=self.org, full_name="P", phone_whatsapp="+15550002222")
+        result = bulk_upsert_contacts(self.org, [{"email": "e@example.com", "phone": "+15550002222"}])
+        self.assertEqual(result.contact_ids, [by_email.id])
+
+    def test_import_resolves_to_the_same_contact_as_an_upload(self):
+        by_email = Contact.objects.create(organization=self.org, full_name="E", email="e@example.com")
+        Contact.objects.create(organization=self.org, full_name="P", phone_whatsapp="+15550002222")
+        row = {
+            "row_no": 2,
+            "contact_id": None,
+            "email": "e@example.com",
+            "phone_whatsapp": "+15550002222",
+            "telegram_chat_id": "",
+            "instagram_scoped_id": "",
+            "instagram_user_id": "",
+        }
+        chunk = ChunkResult(rows=[row])
+        resolve_identities(self.org, chunk)
+        upload = bulk_upsert_contacts(self.org, [{"email": "e@example.com", "phone": "+15550002222"}])
+        self.assertEqual(chunk.rows[0]["contact_id"], upload.contact_ids[0])
+        self.assertEqual(chunk.rows[0]["contact_id"], by_email.id)
+        # the phone belongs to another contact and is not copied onto the match
+        self.assertEqual(chunk.rows[0]["phone_whatsapp"], "")
+        self.assertEqual(chunk.errors, [])
+
+
+class ContactSerializerNormalizationTests(OrgAPITestMixin, TestCase):
+    def test_created_contacts_store_canonical_identifiers(self):
+        response = self.client.post(
+            "/api/contacts/",
+            {"full_name": "Ann", "email": "Ann@Example.com", "phone_whatsapp": "0044 20 7946 0000"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        contact = Contact.objects.get(pk=response.data["id"])
+        self.assertEqual((contact.email, contact.phone_whatsapp), ("ann@example.com", "+442079460000"))
+        upload = bulk_upsert_contacts(self.org, [{"phone": "+44 20 7946 0000"}])
+        self.assertEqual(upload.contact_ids, [contact.id])
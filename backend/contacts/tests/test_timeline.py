@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from contacts.models import Contact
+from corbi.testing import OrgAPITestMixin
+from messaging.models import InboundMessage, OutboundMessage
+
+
+class TimelineTests(OrgAPITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.contact = Contact.objects.create(organization=self.org, full_name="A", email="a@example.com")
+        self.now = timezone.now().replace(microsecond=123456)
+        # three outbound rows share one timestamp with an inbound row: ties break on source rank, then id (both descending)
+        self.outbound = [
+            OutboundMessage.objects.create(organization=self.org, contact=self.contact, channel="sms", body=f"out {i}")
+            for i in range(3)
+        ]
+        OutboundMessage.objects.filter(id__in=[m.id for m in self.outbound]).update(created_at=self.now)
+        self.inbound = InboundMessage.objects.create(
+            organization=self.org, contact=self.contact, channel="sms", payload={"text": "hi"}, received_at=self.now
+        )
+        self.older = InboundMessage.objects.create(
+            organization=self.org,
+            contact=self.contact,
+            channel="sms",
+            payload={"text": "first"},
+            received_at=self.now - timedelta(days=1),
+        )
+        other = Contact.objects.create(organization=self.org, full_name="B")
+        InboundMessage.objects.create(organization=self.org, contact=other, channel="sms", payload={"text": "not theirs"})
+
+    def _pages(self, **params):
+        url, items = f"/api/contacts/{self.contact.id}/timeline/", []
+        cursor = None
+        while True:
+            response = self.client.get(url, {**params, **({"cursor": cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            items += [(item["type"], item["id"]) for item in response.json()["results"]]
+            cursor = response.json()["next_cursor"]
+            if not cursor:
+                return items
+
+    def test_pages_walk_every_item_once_in_order(self):
+        newest_outbound = [("outbound", m.id) for m in reversed(self.outbound)]
+        expected = [("inbound", self.inbound.id), *newest_outbound, ("inbound", self.older.id)]
+        self.assertEqual(self._pages(limit=2), expected)
+        self.assertEqual(self._pages(limit=50), expected)
+
+    def test_types_filter_and_bad_input(self):
+        self.assertEqual(self._pages(types="inbound"), [("inbound", self.inbound.id), ("inbound", self.older.id)])
+        url = f"/api/contacts/{self.contact.id}/timeline/"
+        self.assertEqual(self.client.get(url, {"types": "fax"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"cursor": "garbage"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"limit": "x"}).status_code, 400)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import base64
+import heapq
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from bookings.models import Booking
+from messaging.conversations import inbound_text, message_snippet
+from messaging.models import EmailRecipient, InboundMessage, InstagramMessage, OutboundMessage, TelegramMessage, WhatsAppMessage
+
+TIMELINE_PAGE_SIZE = 50
+TIMELINE_MAX_PAGE_SIZE = 200
+
+
+def _channel_message(channel: str) -> Callable[[dict], dict]:
+    def build(row: dict) -> dict:
+        return {
+            "channel": channel,
+            "direction": row["direction"].lower(),
+            "message_type": row["message_type"].lower(),
+            "summary": message_snippet(row["text"]),
+            "status": row["status"],
+        }
+
+    return build
+
+
+@dataclass(frozen=True)
+class TimelineSource:
+    name: str
+    model: type
+    timestamp: str
+    fields: tuple[str, ...]
+    build: Callable[[dict], dict]
+    org_path: str = "organization_id"
+
+    def queryset(self, contact):
+        return self.model.objects.filter(contact_id=contact.id, **{self.org_path: contact.organization_id})
+
+
+# order matters: it breaks ties between sources with identical timestamps
+SOURCES = [
+    TimelineSource(
+        "outbound",
+        OutboundMessage,
+        "created_at",
+        ("channel", "body", "status"),
+        lambda row: {
+            "channel": row["channel"],
+            "direction": "outbound",
+            "summary": message_snippet(row["body"]),
+            "status": row["status"],
+        },
+    ),
+    TimelineSource(
+        "inbound",
+        InboundMessage,
+        "received_at",
+        ("channel", "payload"),
+        lambda row: {"channel": row["channel"], "direction": "inbound", "summary": message_snippet(inbound_text(row["payload"]))},
+    ),
+    TimelineSource("whatsapp", WhatsAppMessage, "created_at", ("direction", "message_type", "text", "status"), _channel_message("whatsapp")),
+    TimelineSource("telegram", TelegramMessage, "created_at", ("direction", "message_type", "text", "status"), _channel_message("telegram")),
+    TimelineSource("instagram", InstagramMessage, "created_at", ("direction", "message_type", "text", "status"), _channel_message("instagram")),
+    TimelineSource(
+        "email",
+        EmailRecipient,
+        "created_at",
+        ("job_id", "job__subject", "status", "sent_at", "read_at"),
+        lambda row: {
+            "channel": "email",
+            "direction": "outbound",
+            "summary": message_snippet(row["job__subject"]),
+            "status": row["status"],
+            "email_job": row["job_id"],
+            "sent_at": row["sent_at"],
+            "read_at": row["read_at"],
+        },
+        org_path="job__organization_id",
+    ),
+    TimelineSource(
+        "booking",
+        Booking,
+        "created_at",
+        ("title", "status", "start_time", "end_time"),
+        lambda row: {
+            "summary": message_snippet(row["title"]),
+            "status": row["status"],
+            "start_time": row["start_time"],
+            "end_time": row["end_time"],
+        },
+    ),
+]
+SOURCE_NAMES = [source.name for source in SOURCES]
+
+
+def encode_cursor(timestamp: datetime, rank: int, pk: int) -> str:
+    raw = json.dumps({"t": timestamp.isoformat(), "r": rank, "i": pk}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int, int]:
+    """Raises ValueError for anything that is not a cursor we issued."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        timestamp = parse_datetime(data["t"])
+        rank, pk = int(data["r"]), int(data["i"])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if timestamp is None:
+        raise ValueError("Invalid cursor")
+    return timestamp, rank, pk
+
+
+def _after(source: TimelineSource, rank: int, cursor: tuple[datetime, int, int]) -> Q:
+    """Rows that sort after the cursor in (timestamp, source rank, id) descending order."""
+    timestamp, cursor_rank, cursor_pk = cursor
+    ts = source.timestamp
+    if rank < cursor_rank:
+        return Q(**{f"{ts}__lte": timestamp})
+    if rank == cursor_rank:
+        return Q(**{f"{ts}__lt": timestamp}) | Q(**{ts: timestamp, "id__lt": cursor_pk})
+    return Q(**{f"{ts}__lt": timestamp})
+
+
+def _source_rows(source: TimelineSource, rank: int, contact, cursor, limit: int) -> Iterator[tuple]:
+    qs = source.queryset(contact)
+    if cursor is not None:
+        qs = qs.filter(_after(source, rank, cursor))
+    rows = qs.order_by(f"-{source.timestamp}", "-id").values("id", source.timestamp, *source.fields)[:limit]
+    for row in rows:
+        yield (row[source.timestamp], rank, row["id"]), row
+
+
+def contact_timeline(contact, *, cursor: str | None = None, limit: int = TIMELINE_PAGE_SIZE, types: list[str] | None = None) -> dict:
+    """
+    One page of a contact's history across every activity table, newest first.
+    Each source runs one keyset query on its (contact, timestamp, id) index for at most limit+1
+    rows; the streams are k-way merged and the page is cut at `limit`. `cursor` is opaque and
+    encodes the last item's (timestamp, source, id).
+    """
+    position = decode_cursor(cursor) if cursor else None
+    streams = [
+        _source_rows(source, rank, contact, position, limit + 1)
+        for rank, source in enumerate(SOURCES)
+        if not types or source.name in types
+    ]
+    results, last_key = [], None
+    for key, row in heapq.merge(*streams, key=lambda item: item[0], reverse=True):
+        if len(results) == limit:
+            return {"results": results, "next_cursor": encode_cursor(*last_key)}
+        timestamp, rank, pk = key
+        source = SOURCES[rank]
+        results.append({"type": source.name, "id": pk, "timestamp": timestamp, **source.build(row)})
+        last_key = key
+    return {"results": results, "next_cursor": None}
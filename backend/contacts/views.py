@@ -1,28 +1,47 @@
 from __future__ import annotations
 
-from rest_framework import filters, viewsets
+import os
+
+from rest_framework import filters, mixins, parsers, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db import models
+from django.conf import settings
+from django.http import FileResponse
 
-from .models import Contact, ContactGroup
+from .models import Contact, ContactGroup, ContactImportJob, DedupJob, DuplicateCandidate, Segment
+from .search import TAG_FACET_LIMIT, ContactAttributeFilter, ContactSearchFilter, attribute_params, tag_facets
+from .dedup import DEDUP_MIN_SCORE, merge_contacts
+from .segments import compile_rules, segment_members_q
+from .timeline import SOURCE_NAMES, TIMELINE_MAX_PAGE_SIZE, TIMELINE_PAGE_SIZE, contact_timeline
+from .services import add_group_members, filter_contacts, remove_group_members
 from .serializers import (
     ContactSerializer,
     IdentityConflictSerializer,
     ContactGroupSerializer,
     ContactEngagementSerializer,
+    ContactImportJobSerializer,
+    ContactMergeSerializer,
+    DedupJobSerializer,
+    DuplicateCandidateSerializer,
+    SegmentSerializer,
 )
+from .tasks import import_contacts, merge_duplicates, refresh_segment, run_dedup
+from messaging.exports import export_or_queue
+from messaging.models import ExportJob
 from organizations.utils import get_current_org
 from organizations.permissions import IsOrgMemberWithRole
 
+IMPORT_MAX_BYTES = int(getattr(settings, "CONTACT_IMPORT_MAX_BYTES", 50 * 1024 * 1024))
+MERGE_MAX_CONTACTS = 50
+IMPORT_EXTENSIONS = {".csv": ContactImportJob.FORMAT_CSV, ".jsonl": ContactImportJob.FORMAT_JSONL, ".ndjson": ContactImportJob.FORMAT_JSONL}
+
 
 class ContactViewSet(viewsets.ModelViewSet):
     queryset = Contact.objects.all()
     serializer_class = ContactSerializer
     permission_classes = [IsOrgMemberWithRole]
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
-    search_fields = ["full_name", "email", "phone_whatsapp", "telegram_chat_id", "instagram_scoped_id", "tags"]
+    filter_backends = [ContactSearchFilter, ContactAttributeFilter, DjangoFilterBackend]
     filterset_fields = ["status", "groups"]
 
     @action(detail=True, methods=["post"])
@@ -49,12 +68,53 @@ class ContactViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         org = get_current_org(self.request)
-        return super().get_queryset().filter(organization=org).prefetch_related("groups")
+        return super().get_queryset().filter(organization=org).defer("search_vector").prefetch_related("groups")
 
     def perform_create(self, serializer):
         org = get_current_org(self.request)
         serializer.save(organization=org)
 
+    @action(detail=True, methods=["post"])
+    def merge(self, request, pk=None):
+        """Body: {"contact_ids": [...]}; fold those contacts (and their history) into this one."""
+        contact = self.get_object()
+        org = get_current_org(request)
+        try:
+            ids = [int(cid) for cid in request.data.get("contact_ids") or []]
+        except (TypeError, ValueError):
+            return Response({"detail": "contact_ids must be a list of integers"}, status=400)
+        ids = [cid for cid in dict.fromkeys(ids) if cid != contact.id]
+        if not ids:
+            return Response({"detail": "contact_ids is required"}, status=400)
+        if len(ids) > MERGE_MAX_CONTACTS:
+            return Response({"detail": f"At most {MERGE_MAX_CONTACTS} contacts can be merged at once"}, status=400)
+        if Contact.objects.filter(organization=org, id__in=ids).count() != len(ids):
+            return Response({"detail": "Contact not found"}, status=404)
+        merges = merge_contacts(org, {contact.id: ids}, user=request.user)
+        contact = self.get_queryset().get(pk=contact.id)
+        return Response({"contact": ContactSerializer(contact).data, "merge": ContactMergeSerializer(merges[0]).data})
+
+    @action(detail=True, methods=["get"])
+    def timeline(self, request, pk=None):
+        """
+        Messages, email sends and bookings for this contact, newest first.
+        `?cursor=` from the previous page's next_cursor, `?limit=` (max 200), `?types=whatsapp,email`.
+        """
+        contact = self.get_object()
+        try:
+            limit = min(max(int(request.query_params.get("limit", TIMELINE_PAGE_SIZE)), 1), TIMELINE_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({"detail": "limit must be an integer"}, status=400)
+        types = [t for t in request.query_params.get("types", "").split(",") if t]
+        unknown = set(types) - set(SOURCE_NAMES)
+        if unknown:
+            return Response({"detail": f"Unknown types: {', '.join(sorted(unknown))}"}, status=400)
+        try:
+            page = contact_timeline(contact, cursor=request.query_params.get("cursor"), limit=limit, types=types)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        return Response(page)
+
     @action(detail=True, methods=["get"])
     def engagements(self, request, pk=None):
         contact = self.get_object()
@@ -62,6 +122,63 @@ class ContactViewSet(viewsets.ModelViewSet):
         serializer = ContactEngagementSerializer(qs, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=["get"])
+    def tags(self, request):
+        """Tag facet counts for the contacts matching the current list filters (`?limit=`, default 50)."""
+        try:
+            limit = min(max(int(request.query_params.get("limit", TAG_FACET_LIMIT)), 1), 500)
+        except ValueError:
+            return Response({"detail": "limit must be an integer"}, status=400)
+        return Response(tag_facets(self.filter_queryset(self.get_queryset()), limit))
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """
+        Stream contacts (with groups and tags) as CSV/JSONL; accepts the list filters
+        status, groups, search, tag and metadata.<key>.
+        """
+        org = get_current_org(request)
+        tags, metadata = attribute_params(request.query_params)
+        params = {
+            "status": request.query_params.get("status") or None,
+            "groups": [int(g) for g in request.query_params.getlist("groups") if g.isdigit()],
+            "search": request.query_params.get("search") or None,
+            "tags": tags,
+            "metadata": metadata,
+        }
+        return export_or_queue(request, org, ExportJob.KIND_CONTACTS, {k: v for k, v in params.items() if v}, "contacts")
+
+    @action(detail=False, methods=["post"], url_path="import", parser_classes=[parsers.MultiPartParser, parsers.FormParser])
+    def import_file(self, request):
+        """
+        Queue a CSV/JSONL contact import. The file is stored and processed in chunks by a worker;
+        poll /contact-imports/{id}/ for progress.
+        """
+        org = get_current_org(request)
+        upload = request.FILES.get("file")
+        if not upload:
+            return Response({"detail": "file is required"}, status=400)
+        if upload.size > IMPORT_MAX_BYTES:
+            return Response({"detail": f"File exceeds {IMPORT_MAX_BYTES // (1024 * 1024)}MB limit"}, status=400)
+        fmt = request.data.get("format") or IMPORT_EXTENSIONS.get(os.path.splitext(upload.name)[1].lower())
+        if fmt not in dict(ContactImportJob.FORMAT_CHOICES):
+            return Response({"detail": "format must be csv or jsonl"}, status=400)
+        group = None
+        if request.data.get("group_id"):
+            group = ContactGroup.objects.filter(organization=org, id=request.data.get("group_id")).first()
+            if not group:
+                return Response({"detail": "Group not found"}, status=404)
+        job = ContactImportJob.objects.create(
+            organization=org,
+            created_by=request.user if request.user.is_authenticated else None,
+            group=group,
+            file=upload,
+            format=fmt,
+        )
+        import_contacts.delay(job.id)
+        job.refresh_from_db()
+        return Response(ContactImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
 
 class ContactGroupViewSet(viewsets.ModelViewSet):
     queryset = ContactGroup.objects.all()
@@ -72,7 +189,182 @@ class ContactGroupViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         org = get_current_org(self.request)
-        return ContactGroup.objects.filter(organization=org).annotate(contacts_count=models.Count("contacts"))
+        return ContactGroup.objects.filter(organization=org)
 
     def perform_create(self, serializer):
         serializer.save()
+
+    @action(detail=True, methods=["post"])
+    def add_members(self, request, pk=None):
+        """Body: {"contact_ids": [...]} or {"filter": {...}}; one INSERT ... SELECT into the membership table."""
+        return self._change_members(request, add_group_members, "added")
+
+    @action(detail=True, methods=["post"])
+    def remove_members(self, request, pk=None):
+        """Body: {"contact_ids": [...]} or {"filter": {...}}; one DELETE from the membership table."""
+        return self._change_members(request, remove_group_members, "removed")
+
+    def _change_members(self, request, apply, key: str):
+        group = self.get_object()
+        org = get_current_org(request)
+        contact_ids = request.data.get("contact_ids")
+        spec = request.data.get("filter")
+        if contact_ids and spec:
+            return Response({"detail": "Provide contact_ids or filter, not both"}, status=400)
+        if contact_ids:
+            try:
+                contacts = Contact.objects.filter(organization=org, id__in=[int(cid) for cid in contact_ids])
+            except (TypeError, ValueError):
+                return Response({"detail": "contact_ids must be a list of integers"}, status=400)
+        elif spec:
+            try:
+                contacts = filter_contacts(org, spec)
+            except (TypeError, ValueError) as exc:
+                return Response({"detail": f"Invalid filter: {exc}"}, status=400)
+        else:
+            return Response({"detail": "contact_ids or filter is required"}, status=400)
+        changed = apply(group, contacts)
+        group.refresh_from_db(fields=["member_count"])
+        return Response({key: changed, "member_count": group.member_count})
+
+
+class SegmentViewSet(viewsets.ModelViewSet):
+    queryset = Segment.objects.all()
+    serializer_class = SegmentSerializer
+    permission_classes = [IsOrgMemberWithRole]
+    filter_backends = [filters.SearchFilter]
+    search_fields = ["name", "description"]
+    preview_sample_size = 5
+
+    def get_queryset(self):
+        org = get_current_org(self.request)
+        return Segment.objects.filter(organization=org)
+
+    def perform_create(self, serializer):
+        self._refresh(serializer.save())
+
+    def perform_update(self, serializer):
+        self._refresh(serializer.save())
+
+    def _refresh(self, segment: Segment):
+        refresh_segment.delay(segment.id)
+        segment.refresh_from_db(fields=["member_count", "refreshed_at"])
+
+    @action(detail=False, methods=["post"])
+    def preview(self, request):
+        """Body: {"rules": {...}}; count and a sample of matching contacts without saving a segment."""
+        org = get_current_org(request)
+        try:
+            q = compile_rules(request.data.get("rules"))
+        except ValueError as exc:
+            return Response({"detail": f"Invalid rules: {exc}"}, status=400)
+        qs = Contact.objects.filter(organization=org).filter(q)
+        sample = qs.order_by("id").values("id", "full_name", "email", "phone_whatsapp")[: self.preview_sample_size]
+        return Response({"count": qs.count(), "sample": list(sample)})
+
+    @action(detail=True, methods=["get"])
+    def contacts(self, request, pk=None):
+        segment = self.get_object()
+        qs = Contact.objects.filter(organization=segment.organization).filter(segment_members_q(segment)).defer("search_vector")
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            return self.get_paginated_response(ContactSerializer(page, many=True).data)
+        return Response(ContactSerializer(qs, many=True).data)
+
+    @action(detail=True, methods=["post"])
+    def refresh(self, request, pk=None):
+        """Re-sync a materialized segment (or recount a dynamic one) in the background."""
+        segment = self.get_object()
+        refresh_segment.delay(segment.id)
+        segment.refresh_from_db(fields=["member_count", "refreshed_at"])
+        return Response(SegmentSerializer(segment, context={"request": request}).data, status=status.HTTP_202_ACCEPTED)
+
+
+class DedupJobViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
+    queryset = DedupJob.objects.all()
+    serializer_class = DedupJobSerializer
+    permission_classes = [IsOrgMemberWithRole]
+
+    def get_queryset(self):
+        org = get_current_org(self.request)
+        return super().get_queryset().filter(organization=org)
+
+    def create(self, request, *args, **kwargs):
+        """Queue a duplicate scan (`min_score` optional); poll the job, then page through /candidates/."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = serializer.save(
+            organization=get_current_org(request),
+            min_score=serializer.validated_data.get("min_score", DEDUP_MIN_SCORE),
+            created_by=request.user if request.user.is_authenticated else None,
+        )
+        run_dedup.delay(job.id)
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=["get"])
+    def candidates(self, request, pk=None):
+        """Scored pairs, best first; `?status=` (default pending) and `?min_score=`."""
+        job = self.get_object()
+        qs = job.candidates.filter(status=request.query_params.get("status") or DuplicateCandidate.STATUS_PENDING)
+        if request.query_params.get("min_score"):
+            try:
+                qs = qs.filter(score__gte=float(request.query_params["min_score"]))
+            except ValueError:
+                return Response({"detail": "min_score must be a number"}, status=400)
+        qs = qs.select_related("contact_a", "contact_b")
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            return self.get_paginated_response(DuplicateCandidateSerializer(page, many=True).data)
+        return Response(DuplicateCandidateSerializer(qs, many=True).data)
+
+    @action(detail=True, methods=["post"])
+    def merge(self, request, pk=None):
+        """
+        Body: {"candidate_ids": [...]} or {"min_score": 0.9}. Pairs are grouped into clusters and each
+        cluster is merged into its best-populated contact by a worker.
+        """
+        job = self.get_object()
+        candidate_ids, min_score = request.data.get("candidate_ids"), request.data.get("min_score")
+        if candidate_ids is None and min_score is None:
+            return Response({"detail": "candidate_ids or min_score is required"}, status=400)
+        try:
+            candidate_ids = [int(cid) for cid in candidate_ids] if candidate_ids is not None else None
+            min_score = float(min_score) if min_score is not None else None
+        except (TypeError, ValueError):
+            return Response({"detail": "candidate_ids must be integers and min_score a number"}, status=400)
+        merge_duplicates.delay(job.id, candidate_ids, min_score, request.user.id if request.user.is_authenticated else None)
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=["post"])
+    def dismiss(self, request, pk=None):
+        """Body: {"candidate_ids": [...]}; mark pairs as not duplicates."""
+        job = self.get_object()
+        try:
+            candidate_ids = [int(cid) for cid in request.data.get("candidate_ids") or []]
+        except (TypeError, ValueError):
+            return Response({"detail": "candidate_ids must be a list of integers"}, status=400)
+        dismissed = job.candidates.filter(id__in=candidate_ids, status=DuplicateCandidate.STATUS_PENDING).update(
+            status=DuplicateCandidate.STATUS_DISMISSED
+        )
+        return Response({"dismissed": dismissed})
+
+
+class ContactImportJobViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    queryset = ContactImportJob.objects.all()
+    serializer_class = ContactImportJobSerializer
+    permission_classes = [IsOrgMemberWithRole]
+
+    def get_queryset(self):
+        org = get_current_org(self.request)
+        return super().get_queryset().filter(organization=org)
+
+    @action(detail=True, methods=["get"], url_path="error-report")
+    def error_report(self, request, pk=None):
+        job = self.get_object()
+        if not job.error_report:
+            return Response({"detail": "No error report for this import"}, status=404)
+        return FileResponse(
+            job.error_report.open("rb"), as_attachment=True, filename=f"contact-import-{job.id}-errors.csv", content_type="text/csv"
+        )
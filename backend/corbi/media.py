@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views import View
+
+# only these storage prefixes are public; exports, imports and staged uploads have their own access paths
+MEDIA_PUBLIC_PREFIXES = tuple(
+    getattr(settings, "MEDIA_PUBLIC_PREFIXES", ("attachments/", "email_attachments/", "branding/", "profile_avatars/"))
+)
+# "" serves bytes from Django; "x-accel-redirect" (nginx) or "x-sendfile" (Apache/lighttpd) hands them to the web server
+MEDIA_SENDFILE = getattr(settings, "MEDIA_SENDFILE", "")
+MEDIA_ACCEL_REDIRECT_PREFIX = getattr(settings, "MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+MEDIA_CACHE_SECONDS = int(getattr(settings, "MEDIA_CACHE_SECONDS", 3600))
+IMMUTABLE_CACHE_SECONDS = 365 * 24 * 3600
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# content-addressed blobs (messaging.models.attachment_blob_path) are named by the SHA-256 of their bytes;
+# image variants (messaging.imaging) by that hash plus the versioned profile that produced them
+CONTENT_ADDRESSED_RE = re.compile(
+    r"^attachments/\d+/(?:[0-9a-f]{2}|variants)/(?P<key>[0-9a-f]{64}(?:-[a-z]+-v\d+)?)(\.\w+)?$"
+)
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _etag(path: str, stat: os.stat_result) -> str:
+    match = CONTENT_ADDRESSED_RE.match(path)
+    if match:
+        return f'"{match.group("key")}"'
+    return f'W/"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    (start, end) inclusive for a single `bytes=` range, None when the header should be ignored
+    (absent, malformed, multi-range). Raises ValueError for an unsatisfiable range.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+def _file_range(path: str, start: int, length: int):
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+class MediaView(View):
+    """
+    Public media under MEDIA_URL for browsers and provider fetches (Twilio, Meta): ETag and
+    Last-Modified validators with 304s, single byte ranges, immutable caching for content-addressed
+    attachments, and optional X-Accel-Redirect/X-Sendfile so the web server moves the bytes.
+    """
+
+    def get(self, request, path):
+        if not path.startswith(MEDIA_PUBLIC_PREFIXES):
+            raise Http404("Not found")
+        try:
+            full_path = safe_join(settings.MEDIA_ROOT, path)
+        except SuspiciousFileOperation:
+            raise Http404("Not found") from None
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            raise Http404("Not found") from None
+        if not os.path.isfile(full_path):
+            raise Http404("Not found")
+
+        etag = _etag(path, stat)
+        immutable = etag.startswith('"')
+        headers = {
+            "ETag": etag,
+            "Last-Modified": http_date(stat.st_mtime),
+            "Cache-Control": f"public, max-age={IMMUTABLE_CACHE_SECONDS}, immutable"
+            if immutable
+            else f"public, max-age={MEDIA_CACHE_SECONDS}",
+            "Accept-Ranges": "bytes",
+        }
+        not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+        if not_modified is not None:
+            for key, value in headers.items():
+                not_modified[key] = value
+            return not_modified
+
+        content_type, encoding = mimetypes.guess_type(full_path)
+        content_type = content_type or "application/octet-stream"
+        if MEDIA_SENDFILE:
+            # the web server handles Range and streams the file; Django only authorizes and sets validators
+            response = HttpResponse(content_type=content_type)
+            if MEDIA_SENDFILE == "x-accel-redirect":
+                response["X-Accel-Redirect"] = f"{MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{path}"
+            else:
+                response["X-Sendfile"] = full_path
+            for key, value in headers.items():
+                response[key] = value
+            return response
+
+        size = stat.st_size
+        if_range = request.headers.get("If-Range")
+        try:
+            byte_range = parse_range(request.headers.get("Range", ""), size) if not if_range or if_range == etag else None
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        if byte_range is None:
+            response = FileResponse(open(full_path, "rb"), content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(_file_range(full_path, start, end - start + 1), status=206, content_type=content_type)
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+            response["Content-Length"] = str(end - start + 1)
+        if encoding:
+            response["Content-Encoding"] = encoding
+        for key, value in headers.items():
+            response[key] = value
+        return response
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import base64
+import datetime
+import json
+import operator
+from functools import reduce
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def _cursor_value(value):
+    # full isoformat: DjangoJSONEncoder drops microseconds, which would break the equality step of keyset_q
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def keyset_q(ordering: tuple[str, ...], values: list) -> Q:
+    """
+    Rows strictly after `values` in `ordering` (e.g. ("-created_at", "-id")): the row-value comparison
+    (a, b) < (x, y) spelled out as a < x OR (a = x AND b < y), which the matching composite index serves.
+    """
+    clauses = []
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        equal = {ordering[j].lstrip("-"): values[j] for j in range(i)}
+        clauses.append(Q(**equal, **{f"{name}__{lookup}": values[i]}))
+    return reduce(operator.or_, clauses)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a fixed, unique ordering (by default newest first on (created_at, id)).
+    Every page is one indexed range scan of page_size+1 rows, so deep pages cost the same as the
+    first. Cursors are opaque; the total count is only computed when asked for with ?count=true.
+    `?ordering=<first field>` reverses the direction (e.g. oldest first for chat history).
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = 50
+    page_size_query_param = "limit"
+    max_page_size = 200
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    ordering_query_param = "ordering"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_page_size(request)
+        self.active_ordering = self.get_ordering(request)
+        self.count = queryset.count() if request.query_params.get(self.count_query_param) in ("1", "true", "True") else None
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                queryset = queryset.filter(keyset_q(self.active_ordering, self.decode_cursor(cursor)))
+            except (TypeError, ValueError, DjangoValidationError):
+                raise ValidationError({self.cursor_query_param: "Invalid cursor"}) from None
+        rows = list(queryset.order_by(*self.active_ordering)[: self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        page = rows[: self.limit]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, request) -> tuple[str, ...]:
+        primary = self.ordering[0].lstrip("-")
+        requested = request.query_params.get(self.ordering_query_param)
+        if requested not in (primary, f"-{primary}"):
+            return tuple(self.ordering)
+        if requested.startswith("-") == self.ordering[0].startswith("-"):
+            return tuple(self.ordering)
+        return tuple(field[1:] if field.startswith("-") else f"-{field}" for field in self.ordering)
+
+    def encode_cursor(self, row) -> str:
+        values = [getattr(row, field.lstrip("-")) for field in self.active_ordering]
+        raw = json.dumps(values, default=_cursor_value, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str) -> list:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        except ValueError:
+            values = None
+        if not isinstance(values, list) or len(values) != len(self.active_ordering):
+            raise ValidationError({self.cursor_query_param: "Invalid cursor"})
+        return values
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        body = {"next": self.get_next_link(), "next_cursor": self.next_cursor}
+        if self.count is not None:
+            body["count"] = self.count
+        body["results"] = data
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "next_cursor": {"type": "string", "nullable": True},
+                "count": {"type": "integer"},
+                "results": schema,
+            },
+        }
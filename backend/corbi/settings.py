@@ -131,6 +131,12 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io")
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# "x-accel-redirect" (nginx, internal location at MEDIA_ACCEL_REDIRECT_PREFIX) or "x-sendfile" offloads media bytes
+MEDIA_SENDFILE = os.getenv("MEDIA_SENDFILE", "")
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+MEDIA_CACHE_SECONDS = int(os.getenv("MEDIA_CACHE_SECONDS", 3600))
+# downscale/recompress outbound images per channel profile (messaging.imaging) before provider upload
+MEDIA_IMAGE_OPTIMIZATION = os.getenv("MEDIA_IMAGE_OPTIMIZATION", "true").lower() == "true"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 ENVIRONMENT = os.getenv("ENVIRONMENT", "DEV")
@@ -171,12 +177,51 @@ SIMPLE_JWT = {
 ###############################################################################
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Shared cache (audience previews etc.); per-process memory cache unless CACHE_URL points at Redis
+CACHE_URL = os.getenv("CACHE_URL", "")
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_URL}
+    if CACHE_URL
+    else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+AUDIENCE_PREVIEW_CACHE_SECONDS = int(os.getenv("AUDIENCE_PREVIEW_CACHE_SECONDS", 30))
+# provider media ids (e.g. Telegram file_id) per (integration, content hash), reused instead of re-uploading
+PROVIDER_MEDIA_ID_CACHE_SECONDS = int(os.getenv("PROVIDER_MEDIA_ID_CACHE_SECONDS", 30 * 24 * 3600))
+
+# Real-time message push (SSE over Redis pub/sub); empty disables publishing and the stream endpoint.
+# The stream only works under an ASGI server (uvicorn/daphne); clients poll when it is off.
+REALTIME_REDIS_URL = os.getenv("REALTIME_REDIS_URL", "")
+REALTIME_TOKEN_MAX_AGE = int(os.getenv("REALTIME_TOKEN_MAX_AGE", 3600))
+REALTIME_HEARTBEAT_SECONDS = int(os.getenv("REALTIME_HEARTBEAT_SECONDS", 15))
+
 ###############################################################################
 # Celery and task queue
 ###############################################################################
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
 CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER", "true").lower() == "true"
+CELERY_BEAT_SCHEDULE = {
+    "reconcile-group-member-counts": {
+        "task": "contacts.tasks.reconcile_group_member_counts",
+        "schedule": int(os.getenv("GROUP_COUNT_RECONCILE_SECONDS", "3600")),
+    },
+    "refresh-segments": {
+        "task": "contacts.tasks.refresh_segments",
+        "schedule": int(os.getenv("SEGMENT_REFRESH_SECONDS", "900")),
+    },
+    "expire-attachment-uploads": {
+        "task": "messaging.tasks.expire_attachment_uploads",
+        "schedule": int(os.getenv("ATTACHMENT_UPLOAD_EXPIRY_SECONDS", "3600")),
+    },
+    "maintain-message-partitions": {
+        "task": "messaging.tasks.maintain_message_partitions",
+        "schedule": int(os.getenv("MESSAGE_PARTITION_MAINTENANCE_SECONDS", "86400")),
+    },
+}
+# chunked upload sessions idle longer than this are discarded with their staged bytes
+ATTACHMENT_UPLOAD_TTL_HOURS = int(os.getenv("ATTACHMENT_UPLOAD_TTL_HOURS", 24))
+# monthly partitions created ahead for tables converted by `manage.py partition_messages`
+MESSAGE_PARTITION_MONTHS_AHEAD = int(os.getenv("MESSAGE_PARTITION_MONTHS_AHEAD", 3))
 
 # Messaging throttling (per channel)
 OUTBOUND_PER_MINUTE_LIMIT = int(os.getenv("OUTBOUND_PER_MINUTE_LIMIT", 60))
@@ -186,6 +231,13 @@ CHANNEL_THROTTLE_PER_MIN = {
     "telegram": int(os.getenv("THROTTLE_TELEGRAM_PER_MIN", OUTBOUND_PER_MINUTE_LIMIT)),
     "instagram": int(os.getenv("THROTTLE_INSTAGRAM_PER_MIN", OUTBOUND_PER_MINUTE_LIMIT)),
 }
+# Concurrent provider calls per campaign worker (per channel)
+CHANNEL_CONCURRENCY = {
+    "whatsapp": int(os.getenv("CONCURRENCY_WHATSAPP", 8)),
+    "telegram": int(os.getenv("CONCURRENCY_TELEGRAM", 8)),
+    "instagram": int(os.getenv("CONCURRENCY_INSTAGRAM", 4)),
+}
+CAMPAIGN_BATCH_SIZE = int(os.getenv("CAMPAIGN_BATCH_SIZE", 200))
 
 ###############################################################################
 # AI Assistant
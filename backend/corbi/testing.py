@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from organizations.models import Membership, Organization
+
+
+class OrgAPITestMixin:
+    """An admin member of a fresh organization and an API client sending its X-Org-ID."""
+
+    role = Membership.ROLE_ADMIN
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user("member", password="secret")
+        self.org = Organization.objects.create(name="Acme")
+        Membership.objects.create(user=self.user, organization=self.org, role=self.role)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.credentials(HTTP_X_ORG_ID=str(self.org.id))
+
+
+class TempMediaMixin:
+    """MEDIA_ROOT in a throwaway directory for tests that write files through default_storage."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp(prefix="corbi-media-")
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media_root = media_root
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import os
+
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase
+
+from corbi.media import MediaView, parse_range
+from corbi.testing import TempMediaMixin
+
+BODY = bytes(range(100))
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_single_ranges(self):
+        self.assertEqual(parse_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(parse_range("bytes=90-", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=90-500", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=-10", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=-500", 100), (0, 99))
+
+    def test_ignored_headers(self):
+        for header in ["", "bytes=-", "items=0-9", "bytes=0-9,20-29", "bytes=a-b"]:
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 100))
+
+    def test_unsatisfiable_ranges_raise(self):
+        for header in ["bytes=100-", "bytes=50-10", "bytes=-0"]:
+            with self.subTest(header=header), self.assertRaises(ValueError):
+                parse_range(header, 100)
+
+
+class MediaViewTests(TempMediaMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.media_root, "branding"))
+        with open(os.path.join(self.media_root, "branding", "logo.bin"), "wb") as fh:
+            fh.write(BODY)
+        self.factory = RequestFactory()
+
+    def _get(self, path="branding/logo.bin", **headers):
+        return MediaView.as_view()(self.factory.get(f"/media/{path}", headers=headers), path=path)
+
+    def test_range_request_returns_partial_content(self):
+        response = self._get(Range="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/100")
+        self.assertEqual(b"".join(response.streaming_content), BODY[10:20])
+
+    def test_unsatisfiable_range_is_416(self):
+        response = self._get(Range="bytes=200-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */100")
+
+    def test_stale_if_range_serves_the_whole_file(self):
+        response = self._get(Range="bytes=10-19", **{"If-Range": '"other"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), BODY)
+
+    def test_etag_revalidation_and_private_prefixes(self):
+        etag = self._get()["ETag"]
+        self.assertEqual(self._get(**{"If-None-Match": etag}).status_code, 304)
+        with self.assertRaises(Http404):
+            self._get("exports/1.csv")
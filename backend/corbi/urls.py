@@ -3,17 +3,18 @@ from __future__ import annotations
 from django.contrib import admin
 from django.urls import include, path
 from django.conf import settings
-from django.conf.urls.static import static
 from rest_framework import routers
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 from rest_framework.permissions import AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from corbi.media import MediaView
+
 from assistant.views import AssistantView
 from bookings.views import BookingViewSet, ResourceViewSet
 from bookings.public_views import PublicBookingView, PublicBookingRescheduleView, PublicBookingCancelView, PublicSlotsView
-from contacts.views import ContactViewSet, ContactGroupViewSet
-from messaging.views import InboundMessageViewSet, OutboundMessageViewSet, EmailJobViewSet, EmailAttachmentViewSet, unsubscribe, TelegramOnboardingViewSet, TelegramOnboardWebhook, TelegramMessageViewSet, WhatsAppMessageViewSet, TwilioWhatsAppWebhook, TwilioWhatsAppStatusWebhook, InstagramMessageViewSet, InstagramWebhook, CampaignViewSet
+from contacts.views import ContactViewSet, ContactGroupViewSet, ContactImportJobViewSet, SegmentViewSet, DedupJobViewSet
+from messaging.views import InboundMessageViewSet, OutboundMessageViewSet, EmailJobViewSet, EmailAttachmentViewSet, AttachmentUploadViewSet, unsubscribe, TelegramOnboardingViewSet, TelegramOnboardWebhook, TelegramMessageViewSet, WhatsAppMessageViewSet, TwilioWhatsAppWebhook, TwilioWhatsAppStatusWebhook, InstagramMessageViewSet, InstagramWebhook, ConversationViewSet, RealtimeStreamView, RealtimeTokenView, CampaignViewSet, ExportJobViewSet, ExportDownloadView
 from notifications.views import NotificationViewSet
 from monitoring.views import HealthcheckView, MetricsView, MonitoringSummaryView, SettingsView, MonitoringDetailView, MonitoringEventsView, MonitoringAlertsView
 from organizations.views import MembershipViewSet, BrandingViewSet, ProfileViewSet, ApiKeyViewSet, me
@@ -27,12 +28,16 @@ from billing.views import BillingLogViewSet
 router = routers.DefaultRouter()
 router.register(r"contacts", ContactViewSet, basename="contact")
 router.register(r"contact-groups", ContactGroupViewSet, basename="contact-group")
+router.register(r"contact-imports", ContactImportJobViewSet, basename="contact-import")
+router.register(r"segments", SegmentViewSet, basename="segment")
+router.register(r"contact-dedup", DedupJobViewSet, basename="contact-dedup")
 router.register(r"templates", MessageTemplateViewSet, basename="template")
 router.register(r"outbound", OutboundMessageViewSet, basename="outbound")
 router.register(r"inbound", InboundMessageViewSet, basename="inbound")
 router.register(r"email-jobs", EmailJobViewSet, basename="email-job")
 router.register(r"email-attachments", EmailAttachmentViewSet, basename="email-attachment")
 router.register(r"telegram/attachments", EmailAttachmentViewSet, basename="telegram-attachment")
+router.register(r"attachment-uploads", AttachmentUploadViewSet, basename="attachment-upload")
 router.register(r"bookings", BookingViewSet, basename="booking")
 router.register(r"resources", ResourceViewSet, basename="resource")
 router.register(r"memberships", MembershipViewSet, basename="membership")
@@ -44,13 +49,18 @@ router.register(r"telegram/onboarding", TelegramOnboardingViewSet, basename="tel
 router.register(r"telegram/messages", TelegramMessageViewSet, basename="telegram-messages")
 router.register(r"whatsapp/messages", WhatsAppMessageViewSet, basename="whatsapp-messages")
 router.register(r"instagram/messages", InstagramMessageViewSet, basename="instagram-messages")
+router.register(r"conversations", ConversationViewSet, basename="conversations")
 router.register(r"campaigns", CampaignViewSet, basename="campaigns")
 router.register(r"notifications", NotificationViewSet, basename="notifications")
+router.register(r"exports", ExportJobViewSet, basename="exports")
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     # Specific callbacks before the catch-all
     path("api/callbacks/sendgrid/", SendGridEventView.as_view(), name="sendgrid_events"),
+    path("api/exports/download/", ExportDownloadView.as_view(), name="export-download"),
+    path("api/realtime/token/", RealtimeTokenView.as_view(), name="realtime-token"),
+    path("api/realtime/stream/", RealtimeStreamView.as_view(), name="realtime-stream"),
     path("api/", include(router.urls)),
     path("api/auth/me/", me, name="auth-me"),
     path("api/webhooks/<str:channel>/", InboundWebhookView.as_view(), name="inbound_webhook"),
@@ -86,6 +96,5 @@ urlpatterns = [
     path("api/public/v1/slots/", PublicSlotsView.as_view(), name="public-slots"),
 ]
 
-# Serve media in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Public media (attachments, branding) with validators, ranges and optional web-server offload
+urlpatterns += [path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", MediaView.as_view(), name="media")]
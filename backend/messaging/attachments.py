@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import uuid
+from datetime import timedelta
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .imaging import delete_variants
+from .models import AttachmentBlob, AttachmentUpload, EmailAttachment
+
+HASH_CHUNK_SIZE = 1024 * 1024
+UPLOAD_STAGING_DIR = "attachment_uploads"
+
+
+class UploadRangeError(ValueError):
+    """A chunk that does not continue the staged bytes (gap) or overruns the declared size."""
+
+
+def content_hash(upload) -> str:
+    """SHA-256 of an uploaded file, streamed in chunks so large uploads never sit in memory whole."""
+    digest = hashlib.sha256()
+    for chunk in upload.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def _blob_for(organization, upload, digest: str, content_type: str) -> AttachmentBlob:
+    blob = AttachmentBlob.objects.filter(organization=organization, sha256=digest).first()
+    if blob is not None:
+        return blob
+    blob = AttachmentBlob(organization=organization, sha256=digest, size=upload.size, content_type=content_type)
+    blob.file.save(upload.name, upload, save=False)
+    try:
+        with transaction.atomic():
+            blob.save()
+        return blob
+    except IntegrityError:
+        # a concurrent upload of the same bytes won; keep theirs and drop our copy
+        blob.file.storage.delete(blob.file.name)
+        return AttachmentBlob.objects.get(organization=organization, sha256=digest)
+
+
+def store_attachment(organization, upload, *, filename: str, content_type: str) -> EmailAttachment:
+    """
+    Save an upload as an EmailAttachment backed by the org's blob for its content hash. Identical
+    bytes uploaded again (by anyone in the org, under any name) reuse the stored file.
+    """
+    digest = content_hash(upload)
+    blob = _blob_for(organization, upload, digest, content_type)
+    with transaction.atomic():
+        AttachmentBlob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+        return EmailAttachment.objects.create(
+            organization=organization,
+            blob=blob,
+            sha256=digest,
+            file=blob.file.name,
+            filename=filename,
+            content_type=content_type,
+            size=upload.size,
+        )
+
+
+def release_blob(blob_id: int) -> None:
+    """Drop one reference; the last one deletes the blob row and, after commit, its file and image variants."""
+    AttachmentBlob.objects.filter(pk=blob_id, ref_count__gt=0).update(ref_count=F("ref_count") - 1)
+    blob = AttachmentBlob.objects.filter(pk=blob_id, ref_count=0).first()
+    if blob is None:
+        return
+    storage, name = blob.file.storage, blob.file.name
+    organization_id, sha256 = blob.organization_id, blob.sha256
+    if AttachmentBlob.objects.filter(pk=blob_id, ref_count=0).delete()[0]:
+        transaction.on_commit(lambda: (storage.delete(name), delete_variants(organization_id, sha256)))
+
+
+def open_upload(organization, user, *, filename: str, content_type: str, size: int, channel: str = "") -> AttachmentUpload:
+    return AttachmentUpload.objects.create(
+        organization=organization,
+        created_by=user if getattr(user, "is_authenticated", False) else None,
+        filename=filename,
+        content_type=content_type,
+        channel=channel,
+        size=size,
+        staged_name=f"{UPLOAD_STAGING_DIR}/{organization.id}/{uuid.uuid4().hex}.part",
+    )
+
+
+def write_chunk(upload: AttachmentUpload, start: int, length: int, stream) -> int:
+    """
+    Write `length` bytes read from `stream` at offset `start` of the staged file and return the new
+    contiguous byte count. Re-sending already received bytes is allowed (a retried chunk); skipping
+    ahead is not. The session row is locked so concurrent chunks for one upload serialize.
+    """
+    with transaction.atomic():
+        upload = AttachmentUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status != AttachmentUpload.STATUS_OPEN:
+            raise UploadRangeError("Upload already completed")
+        if start > upload.received:
+            raise UploadRangeError(f"Chunk starts at {start} but only {upload.received} bytes were received")
+        if start + length > upload.size:
+            raise UploadRangeError(f"Chunk ends past the declared size of {upload.size} bytes")
+        path = default_storage.path(upload.staged_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        written = 0
+        with open(path, "r+b" if os.path.exists(path) else "wb") as fh:
+            fh.seek(start)
+            while written < length:
+                buf = stream.read(min(HASH_CHUNK_SIZE, length - written))
+                if not buf:
+                    break
+                fh.write(buf)
+                written += len(buf)
+        # a dropped connection leaves a short chunk; the client resumes from `received`
+        upload.received = max(upload.received, start + written)
+        AttachmentUpload.objects.filter(pk=upload.pk).update(received=upload.received, updated_at=timezone.now())
+        return upload.received
+
+
+def finalize_upload(upload: AttachmentUpload) -> EmailAttachment:
+    """
+    Hash the staged bytes in one streamed pass into the blob store and close the session. The
+    session row is locked and re-checked, so concurrent completes yield one attachment.
+    """
+    with transaction.atomic():
+        upload = AttachmentUpload.objects.select_for_update().select_related("organization", "attachment").get(pk=upload.pk)
+        if upload.status == AttachmentUpload.STATUS_COMPLETED and upload.attachment_id:
+            return upload.attachment
+        if upload.received < upload.size:
+            raise UploadRangeError(f"Upload incomplete: {upload.received} of {upload.size} bytes received")
+        path = default_storage.path(upload.staged_name)
+        with open(path, "rb") as fh:
+            attachment = store_attachment(
+                upload.organization, File(fh, name=upload.filename), filename=upload.filename, content_type=upload.content_type
+            )
+        AttachmentUpload.objects.filter(pk=upload.pk).update(
+            status=AttachmentUpload.STATUS_COMPLETED, attachment=attachment, updated_at=timezone.now()
+        )
+        staged_name = upload.staged_name
+        transaction.on_commit(lambda: default_storage.delete(staged_name))
+    return attachment
+
+
+def expire_uploads(max_age: timedelta) -> int:
+    """Delete sessions idle for longer than max_age (and their staged bytes); completed ones just go."""
+    stale = AttachmentUpload.objects.filter(updated_at__lt=timezone.now() - max_age)
+    removed = 0
+    for upload in stale.iterator():
+        if upload.status == AttachmentUpload.STATUS_OPEN and default_storage.exists(upload.staged_name):
+            default_storage.delete(upload.staged_name)
+        removed += 1
+    stale.delete()
+    return removed
@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, models
+from django.db.models import Count, Exists, F, OuterRef, Q, QuerySet, Value
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from contacts.models import Contact, ContactGroup
+from contacts.segments import segments_q
+from monitoring.models import MonitoringAlert
+from monitoring.utils import record_alert
+from .models import Campaign, CampaignRecipient, CampaignUploadContact, EmailJob, EmailRecipient, Suppression
+
+CAMPAIGN_CHANNELS = ["email", "whatsapp", "telegram", "instagram"]
+EXCLUDED_STATUSES = [Contact.STATUS_UNSUBSCRIBED, Contact.STATUS_BOUNCED, Contact.STATUS_BLOCKED]
+AUDIENCE_SYNC_LIMIT = int(getattr(settings, "CAMPAIGN_AUDIENCE_SYNC_LIMIT", 5000))
+AUDIENCE_CHUNK_SIZE = int(getattr(settings, "CAMPAIGN_AUDIENCE_CHUNK_SIZE", 5000))
+PREVIEW_CACHE_SECONDS = int(getattr(settings, "AUDIENCE_PREVIEW_CACHE_SECONDS", 30))
+PREVIEW_SAMPLE_SIZE = 5
+# contact column each channel delivers to (and that suppressions are recorded against)
+CHANNEL_IDENTIFIERS = {
+    "email": "email",
+    "whatsapp": "phone_whatsapp",
+    "telegram": "telegram_chat_id",
+    "instagram": "instagram_user_id",
+}
+CHANNEL_BLOCKED = {
+    "whatsapp": Q(whatsapp_blocked=True),
+    "telegram": Q(telegram_status=Contact.TELEGRAM_STATUS_BLOCKED),
+    "instagram": Q(instagram_blocked=True),
+}
+_DATE_FILTERS = {
+    "created_after": "created_at__gte",
+    "created_before": "created_at__lt",
+    "last_inbound_after": "last_inbound_at__gte",
+    "last_inbound_before": "last_inbound_at__lt",
+}
+
+
+def _present(field: str) -> Q:
+    return Q(**{f"{field}__isnull": False}) & ~Q(**{field: ""})
+
+
+def channel_eligibility_q(channel: str) -> Q:
+    """Predicate a contact must satisfy to be reachable on `channel`."""
+    if channel == "email":
+        return _present("email")
+    if channel == "whatsapp":
+        return _present("phone_whatsapp") & Q(whatsapp_blocked=False)
+    if channel == "telegram":
+        return Q(telegram_status=Contact.TELEGRAM_STATUS_ONBOARDED) & _present("telegram_chat_id")
+    if channel == "instagram":
+        return Q(instagram_opt_in=True, instagram_blocked=False) & _present("instagram_user_id")
+    raise ValueError(f"Unsupported channel: {channel}")
+
+
+def group_members_q(group_ids: Iterable[int]) -> Q:
+    """Semi-join on the membership table so multi-group contacts are not duplicated."""
+    through = ContactGroup.contacts.through
+    return Q(id__in=through.objects.filter(contactgroup_id__in=list(group_ids)).values("contact_id"))
+
+
+def audience_filters_q(filters: dict | None) -> Q:
+    """
+    Translate the optional campaign `filters` object into a predicate.
+    Supported keys: tags (any of), created_after/before, last_inbound_after/before (ISO datetimes).
+    """
+    filters = filters or {}
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object")
+    unknown = set(filters) - {"tags", *_DATE_FILTERS}
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+    q = Q()
+    tags = filters.get("tags") or []
+    if isinstance(tags, str):
+        tags = [tags]
+    if tags:
+        tag_q = Q()
+        for tag in tags:
+            tag_q |= Q(tags__contains=[str(tag)])
+        q &= tag_q
+    for key, lookup in _DATE_FILTERS.items():
+        if filters.get(key):
+            value = parse_datetime(str(filters[key]))
+            if value is None:
+                raise ValueError(f"{key} must be an ISO datetime")
+            q &= Q(**{lookup: value})
+    return q
+
+
+def targets_q(org, group_ids: Iterable[int] | None = None, segment_ids: Iterable[int] | None = None) -> Q | None:
+    """Members of any selected group or segment; None when neither is selected."""
+    q = None
+    if group_ids:
+        q = group_members_q(group_ids)
+    if segment_ids:
+        q = segments_q(org, segment_ids) if q is None else q | segments_q(org, segment_ids)
+    return q
+
+
+def candidate_queryset(
+    org,
+    *,
+    group_ids: Iterable[int] | None = None,
+    segment_ids: Iterable[int] | None = None,
+    contact_ids: Iterable[int] | None = None,
+    filters: dict | None = None,
+    union: bool = False,
+):
+    """
+    Contacts selected by a campaign or email job before any channel eligibility rules.
+    Campaigns give `contact_ids` (an upload) precedence over groups/segments; email jobs
+    (`union=True`) target all of them. A `contact_ids` queryset stays a subquery.
+    """
+    qs = Contact.objects.filter(organization=org)
+    if contact_ids is not None and not isinstance(contact_ids, QuerySet):
+        contact_ids = list(contact_ids)
+    targeted = targets_q(org, group_ids, segment_ids)
+    if union and contact_ids and targeted is not None:
+        qs = qs.filter(Q(id__in=contact_ids) | targeted)
+    elif contact_ids is not None:
+        qs = qs.filter(id__in=contact_ids)
+    elif targeted is not None:
+        qs = qs.filter(targeted)
+    return qs.filter(audience_filters_q(filters)).order_by()
+
+
+def suppressed_q(org, channel: str) -> Q:
+    return Q(
+        Exists(
+            Suppression.objects.filter(
+                organization=org, channel=channel, identifier=OuterRef(CHANNEL_IDENTIFIERS[channel])
+            )
+        )
+    )
+
+
+def audience_queryset(
+    org,
+    channel: str,
+    *,
+    group_ids: Iterable[int] | None = None,
+    segment_ids: Iterable[int] | None = None,
+    contact_ids: Iterable[int] | None = None,
+    filters: dict | None = None,
+):
+    """
+    Eligible contacts for a campaign, expressed entirely as SQL predicates.
+    `contact_ids` (e.g. from an upload) takes precedence over `group_ids`/`segment_ids`.
+    """
+    qs = candidate_queryset(org, group_ids=group_ids, segment_ids=segment_ids, contact_ids=contact_ids, filters=filters)
+    return eligible_queryset(org, channel, qs)
+
+
+def eligible_queryset(org, channel: str, candidates):
+    return (
+        candidates.exclude(status__in=EXCLUDED_STATUSES)
+        .filter(channel_eligibility_q(channel))
+        .exclude(suppressed_q(org, channel))
+    )
+
+
+def audience_breakdown(org, channel: str, candidates) -> dict[str, int]:
+    """
+    Eligible count plus why every other candidate was dropped, in one conditional-aggregation
+    query. Buckets are exclusive and checked in order: contact status, channel block,
+    missing identifier (not reachable on the channel), suppression.
+    """
+    status_ok = ~Q(status__in=EXCLUDED_STATUSES)
+    reachable = channel_eligibility_q(channel)
+    channel_blocked = CHANNEL_BLOCKED.get(channel)
+    suppressed = suppressed_q(org, channel)
+    blocked = Q(status=Contact.STATUS_BLOCKED)
+    missing = status_ok & ~reachable
+    if channel_blocked is not None:
+        blocked |= status_ok & channel_blocked
+        missing &= ~channel_blocked
+    return candidates.aggregate(
+        total=Count("id"),
+        eligible=Count("id", filter=status_ok & reachable & ~suppressed),
+        unsubscribed=Count("id", filter=Q(status=Contact.STATUS_UNSUBSCRIBED)),
+        bounced=Count("id", filter=Q(status=Contact.STATUS_BOUNCED)),
+        blocked=Count("id", filter=blocked),
+        missing_identifier=Count("id", filter=missing),
+        suppressed=Count("id", filter=status_ok & reachable & suppressed),
+    )
+
+
+def preview_cache_key(org, channel: str, **selection) -> str:
+    payload = {"org": org.id, "channel": channel}
+    for key, value in selection.items():
+        payload[key] = sorted(value) if isinstance(value, (list, tuple, set)) else value
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    return f"audience-preview:{digest}"
+
+
+def audience_preview(org, channel: str, *, sample_size: int = PREVIEW_SAMPLE_SIZE, **selection) -> dict:
+    """
+    Count/breakdown/sample for a prospective audience without materializing recipients.
+    `selection` is passed to candidate_queryset; results are cached briefly per selection.
+    """
+    key = preview_cache_key(org, channel, sample_size=sample_size, **selection)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    candidates = candidate_queryset(org, **selection)
+    breakdown = audience_breakdown(org, channel, candidates)
+    identifier = CHANNEL_IDENTIFIERS[channel]
+    sample = list(
+        eligible_queryset(org, channel, candidates).order_by("id").values("id", "full_name", identifier)[:sample_size]
+    )
+    result = {
+        "channel": channel,
+        "eligible": breakdown.pop("eligible"),
+        "total": breakdown.pop("total"),
+        "excluded": breakdown,
+        "sample": sample,
+    }
+    cache.set(key, result, PREVIEW_CACHE_SECONDS)
+    return result
+
+
+def _insert_select(model, columns: dict, queryset) -> int:
+    """
+    Run `INSERT INTO <model> (<columns>) SELECT ...` from `queryset` without loading rows into Python.
+    `columns` maps target column -> expression evaluated against the queryset's model.
+    """
+    aliases = {f"_ins_{name}": expr for name, expr in columns.items()}
+    select_qs = queryset.order_by().annotate(**aliases).values_list(*aliases.keys())
+    sql, params = select_qs.query.sql_with_params()
+    qn = connection.ops.quote_name
+    target = ", ".join(qn(model._meta.get_field(name).column) for name in columns)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {qn(model._meta.db_table)} ({target}) {sql}", params)
+        return max(cursor.rowcount, 0)
+
+
+def stage_upload_contacts(campaign: Campaign, contact_ids: Iterable[int]) -> None:
+    """Record an upload's contacts for build_campaign_audience, which reads them back as a subquery."""
+    CampaignUploadContact.objects.bulk_create(
+        (CampaignUploadContact(campaign=campaign, contact_id=contact_id) for contact_id in contact_ids),
+        batch_size=AUDIENCE_CHUNK_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def materialize_recipients(campaign: Campaign, queryset) -> int:
+    """Insert one queued CampaignRecipient per contact in `queryset`; returns rows written."""
+    now = Value(timezone.now(), output_field=models.DateTimeField())
+    return _insert_select(
+        CampaignRecipient,
+        {
+            "campaign": Value(campaign.id, output_field=models.BigIntegerField()),
+            "contact": F("id"),
+            "status": Value(CampaignRecipient.STATUS_QUEUED),
+            "provider_message_id": Value(""),
+            "error_message": Value(""),
+            "created_at": now,
+        },
+        queryset,
+    )
+
+
+def materialize_recipients_chunked(campaign: Campaign, queryset, *, chunk_size: int = AUDIENCE_CHUNK_SIZE, on_progress=None) -> int:
+    """
+    Materialize recipients in keyset chunks of contact ids so progress can be reported
+    and no single statement holds locks for the whole audience.
+    """
+    queryset = queryset.order_by("id")
+    last_id = 0
+    written = 0
+    while True:
+        remaining = queryset.filter(id__gt=last_id)
+        boundary = remaining.values_list("id", flat=True)[chunk_size - 1 : chunk_size].first()
+        chunk = remaining.filter(id__lte=boundary) if boundary is not None else remaining
+        written += materialize_recipients(campaign, chunk)
+        if on_progress:
+            on_progress(written)
+        if boundary is None:
+            return written
+        last_id = boundary
+
+
+def materialize_email_recipients(job: EmailJob, campaign: Campaign) -> int:
+    """Copy a campaign's queued recipients into an EmailJob in one statement."""
+    now = Value(timezone.now(), output_field=models.DateTimeField())
+    recipients = CampaignRecipient.objects.filter(campaign=campaign, status=CampaignRecipient.STATUS_QUEUED).exclude(
+        Q(contact__email__isnull=True) | Q(contact__email="")
+    )
+    return _insert_select(
+        EmailRecipient,
+        {
+            "job": Value(job.id, output_field=models.BigIntegerField()),
+            "contact": F("contact_id"),
+            "email": F("contact__email"),
+            "full_name": F("contact__full_name"),
+            "status": Value(EmailRecipient.STATUS_QUEUED),
+            "error": Value(""),
+            "retry_count": Value(0, output_field=models.IntegerField()),
+            "provider_message_id": Value(""),
+            "signed_token": Value(""),
+            "created_at": now,
+            "updated_at": now,
+        },
+        recipients,
+    )
+
+
+def launch_campaign(campaign: Campaign) -> EmailJob | None:
+    """Hand a campaign with materialized recipients over to its channel's delivery path."""
+    from .tasks import dispatch_campaign, process_email_job
+
+    template = campaign.template
+    if not template:
+        # the template was deleted while the audience was being built; nothing can be sent
+        Campaign.objects.filter(pk=campaign.pk).update(status=Campaign.STATUS_FAILED)
+        record_alert(
+            organization=campaign.organization,
+            category="campaign_template_missing",
+            message=f"Campaign {campaign.id} has no template and was not sent",
+            severity=MonitoringAlert.SEVERITY_WARNING,
+            metadata={"campaign_id": campaign.id},
+        )
+        return None
+    if campaign.channel != "email":
+        dispatch_campaign.delay(campaign.id)
+        return None
+    job = EmailJob.objects.create(
+        organization=campaign.organization,
+        campaign=campaign,
+        template=template,
+        subject=template.subject or campaign.name,
+        body_html=template.body or "",
+        body_text=template.body or "",
+        status=EmailJob.STATUS_QUEUED,
+    )
+    total = materialize_email_recipients(job, campaign)
+    job.total_recipients = total
+    job.save(update_fields=["total_recipients", "updated_at"])
+    # reflect initial queued count on campaign for visibility
+    campaign.sent_count = total
+    campaign.save(update_fields=["sent_count"])
+    process_email_job.delay(job.id)
+    return job
@@ -10,6 +10,8 @@ import asyncio
 import requests
 import uuid
 
+from .media_cache import forget_media_id, get_media_id, remember_media_id
+
 
 @dataclass
 class SendResult:
@@ -108,18 +110,23 @@ class TelegramSender:
         media_type: str | None = None,
         credentials: dict | None = None,
         caption: str | None = None,
+        content_key: str | None = None,
     ) -> SendResult:
         """
         Send a Telegram message. If media_path is provided, will send as document/photo.
         media_type: "photo" or "document" determines method.
+        content_key: stable id of the media bytes; when the bot already uploaded them, the cached
+        Telegram file_id is sent instead of the file.
         """
         credentials = credentials or {}
         token = credentials.get("token")
         extra = credentials.get("extra") or {}
         chat_id = extra.get("chat_id") or to
+        integration_id = credentials.get("integration_id")
         if not token or not chat_id:
             return SendResult(success=False, error="Telegram integration missing token/chat_id")
-        if media_path:
+        file_id = get_media_id("telegram", integration_id, content_key) if media_path else None
+        if media_path and not file_id:
             try:
                 # ensure file exists/readable before async call
                 open(media_path, "rb").close()
@@ -131,11 +138,15 @@ class TelegramSender:
 
         async def _send_photo():
             bot = Bot(token=token)
+            if file_id:
+                return await bot.send_photo(chat_id=chat_id, photo=file_id, caption=caption or body or None)
             with open(media_path, "rb") as fh:
                 return await bot.send_photo(chat_id=chat_id, photo=fh, caption=caption or body or None)
 
         async def _send_document():
             bot = Bot(token=token)
+            if file_id:
+                return await bot.send_document(chat_id=chat_id, document=file_id, caption=caption or body or None)
             with open(media_path, "rb") as fh:
                 return await bot.send_document(chat_id=chat_id, document=fh, caption=caption or body or None)
 
@@ -151,9 +162,15 @@ class TelegramSender:
         for attempt in range(3):
             try:
                 message = asyncio.run(asyncio.wait_for(_runner(), timeout=10))
+                if media_path and not file_id:
+                    remember_media_id("telegram", integration_id, content_key, _telegram_file_id(message))
                 return SendResult(success=True, provider_message_id=str(getattr(message, "message_id", "")))
             except Exception as exc:  # noqa: BLE001
                 last_err = str(exc)
+                if file_id:
+                    # the cached id may be stale (bot token rotated, file purged): upload the bytes instead
+                    forget_media_id("telegram", integration_id, content_key)
+                    file_id = None
                 if attempt < 2:
                     # short sleep before retry
                     try:
@@ -164,6 +181,15 @@ class TelegramSender:
                 return SendResult(success=False, error=last_err or "send failed")
 
 
+def _telegram_file_id(message) -> str | None:
+    # photos come back as several sizes; the largest is last
+    photos = getattr(message, "photo", None)
+    if photos:
+        return photos[-1].file_id
+    document = getattr(message, "document", None)
+    return getattr(document, "file_id", None)
+
+
 class InstagramSender:
     def send(self, *, to: str, body: str, media_url: str | None = None, credentials: dict | None = None) -> SendResult:
         credentials = credentials or {}
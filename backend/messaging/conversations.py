@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Conversation, InboundMessage
+
+# these channels have their own message table; their InboundMessage rows are diagnostic copies
+THREADED_CHANNELS = ("whatsapp", "telegram", "instagram")
+SNIPPET_LENGTH = 280
+
+
+def message_snippet(text: str, message_type: str = "") -> str:
+    text = " ".join(str(text or "").split())
+    if not text and message_type and message_type.upper() != "TEXT":
+        text = f"[{message_type.lower()}]"
+    return text if len(text) <= SNIPPET_LENGTH else text[: SNIPPET_LENGTH - 1] + "…"
+
+
+def inbound_text(payload) -> str:
+    if not isinstance(payload, dict):
+        return ""
+    return payload.get("text") or payload.get("body") or payload.get("message") or payload.get("subject") or ""
+
+
+def record_message(*, organization_id: int, contact_id: int, channel: str, at: datetime, snippet: str, inbound: bool) -> None:
+    """
+    Fold one message into its conversation with a single UPDATE: last_message_at only moves forward,
+    the snippet follows the newest message, and inbound messages bump unread_count. The first message
+    of a thread inserts the row instead; a concurrent insert falls back to the UPDATE.
+    """
+    key = {"organization_id": organization_id, "contact_id": contact_id, "channel": channel}
+    direction = Conversation.DIR_INBOUND if inbound else Conversation.DIR_OUTBOUND
+    at_value = Value(at, output_field=DateTimeField())
+    updates = {
+        "last_message_at": Greatest(F("last_message_at"), at_value),
+        "last_snippet": Case(When(last_message_at__lte=at_value, then=Value(snippet)), default=F("last_snippet")),
+        "last_direction": Case(When(last_message_at__lte=at_value, then=Value(direction)), default=F("last_direction")),
+        "updated_at": timezone.now(),
+    }
+    if inbound:
+        updates["unread_count"] = F("unread_count") + 1
+    if Conversation.objects.filter(**key).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            Conversation.objects.create(
+                **key, last_message_at=at, last_snippet=snippet, last_direction=direction, unread_count=1 if inbound else 0
+            )
+    except IntegrityError:
+        Conversation.objects.filter(**key).update(**updates)
+
+
+def record_channel_message(message, channel: str) -> None:
+    record_message(
+        organization_id=message.organization_id,
+        contact_id=message.contact_id,
+        channel=channel,
+        at=message.created_at,
+        snippet=message_snippet(message.text, message.message_type),
+        inbound=message.direction == message.DIR_INBOUND,
+    )
+
+
+def record_inbound_message(message: InboundMessage) -> None:
+    if message.contact_id is None or message.channel in THREADED_CHANNELS:
+        return
+    record_message(
+        organization_id=message.organization_id,
+        contact_id=message.contact_id,
+        channel=message.channel,
+        at=message.received_at,
+        snippet=message_snippet(inbound_text(message.payload)),
+        inbound=True,
+    )
+
+
+def record_outbound_batch(channel: str, messages: Iterable) -> None:
+    """
+    Set-based variant for bulk-created outbound rows (campaign batches bypass post_save): one read of
+    the affected conversations, then one bulk_update and one bulk_create.
+    """
+    latest = {}
+    for message in messages:
+        key = (message.organization_id, message.contact_id)
+        if key not in latest or message.created_at >= latest[key].created_at:
+            latest[key] = message
+    if not latest:
+        return
+    existing = {
+        (conv.organization_id, conv.contact_id): conv
+        for conv in Conversation.objects.filter(
+            channel=channel,
+            organization_id__in={org_id for org_id, _ in latest},
+            contact_id__in={contact_id for _, contact_id in latest},
+        )
+    }
+    now = timezone.now()
+    changed, created = [], []
+    for key, message in latest.items():
+        snippet = message_snippet(message.text, message.message_type)
+        conv = existing.get(key)
+        if conv is None:
+            created.append(
+                Conversation(
+                    organization_id=key[0],
+                    contact_id=key[1],
+                    channel=channel,
+                    last_message_at=message.created_at,
+                    last_snippet=snippet,
+                    last_direction=Conversation.DIR_OUTBOUND,
+                )
+            )
+        elif message.created_at >= conv.last_message_at:
+            conv.last_message_at, conv.last_snippet, conv.last_direction, conv.updated_at = (
+                message.created_at,
+                snippet,
+                Conversation.DIR_OUTBOUND,
+                now,
+            )
+            changed.append(conv)
+    if changed:
+        Conversation.objects.bulk_update(changed, ["last_message_at", "last_snippet", "last_direction", "updated_at"])
+    if created:
+        Conversation.objects.bulk_create(created, ignore_conflicts=True)
+
+
+def fold_conversations(mapping: dict[int, int]) -> None:
+    """
+    Move the conversations of merged-away contacts (`{loser_id: winner_id}`) to the winners. Threads
+    that end up on the same (contact, channel) collapse into one: unread counts add up and the newest
+    message's time, snippet and direction win. Must run inside the merge transaction.
+    """
+    if not mapping:
+        return
+    threads = defaultdict(list)
+    for conv in Conversation.objects.select_for_update().filter(contact_id__in={*mapping, *mapping.values()}).order_by("id"):
+        winner = mapping.get(conv.contact_id, conv.contact_id)
+        threads[(conv.organization_id, winner, conv.channel)].append(conv)
+    now = timezone.now()
+    changed, dropped = [], []
+    for (_, winner, _), convs in threads.items():
+        keep = next((conv for conv in convs if conv.contact_id == winner), convs[0])
+        if keep.contact_id == winner and len(convs) == 1:
+            continue
+        for other in convs:
+            if other is keep:
+                continue
+            if other.last_message_at > keep.last_message_at:
+                keep.last_message_at, keep.last_snippet, keep.last_direction = (
+                    other.last_message_at,
+                    other.last_snippet,
+                    other.last_direction,
+                )
+            keep.unread_count += other.unread_count
+            reads = [value for value in (keep.last_read_at, other.last_read_at) if value]
+            keep.last_read_at = max(reads) if reads else None
+            dropped.append(other.id)
+        keep.contact_id, keep.updated_at = winner, now
+        changed.append(keep)
+    # the absorbed rows go first so no (contact, channel) pair is ever held twice
+    if dropped:
+        Conversation.objects.filter(id__in=dropped).delete()
+    if changed:
+        fields = ["contact", "last_message_at", "last_snippet", "last_direction", "unread_count", "last_read_at", "updated_at"]
+        Conversation.objects.bulk_update(changed, fields)
+
+
+def mark_read(conversation: Conversation) -> None:
+    conversation.unread_count = 0
+    conversation.last_read_at = timezone.now()
+    Conversation.objects.filter(pk=conversation.pk).update(unread_count=0, last_read_at=conversation.last_read_at)
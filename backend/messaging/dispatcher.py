@@ -0,0 +1,456 @@
+from __future__ import annotations
+
+import logging
+import math
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.utils import timezone
+
+from contacts.models import Contact
+from integrations.models import Integration
+from integrations.utils import decrypt_token
+from monitoring.models import MonitoringAlert
+from monitoring.utils import record_alert
+from notifications.service import broadcast_to_org
+from .audience import EXCLUDED_STATUSES, channel_eligibility_q, eligible_queryset
+from .channels import SendResult, get_sender
+from .conversations import record_outbound_batch
+from .imaging import IMAGE_PROFILES, optimized_image
+from .models import Campaign, CampaignRecipient, EmailAttachment, InstagramMessage, TelegramMessage, WhatsAppMessage
+from .pacing import defer_until, effective_profile, next_release_time
+from .realtime import publish, status_event
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_CHANNELS = ["whatsapp", "telegram", "instagram"]
+CAMPAIGN_BATCH_SIZE = int(getattr(settings, "CAMPAIGN_BATCH_SIZE", 200))
+_PLACEHOLDER = re.compile(r"{{\s*(\w+)\s*}}")
+
+
+class RateLimiter:
+    """Thread-safe pacer that spaces calls evenly to stay under `per_minute`."""
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute if per_minute and per_minute > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def compile_template(body: str) -> list[tuple[bool, str]]:
+    """Split a body into (is_placeholder, text) parts so per-recipient rendering is a join."""
+    parts: list[tuple[bool, str]] = []
+    pos = 0
+    for match in _PLACEHOLDER.finditer(body or ""):
+        if match.start() > pos:
+            parts.append((False, body[pos : match.start()]))
+        parts.append((True, match.group(1)))
+        pos = match.end()
+    if pos < len(body or ""):
+        parts.append((False, body[pos:]))
+    return parts
+
+
+def contact_variables(contact: Contact) -> dict[str, str]:
+    full_name = contact.full_name or ""
+    names = full_name.split()
+    metadata = contact.metadata if isinstance(contact.metadata, dict) else {}
+    return {
+        "first_name": names[0] if names else "",
+        "last_name": " ".join(names[1:]),
+        "full_name": full_name,
+        "company_name": str(metadata.get("company_name", "")),
+    }
+
+
+def render_compiled(parts: list[tuple[bool, str]], variables: dict[str, str]) -> str:
+    return "".join(variables.get(text, "") if is_var else text for is_var, text in parts)
+
+
+def channel_credentials(org_id: int, channel: str) -> dict:
+    """Decrypt the org's integration once and normalize `extra` to the keys each sender expects."""
+    try:
+        integ = Integration.objects.get(organization_id=org_id, provider=channel, is_active=True)
+    except Integration.DoesNotExist:
+        raise ValueError(f"Integration not configured for {channel}")
+    token = decrypt_token(integ.token_encrypted or "")
+    if not token:
+        raise ValueError(f"Token missing for {channel} integration")
+    extra = integ.extra or {}
+    if channel == "whatsapp":
+        extra = {
+            "account_sid": extra.get("account_sid") or extra.get("twilio_account_sid") or extra.get("TWILIO_ACCOUNT_SID") or extra.get("accountSid"),
+            "from_whatsapp": extra.get("from_whatsapp") or extra.get("twilio_whatsapp_from") or extra.get("TWILIO_WHATSAPP_FROM") or extra.get("fromWhatsApp"),
+        }
+    elif channel == "instagram":
+        extra = {
+            "instagram_scoped_id": extra.get("instagram_business_account_id") or extra.get("business_id") or extra.get("instagram_scoped_id"),
+        }
+    elif channel == "telegram":
+        extra = {}
+    return {"token": token, "extra": extra, "integration_id": integ.id}
+
+
+def _destination(channel: str, contact: Contact) -> str | None:
+    if channel == "whatsapp":
+        return contact.phone_whatsapp
+    if channel == "telegram":
+        return contact.telegram_chat_id
+    return contact.instagram_user_id
+
+
+def _send_one(channel: str, to: str, body: str, credentials: dict, limiter: RateLimiter) -> SendResult:
+    limiter.wait()
+    sender = get_sender(channel)
+    try:
+        return sender.send(to=to, body=body, credentials=credentials)
+    except Exception as exc:  # noqa: BLE001
+        return SendResult(success=False, error=str(exc))
+
+
+def _message_row(campaign: Campaign, contact: Contact, body: str, result: SendResult):
+    if campaign.channel == "whatsapp":
+        return WhatsAppMessage(
+            organization_id=campaign.organization_id,
+            contact=contact,
+            direction=WhatsAppMessage.DIR_OUTBOUND,
+            message_type=WhatsAppMessage.TYPE_TEXT,
+            text=body,
+            twilio_message_sid=result.provider_message_id or "",
+            status=WhatsAppMessage.STATUS_SENT if result.success else WhatsAppMessage.STATUS_FAILED,
+            error_reason="" if result.success else (result.error or "unknown error"),
+        )
+    if campaign.channel == "telegram":
+        return TelegramMessage(
+            organization_id=campaign.organization_id,
+            contact=contact,
+            chat_id=contact.telegram_chat_id or "",
+            direction=TelegramMessage.DIR_OUTBOUND,
+            message_type=TelegramMessage.TYPE_TEXT,
+            text=body,
+            telegram_message_id=result.provider_message_id or "",
+            status="sent" if result.success else "failed",
+        )
+    return InstagramMessage(
+        organization_id=campaign.organization_id,
+        contact=contact,
+        direction=InstagramMessage.DIR_OUTBOUND,
+        message_type=InstagramMessage.TYPE_TEXT,
+        text=body,
+        provider_message_id=result.provider_message_id or "",
+        status=InstagramMessage.STATUS_SENT if result.success else InstagramMessage.STATUS_FAILED,
+        error_reason="" if result.success else (result.error or "unknown error"),
+    )
+
+
+def claim_batch(campaign: Campaign, batch_size: int = CAMPAIGN_BATCH_SIZE) -> list[CampaignRecipient]:
+    """
+    Move up to `batch_size` queued recipients to SENDING and return them. Rows another worker has
+    locked are skipped, so overlapping runs of one campaign (a redelivered task, a duplicate enqueue)
+    never send to the same recipient twice.
+    """
+    with transaction.atomic():
+        ids = list(
+            CampaignRecipient.objects.select_for_update(skip_locked=True)
+            .filter(campaign=campaign, status=CampaignRecipient.STATUS_QUEUED)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        CampaignRecipient.objects.filter(id__in=ids, status=CampaignRecipient.STATUS_QUEUED).update(
+            status=CampaignRecipient.STATUS_SENDING
+        )
+    return list(CampaignRecipient.objects.filter(id__in=ids).select_related("contact").order_by("id"))
+
+
+def _skip_reasons(campaign: Campaign, batch: list[CampaignRecipient]) -> dict[int, str]:
+    """
+    Re-check claimed recipients just before sending: a contact can unsubscribe, be suppressed or lose
+    its channel identifier after the audience was built. Returns contact id -> reason for each drop.
+    """
+    channel = campaign.channel
+    contacts = Contact.objects.filter(id__in=[r.contact_id for r in batch])
+    eligible = set(eligible_queryset(campaign.organization_id, channel, contacts).values_list("id", flat=True))
+    dropped = {r.contact_id: r.contact for r in batch if r.contact_id not in eligible}
+    if not dropped:
+        return {}
+    reachable = set(contacts.filter(id__in=dropped).filter(channel_eligibility_q(channel)).values_list("id", flat=True))
+    reasons = {}
+    for contact_id, contact in dropped.items():
+        if contact.status in EXCLUDED_STATUSES:
+            reasons[contact_id] = f"Contact {contact.status}"
+        elif contact_id in reachable:
+            reasons[contact_id] = f"Suppressed on {channel}"
+        else:
+            reasons[contact_id] = f"Not reachable on {channel}"
+    return reasons
+
+
+def dispatch_batch(campaign: Campaign, batch: list[CampaignRecipient], parts, credentials: dict, executor: ThreadPoolExecutor, limiter: RateLimiter) -> tuple[int, int, int]:
+    """Send one batch concurrently and persist every outcome with bulk writes."""
+    channel = campaign.channel
+    skip_reasons = _skip_reasons(campaign, batch)
+    work = []
+    for recipient in batch:
+        if recipient.contact_id in skip_reasons:
+            recipient.status = CampaignRecipient.STATUS_SKIPPED
+            recipient.error_message = skip_reasons[recipient.contact_id]
+            continue
+        to = _destination(channel, recipient.contact)
+        body = render_compiled(parts, contact_variables(recipient.contact))
+        if not to:
+            work.append((recipient, body, None))
+            continue
+        work.append((recipient, body, executor.submit(_send_one, channel, to, body, credentials, limiter)))
+
+    message_rows = []
+    sent_contact_ids = []
+    sent = failed = 0
+    for recipient, body, future in work:
+        result = future.result() if future else SendResult(success=False, error="Missing destination identifier for contact.")
+        if result.success:
+            recipient.status = CampaignRecipient.STATUS_SENT
+            recipient.provider_message_id = result.provider_message_id or ""
+            recipient.error_message = ""
+            sent_contact_ids.append(recipient.contact_id)
+            sent += 1
+        else:
+            recipient.status = CampaignRecipient.STATUS_FAILED
+            recipient.error_message = result.error or "Send failed"
+            failed += 1
+        if future:
+            message_rows.append(_message_row(campaign, recipient.contact, body, result))
+
+    CampaignRecipient.objects.bulk_update(batch, ["status", "provider_message_id", "error_message"])
+    model = {"whatsapp": WhatsAppMessage, "telegram": TelegramMessage}.get(channel, InstagramMessage)
+    model.objects.bulk_create(message_rows)
+    record_outbound_batch(channel, message_rows)
+    if sent_contact_ids:
+        now = timezone.now()
+        updates = {"last_outbound_at": now, "updated_at": now}
+        if channel == "instagram":
+            updates["instagram_last_outbound_at"] = now
+        Contact.objects.filter(id__in=sent_contact_ids).update(**updates)
+    skipped = len(skip_reasons)
+    Campaign.objects.filter(pk=campaign.pk).update(
+        sent_count=models.F("sent_count") + sent,
+        failed_count=models.F("failed_count") + failed,
+        skipped_count=models.F("skipped_count") + skipped,
+    )
+    return sent, failed, skipped
+
+
+def run_campaign(campaign: Campaign, *, batch_size: int = CAMPAIGN_BATCH_SIZE) -> None:
+    """
+    Execute a non-email campaign at the channel's configured concurrency and rate.
+    With a pacing profile, batches are released on the profile's schedule and the task
+    re-enqueues itself for the next release instead of sleeping.
+    """
+    channel = campaign.channel
+    if channel not in DISPATCH_CHANNELS:
+        raise ValueError(f"Unsupported campaign channel: {channel}")
+    try:
+        credentials = channel_credentials(campaign.organization_id, channel)
+    except ValueError as exc:
+        Campaign.objects.filter(pk=campaign.pk).update(status=Campaign.STATUS_FAILED)
+        record_alert(
+            organization=campaign.organization,
+            category="integration_missing",
+            message=str(exc),
+            severity=MonitoringAlert.SEVERITY_WARNING,
+            metadata={"campaign_id": campaign.id, "channel": channel},
+        )
+        return
+
+    from .tasks import dispatch_campaign
+
+    now = timezone.now()
+    campaign.started_at = campaign.started_at or now
+    Campaign.objects.filter(pk=campaign.pk).update(status=Campaign.STATUS_SENDING, started_at=campaign.started_at)
+    default_limit = getattr(settings, "OUTBOUND_PER_MINUTE_LIMIT", 60)
+    channel_limit = getattr(settings, "CHANNEL_THROTTLE_PER_MIN", {}).get(channel, default_limit)
+    profile = effective_profile(campaign.pacing)
+    rate = profile.full_rate(campaign.target_count, channel_limit) if profile.is_active else channel_limit
+    limiter = RateLimiter(0 if math.isinf(rate) else rate)
+    workers = max(1, int(getattr(settings, "CHANNEL_CONCURRENCY", {}).get(channel, 4)))
+    parts = compile_template(campaign.template.body if campaign.template else "")
+    queued = CampaignRecipient.objects.filter(campaign=campaign, status=CampaignRecipient.STATUS_QUEUED)
+    processed = campaign.recipients.exclude(status=CampaignRecipient.STATUS_QUEUED).count()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"campaign-{channel}") as executor:
+        while True:
+            # the release is checked before claiming so a deferred run never holds claimed rows
+            if profile.is_active and queued.exists():
+                release = next_release_time(profile, campaign.target_count, processed, campaign.started_at, channel_limit)
+                if defer_until(dispatch_campaign, [campaign.id, True], release):
+                    return
+            batch = claim_batch(campaign, batch_size)
+            if not batch:
+                break
+            batch_sent, batch_failed, batch_skipped = dispatch_batch(campaign, batch, parts, credentials, executor, limiter)
+            processed += len(batch)
+            logger.info(
+                "campaign.batch campaign=%s sent=%s failed=%s skipped=%s", campaign.id, batch_sent, batch_failed, batch_skipped
+            )
+
+    # rows still claimed belong to an overlapping run; the run that writes the last batch finishes the campaign
+    if CampaignRecipient.objects.filter(
+        campaign=campaign, status__in=[CampaignRecipient.STATUS_QUEUED, CampaignRecipient.STATUS_SENDING]
+    ).exists():
+        return
+    campaign.refresh_from_db(fields=["sent_count", "failed_count"])
+    failed = campaign.failed_count
+    finished = Campaign.objects.filter(pk=campaign.pk, status=Campaign.STATUS_SENDING).update(
+        status=Campaign.STATUS_COMPLETED if failed == 0 else Campaign.STATUS_FAILED
+    )
+    if not finished:
+        return
+    broadcast_to_org(
+        campaign.organization,
+        type="CAMPAIGN",
+        severity="LOW" if failed == 0 else "HIGH",
+        title=f"Campaign {campaign.id} completed" if failed == 0 else f"Campaign {campaign.id} partially failed",
+        body=f"{campaign.sent_count} sent, {failed} failed",
+        target_url=f"/messaging/campaign/{campaign.id}",
+    )
+
+
+# model and provider-id field for agent-composed messages delivered by send_pending_messages
+DIRECT_CHANNELS = {
+    "whatsapp": (WhatsAppMessage, "twilio_message_sid"),
+    "telegram": (TelegramMessage, "telegram_message_id"),
+    "instagram": (InstagramMessage, "provider_message_id"),
+}
+
+
+def _direct_kwargs(channel: str, message) -> dict:
+    """Sender arguments for one pending message, resolved up front so worker threads never touch the ORM."""
+    contact = message.contact
+    if channel == "whatsapp":
+        urls = [_whatsapp_media_url(message, att) for att in message.attachments or [] if att.get("url")]
+        return {"to": contact.phone_whatsapp or "", "body": message.text, "media_urls": urls or None}
+    if channel == "instagram":
+        return {"to": contact.instagram_user_id or "", "body": message.text}
+    kwargs = {"to": message.chat_id, "body": message.text}
+    attachment = (message.attachments or [None])[0]
+    if attachment:
+        stored = EmailAttachment.objects.filter(pk=attachment.get("id"), organization_id=message.organization_id).first()
+        if not stored or not stored.file:
+            raise ValueError(f"Attachment file missing for {attachment.get('name') or attachment.get('id')}")
+        media_path, content_key = stored.file.path, stored.content_key
+        if message.message_type == TelegramMessage.TYPE_PHOTO:
+            variant = optimized_image(stored, "telegram")
+            if variant:
+                media_path = default_storage.path(variant)
+                content_key = f"{stored.content_key}:{IMAGE_PROFILES['telegram'].key}"
+        kwargs.update(
+            media_path=media_path,
+            media_type="photo" if message.message_type == TelegramMessage.TYPE_PHOTO else "document",
+            caption=message.text or None,
+            content_key=content_key,
+        )
+    return kwargs
+
+
+def _whatsapp_media_url(message, attachment: dict) -> str:
+    """The attachment's public URL, pointed at its optimized image variant when there is one."""
+    url = attachment["url"]
+    stored = EmailAttachment.objects.filter(pk=attachment.get("id"), organization_id=message.organization_id).first()
+    variant = optimized_image(stored, "whatsapp") if stored and stored.file else None
+    if not variant or not url.endswith(stored.file.url):
+        return url
+    # keep the public base the create endpoint resolved; only the path changes
+    return url[: -len(stored.file.url)] + default_storage.url(variant)
+
+
+def _send_direct(channel: str, kwargs: dict, credentials: dict) -> SendResult:
+    try:
+        return get_sender(channel).send(credentials=credentials, **kwargs)
+    except Exception as exc:  # noqa: BLE001
+        return SendResult(success=False, error=str(exc))
+
+
+def _claim_pending(model, message_ids: list[int]) -> list[int]:
+    """Move the still-PENDING rows to SENDING so a redelivered task cannot send them a second time."""
+    with transaction.atomic():
+        ids = list(
+            model.objects.select_for_update(skip_locked=True)
+            .filter(id__in=message_ids, status=model.STATUS_PENDING)
+            .values_list("id", flat=True)
+        )
+        model.objects.filter(id__in=ids, status=model.STATUS_PENDING).update(status=model.STATUS_SENDING)
+    return ids
+
+
+def send_pending_messages(channel: str, message_ids: list[int]) -> tuple[int, int]:
+    """
+    Deliver messages the create endpoints persisted as PENDING. Rows are claimed (PENDING -> SENDING)
+    before any provider call; the calls for one request (e.g. a chat's attachments) run concurrently
+    and each outcome is written back to its row and pushed to the realtime stream. Returns (sent, failed).
+    """
+    model, provider_field = DIRECT_CHANNELS[channel]
+    claimed = _claim_pending(model, message_ids)
+    messages = list(model.objects.filter(id__in=claimed).select_related("contact").order_by("id"))
+    if not messages:
+        return 0, 0
+    results: dict[int, SendResult] = {}
+    try:
+        credentials = channel_credentials(messages[0].organization_id, channel)
+    except ValueError as exc:
+        credentials = None
+        results = {message.id: SendResult(success=False, error=str(exc)) for message in messages}
+    if credentials is not None:
+        jobs = {}
+        for message in messages:
+            try:
+                jobs[message.id] = _direct_kwargs(channel, message)
+            except ValueError as exc:
+                results[message.id] = SendResult(success=False, error=str(exc))
+        workers = max(1, min(len(jobs), int(getattr(settings, "CHANNEL_CONCURRENCY", {}).get(channel, 4))))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"direct-{channel}") as executor:
+            futures = {mid: executor.submit(_send_direct, channel, kwargs, credentials) for mid, kwargs in jobs.items()}
+        results.update({mid: future.result() for mid, future in futures.items()})
+
+    sent_contact_ids = []
+    for message in messages:
+        result = results[message.id]
+        if result.success:
+            message.status = model.STATUS_SENT
+            setattr(message, provider_field, result.provider_message_id or "")
+            sent_contact_ids.append(message.contact_id)
+        else:
+            message.status = model.STATUS_FAILED
+            message.error_reason = result.error or "unknown error"
+            logger.error(
+                "%s send failed: %s (org=%s contact=%s message=%s)",
+                channel,
+                message.error_reason,
+                message.organization_id,
+                message.contact_id,
+                message.id,
+            )
+    model.objects.bulk_update(messages, ["status", provider_field, "error_reason"])
+    for message in messages:
+        publish(message.organization_id, message.contact_id, status_event(message, channel))
+    if sent_contact_ids:
+        now = timezone.now()
+        updates = {"last_outbound_at": now, "updated_at": now}
+        if channel == "instagram":
+            updates["instagram_last_outbound_at"] = now
+        Contact.objects.filter(id__in=sent_contact_ids).update(**updates)
+    return len(sent_contact_ids), len(messages) - len(sent_contact_ids)
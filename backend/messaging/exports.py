@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import csv
+import json
+import tempfile
+import zlib
+from datetime import date, datetime
+from typing import Callable, Iterable, Iterator
+
+from django.conf import settings
+from django.core.files import File
+from django.core.signing import TimestampSigner
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from contacts.models import Contact, ContactGroup
+from contacts.search import attribute_filters_q, search_contacts
+from .models import CampaignRecipient, EmailRecipient, ExportJob
+
+EXPORT_CHUNK_SIZE = int(getattr(settings, "EXPORT_CHUNK_SIZE", 2000))
+EXPORT_SYNC_LIMIT = int(getattr(settings, "EXPORT_SYNC_LIMIT", 50000))
+EXPORT_LINK_MAX_AGE = int(getattr(settings, "EXPORT_LINK_MAX_AGE", 60 * 60 * 24))
+OUTPUT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+_FLUSH_BYTES = 64 * 1024
+_signer = TimestampSigner(salt="messaging.exports")
+
+CONTACT_FIELDS = [
+    "id",
+    "full_name",
+    "email",
+    "phone_whatsapp",
+    "telegram_chat_id",
+    "instagram_scoped_id",
+    "instagram_user_id",
+    "status",
+    "tags",
+    "groups",
+    "created_at",
+    "updated_at",
+]
+CAMPAIGN_RECIPIENT_FIELDS = [
+    "id",
+    "contact_id",
+    "contact__full_name",
+    "contact__email",
+    "contact__phone_whatsapp",
+    "status",
+    "provider_message_id",
+    "error_message",
+    "created_at",
+]
+EMAIL_RECIPIENT_FIELDS = [
+    "id",
+    "contact_id",
+    "email",
+    "full_name",
+    "status",
+    "error",
+    "retry_count",
+    "provider_message_id",
+    "sent_at",
+    "read_at",
+    "created_at",
+    "updated_at",
+]
+
+
+def contact_export_queryset(org, params: dict):
+    """Contacts for export; honours the same status/groups/search/tag/metadata filters as the list endpoint."""
+    qs = Contact.objects.filter(organization=org).defer("search_vector")
+    if params.get("status"):
+        qs = qs.filter(status=params["status"])
+    if params.get("groups"):
+        qs = qs.filter(groups__id__in=params["groups"]).distinct()
+    if params.get("tags") or params.get("metadata"):
+        qs = qs.filter(attribute_filters_q(params.get("tags"), params.get("metadata")))
+    if params.get("search"):
+        qs = search_contacts(qs, params["search"])
+    return qs.order_by("id")
+
+
+def _contact_row(contact: Contact) -> dict:
+    row = {f: getattr(contact, f) for f in CONTACT_FIELDS if f != "groups"}
+    row["groups"] = [group.name for group in contact.groups.all()]
+    return row
+
+
+def export_source(org, kind: str, params: dict) -> tuple[list[str], object, Callable]:
+    """(columns, ordered queryset, row builder) for an export kind, scoped to `org`."""
+    if kind == ExportJob.KIND_CONTACTS:
+        qs = contact_export_queryset(org, params).prefetch_related(Prefetch("groups", queryset=ContactGroup.objects.only("id", "name")))
+        return CONTACT_FIELDS, qs, _contact_row
+    if kind == ExportJob.KIND_CAMPAIGN_RECIPIENTS:
+        qs = CampaignRecipient.objects.filter(campaign_id=params["campaign_id"], campaign__organization=org).order_by("id")
+        return CAMPAIGN_RECIPIENT_FIELDS, qs.values(*CAMPAIGN_RECIPIENT_FIELDS), dict
+    if kind == ExportJob.KIND_EMAIL_RECIPIENTS:
+        qs = EmailRecipient.objects.filter(job_id=params["job_id"], job__organization=org).order_by("id")
+        return EMAIL_RECIPIENT_FIELDS, qs.values(*EMAIL_RECIPIENT_FIELDS), dict
+    raise ValueError(f"Unknown export kind: {kind}")
+
+
+def iter_rows(queryset, row_fn: Callable) -> Iterator[dict]:
+    """Server-side cursor over the queryset; memory is bounded by EXPORT_CHUNK_SIZE."""
+    for obj in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield row_fn(obj)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, list):
+        return "|".join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, (datetime, date)) else str(value)
+
+
+def encode_rows(output: str, fields: list[str], rows: Iterable[dict]) -> Iterator[str]:
+    if output == "jsonl":
+        for row in rows:
+            yield json.dumps({f: row.get(f) for f in fields}, default=_json_default) + "\n"
+        return
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_cell(row.get(f)) for f in fields])
+
+
+def stream_bytes(chunks: Iterable[str], gzip: bool = False) -> Iterator[bytes]:
+    """Coalesce encoded rows into ~64KB writes, optionally gzip-compressed on the fly."""
+    compressor = zlib.compressobj(wbits=31) if gzip else None
+    buffer: list[bytes] = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        buffer.append(data)
+        size += len(data)
+        if size >= _FLUSH_BYTES:
+            block = b"".join(buffer)
+            buffer, size = [], 0
+            block = compressor.compress(block) if compressor else block
+            if block:
+                yield block
+    block = b"".join(buffer)
+    if compressor:
+        block = compressor.compress(block) + compressor.flush()
+    if block:
+        yield block
+
+
+def export_filename(name: str, output: str, gzip: bool) -> str:
+    return f"{name}.{output}" + (".gz" if gzip else "")
+
+
+def export_response(fields: list[str], rows: Iterable[dict], *, output: str, gzip: bool, name: str) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(
+        stream_bytes(encode_rows(output, fields, rows), gzip),
+        content_type="application/gzip" if gzip else OUTPUT_TYPES[output],
+    )
+    response["Content-Disposition"] = f'attachment; filename="{export_filename(name, output, gzip)}"'
+    return response
+
+
+def run_export_job(job: ExportJob) -> None:
+    """Write an export to storage through a temp file (constant memory) and record the row count."""
+    fields, queryset, row_fn = export_source(job.organization, job.kind, job.params)
+    count = 0
+
+    def _counted():
+        nonlocal count
+        for row in iter_rows(queryset, row_fn):
+            count += 1
+            yield row
+
+    with tempfile.TemporaryFile() as tmp:
+        for block in stream_bytes(encode_rows(job.output, fields, _counted()), job.gzip):
+            tmp.write(block)
+        tmp.seek(0)
+        job.file.save(export_filename(f"{job.kind}-{job.id}", job.output, job.gzip), File(tmp), save=False)
+    job.row_count = count
+    job.status = ExportJob.STATUS_COMPLETED
+    job.completed_at = timezone.now()
+    job.save(update_fields=["file", "row_count", "status", "completed_at"])
+
+
+def sign_export(job: ExportJob) -> str:
+    return _signer.sign(str(job.id))
+
+
+def unsign_export(token: str) -> int:
+    """Export id from a download token; raises BadSignature/SignatureExpired."""
+    return int(_signer.unsign(token, max_age=EXPORT_LINK_MAX_AGE))
+
+
+def export_or_queue(request, org, kind: str, params: dict, name: str):
+    """
+    Stream an export inline, or queue it as an ExportJob (202 + job resource) when it exceeds
+    EXPORT_SYNC_LIMIT rows or `?background=1` is passed.
+    Query params: output=csv|jsonl, gzip=1.
+    """
+    from .serializers import ExportJobSerializer
+    from .tasks import run_export
+
+    output = request.query_params.get("output", "csv")
+    if output not in OUTPUT_TYPES:
+        return Response({"detail": "output must be csv or jsonl"}, status=400)
+    gzip = request.query_params.get("gzip", "").lower() in ("1", "true", "yes")
+    fields, queryset, row_fn = export_source(org, kind, params)
+    background = request.query_params.get("background", "").lower() in ("1", "true", "yes")
+    if background or queryset.count() > EXPORT_SYNC_LIMIT:
+        job = ExportJob.objects.create(
+            organization=org,
+            created_by=request.user if request.user.is_authenticated else None,
+            kind=kind,
+            params=params,
+            output=output,
+            gzip=gzip,
+        )
+        run_export.delay(job.id)
+        job.refresh_from_db()
+        return Response(ExportJobSerializer(job, context={"request": request}).data, status=status.HTTP_202_ACCEPTED)
+    return export_response(fields, iter_rows(queryset, row_fn), output=output, gzip=gzip, name=name)
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import io
+import logging
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+MEDIA_IMAGE_OPTIMIZATION = bool(getattr(settings, "MEDIA_IMAGE_OPTIMIZATION", True))
+OPTIMIZABLE_TYPES = {"image/jpeg", "image/png"}
+VARIANT_CACHE_SECONDS = 7 * 24 * 3600
+
+
+@dataclass(frozen=True)
+class ImageProfile:
+    """Target for images sent on one channel; bump version when the output would change."""
+
+    name: str
+    max_side: int
+    quality: int
+    version: int = 1
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}-v{self.version}"
+
+
+# Telegram recompresses photos to 2560px on its side; WhatsApp renders images at ~1600px
+IMAGE_PROFILES = {
+    "telegram": ImageProfile("telegram", max_side=2560, quality=85),
+    "whatsapp": ImageProfile("whatsapp", max_side=1600, quality=80),
+}
+
+
+def _variant_name(organization_id: int, sha256: str, profile: ImageProfile, ext: str) -> str:
+    # under attachments/ so the media view serves it publicly (providers fetch WhatsApp media by URL)
+    return f"attachments/{organization_id}/variants/{sha256}-{profile.key}{ext}"
+
+
+def _render(file, profile: ImageProfile) -> tuple[bytes, str] | None:
+    """Downscaled, recompressed copy without EXIF/text metadata, or None when the original is already as small."""
+    from PIL import Image, ImageOps
+
+    with file.open("rb") as fh:
+        image = Image.open(fh)
+        image.load()
+    # apply the EXIF orientation before the metadata carrying it is dropped
+    image = ImageOps.exif_transpose(image)
+    resized = max(image.size) > profile.max_side
+    if resized:
+        image.thumbnail((profile.max_side, profile.max_side), Image.Resampling.LANCZOS)
+    out = io.BytesIO()
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image.save(out, "PNG", optimize=True)
+        ext = ".png"
+    else:
+        image.convert("RGB").save(out, "JPEG", quality=profile.quality, optimize=True, progressive=True)
+        ext = ".jpg"
+    data = out.getvalue()
+    if not resized and len(data) >= file.size:
+        return None
+    return data, ext
+
+
+def optimized_image(attachment, channel: str) -> str | None:
+    """
+    Storage name of `attachment`'s variant for `channel`, rendered on first use and shared by every
+    later send of the same bytes; None means send the original (not an image, no gain, or disabled).
+    """
+    profile = IMAGE_PROFILES.get(channel)
+    if not MEDIA_IMAGE_OPTIMIZATION or profile is None or not attachment.sha256:
+        return None
+    if (attachment.content_type or "").lower() not in OPTIMIZABLE_TYPES:
+        return None
+    cache_key = f"image-variant:{attachment.organization_id}:{attachment.sha256}:{profile.key}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached or None
+    for ext in (".jpg", ".png"):
+        name = _variant_name(attachment.organization_id, attachment.sha256, profile, ext)
+        if default_storage.exists(name):
+            cache.set(cache_key, name, VARIANT_CACHE_SECONDS)
+            return name
+    try:
+        rendered = _render(attachment.file, profile)
+    except Exception:  # noqa: BLE001
+        logger.warning("image optimization failed attachment=%s profile=%s", attachment.pk, profile.key, exc_info=True)
+        return None
+    name = ""
+    if rendered is not None:
+        data, ext = rendered
+        name = default_storage.save(_variant_name(attachment.organization_id, attachment.sha256, profile, ext), ContentFile(data))
+    # "" remembers that the original is already optimal so it is not re-decoded on every send
+    cache.set(cache_key, name, VARIANT_CACHE_SECONDS)
+    return name or None
+
+
+def delete_variants(organization_id: int, sha256: str) -> None:
+    for profile in IMAGE_PROFILES.values():
+        for ext in (".jpg", ".png"):
+            name = _variant_name(organization_id, sha256, profile, ext)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+        cache.delete(f"image-variant:{organization_id}:{sha256}:{profile.key}")
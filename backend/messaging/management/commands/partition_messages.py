@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from messaging.partitioning import (
+    PARTITIONED_TABLES,
+    add_months,
+    conversion_sql,
+    create_partitions_sql,
+    detach_sql,
+    first_partition_month,
+    is_partitioned,
+    month_start,
+    partition_key_index_sql,
+    partitions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Monthly range partitioning for the high-volume messaging tables (PostgreSQL only). "
+        "--convert turns plain tables into partitioned ones (once: builds the (id, time) key index concurrently, "
+        "then takes an exclusive lock per table while validating its rows); "
+        "every run creates missing future partitions; --detach-older-than moves old months out."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--convert", action="store_true", help="Convert tables that are not partitioned yet.")
+        parser.add_argument("--table", action="append", dest="tables", help="Limit to these models (e.g. OutboundMessage).")
+        parser.add_argument("--months-ahead", type=int, default=3, help="Future monthly partitions to keep ready.")
+        parser.add_argument("--detach-older-than", type=int, metavar="MONTHS", help="Detach partitions older than this many months.")
+        parser.add_argument("--archive-schema", default="archive", help="Schema detached partitions are moved to ('' to leave them in place).")
+        parser.add_argument("--dry-run", action="store_true", help="Print the DDL instead of running it.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Table partitioning requires PostgreSQL.")
+        specs = PARTITIONED_TABLES
+        if options["tables"]:
+            specs = [spec for spec in PARTITIONED_TABLES if spec.model in options["tables"]]
+            unknown = set(options["tables"]) - {spec.model for spec in specs}
+            if unknown:
+                raise CommandError(f"Not a partitioned model: {', '.join(sorted(unknown))}")
+        today = date.today()
+        horizon = add_months(month_start(today), options["months_ahead"] + 1)
+
+        for spec in specs:
+            statements = []
+            if is_partitioned(spec.table):
+                existing = {name for name, _ in partitions(spec.table)}
+                statements += create_partitions_sql(spec.table, today, horizon, existing, column=spec.column)
+                if options["detach_older_than"]:
+                    older_than = add_months(month_start(today), -options["detach_older_than"])
+                    statements += detach_sql(spec.table, older_than, options["archive_schema"] or None)
+            elif options["convert"]:
+                key_index = partition_key_index_sql(spec)
+                if key_index and options["dry_run"]:
+                    self.stdout.write(f"-- {spec.table} (outside a transaction)")
+                    for statement in key_index:
+                        self.stdout.write(f"{statement};")
+                elif key_index:
+                    # CONCURRENTLY can't run in a transaction; without this index ATTACH would build it under the lock
+                    with connection.cursor() as cursor:
+                        for statement in key_index:
+                            cursor.execute(statement)
+                    self.stdout.write(f"{spec.table}: partition key index built")
+                first_month = first_partition_month(spec, today)
+                statements += conversion_sql(spec, first_month=first_month)
+                statements += create_partitions_sql(spec.table, first_month, max(horizon, add_months(first_month, 1)), set())
+            else:
+                self.stdout.write(f"{spec.table}: not partitioned (use --convert)")
+                continue
+
+            if not statements:
+                self.stdout.write(f"{spec.table}: up to date")
+                continue
+            if options["dry_run"]:
+                self.stdout.write(f"-- {spec.table}")
+                for statement in statements:
+                    self.stdout.write(f"{statement};")
+                continue
+            # one transaction per table: a failed conversion leaves that table exactly as it was
+            with transaction.atomic(), connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+            self.stdout.write(self.style.SUCCESS(f"{spec.table}: {len(statements)} statement(s) applied"))
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Telegram file_ids don't expire; the TTL only bounds how long a stale entry can linger
+MEDIA_ID_CACHE_SECONDS = int(getattr(settings, "PROVIDER_MEDIA_ID_CACHE_SECONDS", 30 * 24 * 3600))
+
+
+def media_cache_key(provider: str, integration_id: int, content_key: str) -> str:
+    # media ids are scoped to the uploading account (e.g. one bot), hence the integration in the key
+    return f"provider-media:{provider}:{integration_id}:{content_key}"
+
+
+def get_media_id(provider: str, integration_id: int | None, content_key: str | None) -> str | None:
+    if not integration_id or not content_key:
+        return None
+    return cache.get(media_cache_key(provider, integration_id, content_key))
+
+
+def remember_media_id(provider: str, integration_id: int | None, content_key: str | None, media_id: str | None) -> None:
+    if integration_id and content_key and media_id:
+        cache.set(media_cache_key(provider, integration_id, content_key), media_id, MEDIA_ID_CACHE_SECONDS)
+
+
+def forget_media_id(provider: str, integration_id: int | None, content_key: str | None) -> None:
+    if integration_id and content_key:
+        cache.delete(media_cache_key(provider, integration_id, content_key))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0015_remove_contact_uniq_contact_email_per_org_and_more'),
+        ('messaging', '0024_campaign_prepared_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='campaignrecipient',
+            index=models.Index(fields=['campaign', 'status', 'id'], name='camp_rcpt_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campaignrecipient',
+            index=models.Index(fields=['provider_message_id'], name='camp_rcpt_provider_idx'),
+        ),
+    ]
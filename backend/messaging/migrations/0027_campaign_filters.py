@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0026_campaign_pacing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='filters',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
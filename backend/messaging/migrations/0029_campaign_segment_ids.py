@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0028_export_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='segment_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0020_dedup'),
+        ('messaging', '0029_campaign_segment_ids'),
+        ('organizations', '0005_apikey'),
+        ('templates_app', '0006_rename_template_default_idx_templates_a_organiz_8e2b87_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emailrecipient',
+            index=models.Index(fields=['contact', 'created_at', 'id'], name='emailrcpt_contact_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inboundmessage',
+            index=models.Index(fields=['contact', 'received_at', 'id'], name='inbound_contact_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outboundmessage',
+            index=models.Index(fields=['contact', 'created_at', 'id'], name='outbound_contact_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='telegrammessage',
+            index=models.Index(fields=['contact', 'created_at', 'id'], name='tgmsg_contact_created_idx'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 1000
+
+
+def _latest_per_contact(model, ts, **filters):
+    # newest row per (organization, contact) via a correlated lookup on the per-contact indexes
+    newest = model.objects.filter(
+        organization_id=OuterRef("organization_id"), contact_id=OuterRef("contact_id"), **filters
+    ).order_by(f"-{ts}", "-id")
+    return model.objects.filter(contact__isnull=False, **filters).filter(id=Subquery(newest.values("id")[:1]))
+
+
+def backfill_conversations(apps, schema_editor):
+    Conversation = apps.get_model("messaging", "Conversation")
+    sources = [(apps.get_model("messaging", name), channel) for name, channel in (
+        ("WhatsAppMessage", "whatsapp"), ("TelegramMessage", "telegram"), ("InstagramMessage", "instagram")
+    )]
+    rows = []
+    for model, channel in sources:
+        for msg in _latest_per_contact(model, "created_at").iterator(chunk_size=BATCH_SIZE):
+            rows.append(Conversation(
+                organization_id=msg.organization_id, contact_id=msg.contact_id, channel=channel,
+                last_message_at=msg.created_at, last_snippet=(msg.text or "")[:280],
+                last_direction=msg.direction,
+            ))
+    InboundMessage = apps.get_model("messaging", "InboundMessage")
+    channels = (
+        InboundMessage.objects.exclude(channel__in=["whatsapp", "telegram", "instagram"])
+        .order_by().values_list("channel", flat=True).distinct()
+    )
+    for channel in list(channels):
+        for msg in _latest_per_contact(InboundMessage, "received_at", channel=channel).iterator(chunk_size=BATCH_SIZE):
+            payload = msg.payload if isinstance(msg.payload, dict) else {}
+            text = payload.get("text") or payload.get("body") or payload.get("message") or payload.get("subject") or ""
+            rows.append(Conversation(
+                organization_id=msg.organization_id, contact_id=msg.contact_id, channel=channel,
+                last_message_at=msg.received_at, last_snippet=str(text)[:280], last_direction="INBOUND",
+            ))
+    Conversation.objects.bulk_create(rows, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0020_dedup'),
+        ('messaging', '0030_timeline_indexes'),
+        ('organizations', '0005_apikey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(max_length=32)),
+                ('last_message_at', models.DateTimeField()),
+                ('last_snippet', models.CharField(blank=True, default='', max_length=280)),
+                ('last_direction', models.CharField(choices=[('INBOUND', 'Inbound'), ('OUTBOUND', 'Outbound')], default='INBOUND', max_length=16)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('contact', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to='contacts.contact')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to='organizations.organization')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['organization', 'last_message_at', 'id'], name='conversation_inbox_idx')],
+                'unique_together': {('organization', 'contact', 'channel')},
+            },
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
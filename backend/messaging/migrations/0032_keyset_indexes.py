@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0021_keyset_indexes'),
+        ('messaging', '0031_conversation'),
+        ('organizations', '0005_apikey'),
+        ('templates_app', '0006_rename_template_default_idx_templates_a_organiz_8e2b87_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inboundmessage',
+            index=models.Index(fields=['organization', 'received_at', 'id'], name='inbound_org_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instagrammessage',
+            index=models.Index(fields=['organization', 'created_at', 'id'], name='ig_msg_org_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outboundmessage',
+            index=models.Index(fields=['organization', 'created_at', 'id'], name='outbound_org_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='providerevent',
+            index=models.Index(fields=['organization', 'received_at', 'id'], name='provider_event_org_recv_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='telegrammessage',
+            index=models.Index(fields=['organization', 'created_at', 'id'], name='tgmsg_org_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='whatsappmessage',
+            index=models.Index(fields=['organization', 'created_at', 'id'], name='wa_msg_org_created_idx'),
+        ),
+    ]
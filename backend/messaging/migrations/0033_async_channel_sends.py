@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0032_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='telegrammessage',
+            name='error_reason',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='instagrammessage',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('SENT', 'Sent'), ('FAILED', 'Failed'), ('RECEIVED', 'Received')], default='SENT', max_length=16),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:26
+
+import django.db.models.deletion
+import messaging.models
+from django.db import migrations, models
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def backfill_blobs(apps, schema_editor):
+    # existing uploads become blobs in place: the first file per (org, hash) is kept and duplicates
+    # are repointed to it; their now-unreferenced copies are left on disk rather than deleted here
+    import hashlib
+
+    EmailAttachment = apps.get_model("messaging", "EmailAttachment")
+    AttachmentBlob = apps.get_model("messaging", "AttachmentBlob")
+    blobs = {}
+    for att in EmailAttachment.objects.filter(blob__isnull=True).order_by("id").iterator(chunk_size=500):
+        if not att.file:
+            continue
+        digest = hashlib.sha256()
+        try:
+            with att.file.open("rb") as fh:
+                for chunk in iter(lambda: fh.read(HASH_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+        except OSError:
+            continue
+        key = (att.organization_id, digest.hexdigest())
+        blob = blobs.get(key)
+        if blob is None:
+            blob = blobs[key] = AttachmentBlob.objects.create(
+                organization_id=att.organization_id, sha256=key[1], file=att.file.name,
+                size=att.size, content_type=att.content_type,
+            )
+        blob.ref_count += 1
+        EmailAttachment.objects.filter(pk=att.pk).update(blob=blob, sha256=key[1], file=blob.file.name)
+    for blob in blobs.values():
+        AttachmentBlob.objects.filter(pk=blob.pk).update(ref_count=blob.ref_count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0033_async_channel_sends'),
+        ('organizations', '0005_apikey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailattachment',
+            name='sha256',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='emailattachment',
+            name='file',
+            field=models.FileField(max_length=255, upload_to='email_attachments/'),
+        ),
+        migrations.CreateModel(
+            name='AttachmentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64)),
+                ('file', models.FileField(max_length=255, upload_to=messaging.models.attachment_blob_path)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('content_type', models.CharField(blank=True, default='', max_length=100)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachment_blobs', to='organizations.organization')),
+            ],
+            options={
+                'unique_together': {('organization', 'sha256')},
+            },
+        ),
+        migrations.AddField(
+            model_name='emailattachment',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='attachments', to='messaging.attachmentblob'),
+        ),
+        migrations.RunPython(backfill_blobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0035_attachment_uploads'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='providerevent',
+            name='outbound',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='provider_events', to='messaging.outboundmessage'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0021_keyset_indexes'),
+        ('messaging', '0036_provider_event_outbound_no_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignUploadContact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_contacts', to='messaging.campaign')),
+                ('contact', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contacts.contact')),
+            ],
+            options={
+                'unique_together': {('campaign', 'contact')},
+            },
+        ),
+    ]
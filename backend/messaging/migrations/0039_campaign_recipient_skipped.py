@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0038_campaign_recipient_sending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='skipped_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='campaignrecipient',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('skipped', 'Skipped'), ('delivered', 'Delivered'), ('read', 'Read'), ('failed', 'Failed'), ('unsubscribed', 'Unsubscribed')], default='queued', max_length=16),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0039_campaign_recipient_skipped'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='instagrammessage',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed'), ('RECEIVED', 'Received')], default='SENT', max_length=16),
+        ),
+        migrations.AlterField(
+            model_name='whatsappmessage',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('DELIVERED', 'Delivered'), ('FAILED', 'Failed'), ('RECEIVED', 'Received')], default='PENDING', max_length=16),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import os
+
 from django.db import models, transaction
 from django.utils import timezone
 
@@ -49,6 +51,10 @@ class OutboundMessage(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["contact", "created_at", "id"], name="outbound_contact_created_idx"),
+            models.Index(fields=["organization", "created_at", "id"], name="outbound_org_created_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.channel} -> {self.contact.full_name} ({self.status})"
@@ -77,6 +83,10 @@ class InboundMessage(models.Model):
 
     class Meta:
         ordering = ["-received_at"]
+        indexes = [
+            models.Index(fields=["contact", "received_at", "id"], name="inbound_contact_received_idx"),
+            models.Index(fields=["organization", "received_at", "id"], name="inbound_org_received_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Inbound {self.channel} at {self.received_at}"
@@ -181,11 +191,15 @@ class EmailRecipient(models.Model):
 
     class Meta:
         ordering = ["id"]
+        indexes = [models.Index(fields=["contact", "created_at", "id"], name="emailrcpt_contact_created_idx")]
 
 
 class ProviderEvent(models.Model):
     organization = models.ForeignKey("organizations.Organization", on_delete=models.CASCADE, related_name="provider_events")
-    outbound = models.ForeignKey(OutboundMessage, null=True, blank=True, on_delete=models.SET_NULL, related_name="provider_events")
+    # no DB-level constraint: outbound messages may live in a partitioned table (see messaging.partitioning)
+    outbound = models.ForeignKey(
+        OutboundMessage, null=True, blank=True, on_delete=models.SET_NULL, related_name="provider_events", db_constraint=False
+    )
     provider_message_id = models.CharField(max_length=128, blank=True, default="")
     channel = models.CharField(max_length=32)
     status = models.CharField(max_length=64)
@@ -195,11 +209,42 @@ class ProviderEvent(models.Model):
 
     class Meta:
         ordering = ["-received_at"]
+        indexes = [models.Index(fields=["organization", "received_at", "id"], name="provider_event_org_recv_idx")]
+
+
+def attachment_blob_path(instance, filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return f"attachments/{instance.organization_id}/{instance.sha256[:2]}/{instance.sha256}{ext}"
+
+
+class AttachmentBlob(models.Model):
+    """
+    The single stored copy of an uploaded file within an organization, addressed by its SHA-256.
+    EmailAttachment rows reference it; ref_count tracks how many, and the file goes when it drops to zero.
+    """
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="attachment_blobs")
+    sha256 = models.CharField(max_length=64)
+    file = models.FileField(upload_to=attachment_blob_path, max_length=255)
+    size = models.PositiveBigIntegerField(default=0)
+    content_type = models.CharField(max_length=100, blank=True, default="")
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("organization", "sha256")
+
+    @property
+    def content_key(self) -> str:
+        return f"sha256:{self.sha256}"
 
 
 class EmailAttachment(models.Model):
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="email_attachments")
-    file = models.FileField(upload_to="email_attachments/")
+    # file mirrors blob.file so existing readers (email jobs, media URLs) keep working unchanged
+    file = models.FileField(upload_to="email_attachments/", max_length=255)
+    blob = models.ForeignKey(AttachmentBlob, on_delete=models.RESTRICT, null=True, blank=True, related_name="attachments")
+    sha256 = models.CharField(max_length=64, blank=True, default="")
     filename = models.CharField(max_length=255)
     content_type = models.CharField(max_length=100, blank=True, default="")
     size = models.PositiveIntegerField(default=0)
@@ -208,6 +253,38 @@ class EmailAttachment(models.Model):
     class Meta:
         ordering = ["-created_at"]
 
+    @property
+    def content_key(self) -> str:
+        """Stable key for caches shared across uploads of the same bytes (blob cache, provider media ids)."""
+        return f"sha256:{self.sha256}" if self.sha256 else f"attachment:{self.pk}"
+
+
+class AttachmentUpload(models.Model):
+    """
+    A resumable chunked upload. Byte ranges are staged in storage as they arrive; completing the
+    session hashes the staged file into the content-addressed store as an EmailAttachment.
+    """
+
+    STATUS_OPEN = "open"
+    STATUS_COMPLETED = "completed"
+    STATUS_CHOICES = [(STATUS_OPEN, "Open"), (STATUS_COMPLETED, "Completed")]
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="attachment_uploads")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True, default="")
+    channel = models.CharField(max_length=32, blank=True, default="")
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    staged_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_OPEN)
+    attachment = models.ForeignKey(EmailAttachment, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
 
 class ContactEngagement(models.Model):
     contact = models.ForeignKey(Contact, on_delete=models.CASCADE, related_name="engagements")
@@ -239,6 +316,12 @@ class TelegramMessage(models.Model):
         (TYPE_OTHER, "Other"),
     ]
 
+    STATUS_PENDING = "pending"
+    STATUS_SENDING = "sending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_RECEIVED = "received"
+
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="telegram_messages")
     contact = models.ForeignKey(Contact, on_delete=models.CASCADE, related_name="telegram_messages")
     chat_id = models.CharField(max_length=64)
@@ -248,10 +331,15 @@ class TelegramMessage(models.Model):
     attachments = models.JSONField(default=list, blank=True)
     telegram_message_id = models.CharField(max_length=128, blank=True, default="")
     status = models.CharField(max_length=32, blank=True, default="")
+    error_reason = models.TextField(blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        indexes = [models.Index(fields=["organization", "contact", "chat_id", "created_at"], name="tgmsg_org_contact_idx")]
+        indexes = [
+            models.Index(fields=["organization", "contact", "chat_id", "created_at"], name="tgmsg_org_contact_idx"),
+            models.Index(fields=["contact", "created_at", "id"], name="tgmsg_contact_created_idx"),
+            models.Index(fields=["organization", "created_at", "id"], name="tgmsg_org_created_idx"),
+        ]
 
 
 class WhatsAppMessage(models.Model):
@@ -275,12 +363,14 @@ class WhatsAppMessage(models.Model):
     ]
 
     STATUS_PENDING = "PENDING"
+    STATUS_SENDING = "SENDING"
     STATUS_SENT = "SENT"
     STATUS_DELIVERED = "DELIVERED"
     STATUS_FAILED = "FAILED"
     STATUS_RECEIVED = "RECEIVED"
     STATUS_CHOICES = [
         (STATUS_PENDING, "Pending"),
+        (STATUS_SENDING, "Sending"),
         (STATUS_SENT, "Sent"),
         (STATUS_DELIVERED, "Delivered"),
         (STATUS_FAILED, "Failed"),
@@ -299,7 +389,10 @@ class WhatsAppMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        indexes = [models.Index(fields=["organization", "contact", "created_at"], name="wa_msg_org_contact_idx")]
+        indexes = [
+            models.Index(fields=["organization", "contact", "created_at"], name="wa_msg_org_contact_idx"),
+            models.Index(fields=["organization", "created_at", "id"], name="wa_msg_org_created_idx"),
+        ]
 
 
 class InstagramMessage(models.Model):
@@ -318,10 +411,14 @@ class InstagramMessage(models.Model):
         (TYPE_OTHER, "Other"),
     ]
 
+    STATUS_PENDING = "PENDING"
+    STATUS_SENDING = "SENDING"
     STATUS_SENT = "SENT"
     STATUS_FAILED = "FAILED"
     STATUS_RECEIVED = "RECEIVED"
     STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_SENDING, "Sending"),
         (STATUS_SENT, "Sent"),
         (STATUS_FAILED, "Failed"),
         (STATUS_RECEIVED, "Received"),
@@ -339,17 +436,48 @@ class InstagramMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        indexes = [models.Index(fields=["organization", "contact", "created_at"], name="ig_msg_org_contact_idx")]
+        indexes = [
+            models.Index(fields=["organization", "contact", "created_at"], name="ig_msg_org_contact_idx"),
+            models.Index(fields=["organization", "created_at", "id"], name="ig_msg_org_created_idx"),
+        ]
+
+
+class Conversation(models.Model):
+    """One row per (contact, channel) thread, kept current by messaging.signals as messages are written."""
+
+    DIR_INBOUND = "INBOUND"
+    DIR_OUTBOUND = "OUTBOUND"
+    DIR_CHOICES = [(DIR_INBOUND, "Inbound"), (DIR_OUTBOUND, "Outbound")]
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="conversations")
+    contact = models.ForeignKey(Contact, on_delete=models.CASCADE, related_name="conversations")
+    channel = models.CharField(max_length=32)
+    last_message_at = models.DateTimeField()
+    last_snippet = models.CharField(max_length=280, blank=True, default="")
+    last_direction = models.CharField(max_length=16, choices=DIR_CHOICES, default=DIR_INBOUND)
+    unread_count = models.PositiveIntegerField(default=0)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("organization", "contact", "channel")
+        indexes = [models.Index(fields=["organization", "last_message_at", "id"], name="conversation_inbox_idx")]
+
+    def __str__(self) -> str:
+        return f"{self.channel} with {self.contact_id} ({self.unread_count} unread)"
 
 
 class Campaign(models.Model):
     STATUS_DRAFT = "draft"
+    STATUS_PREPARING = "preparing"
     STATUS_QUEUED = "queued"
     STATUS_SENDING = "sending"
     STATUS_COMPLETED = "completed"
     STATUS_FAILED = "failed"
     STATUS_CHOICES = [
         (STATUS_DRAFT, "Draft"),
+        (STATUS_PREPARING, "Preparing"),
         (STATUS_QUEUED, "Queued"),
         (STATUS_SENDING, "Sending"),
         (STATUS_COMPLETED, "Completed"),
@@ -362,15 +490,21 @@ class Campaign(models.Model):
     template = models.ForeignKey(MessageTemplate, on_delete=models.SET_NULL, null=True, blank=True)
     created_by = models.ForeignKey("auth.User", null=True, blank=True, on_delete=models.SET_NULL, related_name="campaigns_created")
     group_ids = models.JSONField(default=list, blank=True)
+    segment_ids = models.JSONField(default=list, blank=True)
+    filters = models.JSONField(default=dict, blank=True)
     upload_used = models.BooleanField(default=False)
     target_count = models.PositiveIntegerField(default=0)
+    prepared_count = models.PositiveIntegerField(default=0)
     sent_count = models.PositiveIntegerField(default=0)
     delivered_count = models.PositiveIntegerField(default=0)
     read_count = models.PositiveIntegerField(default=0)
     failed_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
     unsubscribed_count = models.PositiveIntegerField(default=0)
     estimated_cost = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    pacing = models.JSONField(default=dict, blank=True)
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_DRAFT)
+    started_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -379,14 +513,18 @@ class Campaign(models.Model):
 
 class CampaignRecipient(models.Model):
     STATUS_QUEUED = "queued"
+    STATUS_SENDING = "sending"
     STATUS_SENT = "sent"
+    STATUS_SKIPPED = "skipped"
     STATUS_DELIVERED = "delivered"
     STATUS_READ = "read"
     STATUS_FAILED = "failed"
     STATUS_UNSUBSCRIBED = "unsubscribed"
     STATUS_CHOICES = [
         (STATUS_QUEUED, "Queued"),
+        (STATUS_SENDING, "Sending"),
         (STATUS_SENT, "Sent"),
+        (STATUS_SKIPPED, "Skipped"),
         (STATUS_DELIVERED, "Delivered"),
         (STATUS_READ, "Read"),
         (STATUS_FAILED, "Failed"),
@@ -400,6 +538,22 @@ class CampaignRecipient(models.Model):
     error_message = models.TextField(blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["campaign", "status", "id"], name="camp_rcpt_status_idx"),
+            models.Index(fields=["provider_message_id"], name="camp_rcpt_provider_idx"),
+        ]
+
+
+class CampaignUploadContact(models.Model):
+    """Uploaded contacts staged for a campaign whose audience is built by a worker; cleared once built."""
+
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name="upload_contacts")
+    contact = models.ForeignKey(Contact, on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        unique_together = ("campaign", "contact")
+
 
 class TelegramInviteToken(models.Model):
     STATUS_PENDING = "PENDING"
@@ -422,3 +576,45 @@ class TelegramInviteToken(models.Model):
 
     class Meta:
         indexes = [models.Index(fields=["organization", "contact", "status"], name="telegram_token_idx")]
+
+
+class ExportJob(models.Model):
+    """A large CSV/JSONL export written to storage by a worker and fetched via a signed link."""
+
+    KIND_CONTACTS = "contacts"
+    KIND_CAMPAIGN_RECIPIENTS = "campaign_recipients"
+    KIND_EMAIL_RECIPIENTS = "email_recipients"
+    KIND_CHOICES = [
+        (KIND_CONTACTS, "Contacts"),
+        (KIND_CAMPAIGN_RECIPIENTS, "Campaign recipients"),
+        (KIND_EMAIL_RECIPIENTS, "Email job recipients"),
+    ]
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="export_jobs")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    output = models.CharField(max_length=8, default="csv")
+    gzip = models.BooleanField(default=False)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    row_count = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to="exports/", null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"ExportJob {self.id} {self.kind} ({self.status})"
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import logging
+import math
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PacingProfile:
+    """
+    Per-campaign delivery pacing.
+    window_minutes: spread the whole audience over this many minutes.
+    max_per_minute: hard cap on send rate (combined with the channel throttle).
+    ramp_up_minutes / ramp_up_start: rate grows linearly from `ramp_up_start` (fraction of
+    full rate) to full rate over the first `ramp_up_minutes`.
+    """
+
+    window_minutes: float | None = None
+    max_per_minute: float | None = None
+    ramp_up_minutes: float = 0
+    ramp_up_start: float = 0.1
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "PacingProfile":
+        data = data or {}
+        if not isinstance(data, dict):
+            raise ValueError("pacing must be an object")
+        unknown = set(data) - set(cls.__dataclass_fields__)
+        if unknown:
+            raise ValueError(f"Unknown pacing keys: {', '.join(sorted(unknown))}")
+        try:
+            profile = cls(
+                window_minutes=float(data["window_minutes"]) if data.get("window_minutes") is not None else None,
+                max_per_minute=float(data["max_per_minute"]) if data.get("max_per_minute") is not None else None,
+                ramp_up_minutes=float(data["ramp_up_minutes"]) if data.get("ramp_up_minutes") is not None else 0,
+                ramp_up_start=float(data["ramp_up_start"]) if data.get("ramp_up_start") is not None else 0.1,
+            )
+        except (TypeError, ValueError) as exc:
+            raise ValueError("pacing values must be numbers") from exc
+        if profile.window_minutes is not None and profile.window_minutes <= 0:
+            raise ValueError("window_minutes must be positive")
+        if profile.max_per_minute is not None and profile.max_per_minute <= 0:
+            raise ValueError("max_per_minute must be positive")
+        if profile.ramp_up_minutes < 0:
+            raise ValueError("ramp_up_minutes cannot be negative")
+        if not 0 < profile.ramp_up_start <= 1:
+            raise ValueError("ramp_up_start must be in (0, 1]")
+        if profile.window_minutes and profile.ramp_up_minutes > profile.window_minutes:
+            raise ValueError("ramp_up_minutes cannot exceed window_minutes")
+        return profile
+
+    @property
+    def is_active(self) -> bool:
+        return bool(self.window_minutes or self.max_per_minute or self.ramp_up_minutes)
+
+    def to_dict(self) -> dict:
+        return {k: v for k, v in asdict(self).items() if v is not None}
+
+    def full_rate(self, total: int, channel_limit: float | None = None) -> float:
+        """Steady-state messages per minute after ramp-up."""
+        caps = [c for c in (self.max_per_minute, channel_limit) if c]
+        rate = min(caps) if caps else math.inf
+        if self.window_minutes:
+            ramp = min(self.ramp_up_minutes, self.window_minutes)
+            # minutes of full-rate-equivalent delivery available inside the window
+            effective = self.window_minutes - ramp * (1 - self.ramp_up_start) / 2
+            rate = min(rate, total / effective) if effective > 0 else rate
+        return rate
+
+    def minutes_to_send(self, count: float, rate: float) -> float:
+        """Time (minutes from start) at which `count` messages have been released."""
+        if count <= 0 or math.isinf(rate):
+            return 0.0
+        ramp, f0 = self.ramp_up_minutes, self.ramp_up_start
+        ramp_capacity = rate * ramp * (1 + f0) / 2
+        if ramp and count <= ramp_capacity:
+            # solve rate * (f0 t + (1 - f0) t^2 / (2 ramp)) = count for t
+            a = rate * (1 - f0) / (2 * ramp)
+            b = rate * f0
+            if a == 0:
+                return count / b
+            return (-b + math.sqrt(b * b + 4 * a * count)) / (2 * a)
+        return ramp + (count - ramp_capacity) / rate
+
+
+def batch_release_times(profile: PacingProfile, total: int, batch_size: int, start: datetime, channel_limit: float | None = None) -> list[datetime]:
+    """Release time of each batch: batch i goes out once the first i*batch_size messages are due."""
+    rate = profile.full_rate(total, channel_limit)
+    batches = math.ceil(total / batch_size) if batch_size else 0
+    return [start + timedelta(minutes=profile.minutes_to_send(i * batch_size, rate)) for i in range(batches)]
+
+
+def next_release_time(profile: PacingProfile, total: int, processed: int, start: datetime, channel_limit: float | None = None) -> datetime:
+    """Release time of the batch that starts after `processed` messages."""
+    rate = profile.full_rate(total, channel_limit)
+    return start + timedelta(minutes=profile.minutes_to_send(processed, rate))
+
+
+def pacing_enabled() -> bool:
+    """Pacing needs a broker to hold deferred tasks; eager mode (dev) has none, so sends go out unpaced."""
+    return not getattr(settings, "CELERY_TASK_ALWAYS_EAGER", False)
+
+
+def effective_profile(data: dict | None) -> PacingProfile:
+    """The stored profile, or an inactive one when pacing cannot be honoured without blocking (eager mode)."""
+    profile = PacingProfile.from_dict(data)
+    if profile.is_active and not pacing_enabled():
+        logger.warning("pacing ignored: CELERY_TASK_ALWAYS_EAGER has no broker to defer batches to")
+        return PacingProfile()
+    return profile
+
+
+def defer_until(task, args: list, eta: datetime) -> bool:
+    """
+    Re-enqueue `task` to run at `eta` so no worker sleeps through a pacing gap.
+    Returns True when the caller should stop and let the re-enqueued task continue. Never blocks:
+    in eager mode (no broker) the batch is released immediately.
+    """
+    if (eta - timezone.now()).total_seconds() <= 0 or not pacing_enabled():
+        return False
+    task.apply_async(args=args, eta=eta)
+    return True
@@ -0,0 +1,269 @@
+"""
+Monthly range partitioning (PostgreSQL) for the append-heavy messaging tables.
+
+A table is converted once: the existing heap is renamed to <table>_legacy and attached as the
+partition holding everything before the first month boundary after its newest row; new rows land in
+<table>_pYYYYMM partitions created ahead of time, with <table>_default as a safety net. Filters on the
+partition column (dashboards, keyset pages, callbacks by time) are pruned to the matching months.
+Old partitions are detached and moved to an archive schema rather than dropped.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import DatabaseError, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PartitionedTable:
+    model: str
+    column: str
+
+    @property
+    def table(self) -> str:
+        from django.apps import apps
+
+        return apps.get_model("messaging", self.model)._meta.db_table
+
+
+PARTITIONED_TABLES = [
+    PartitionedTable("OutboundMessage", "created_at"),
+    PartitionedTable("InboundMessage", "received_at"),
+    PartitionedTable("ProviderEvent", "received_at"),
+    PartitionedTable("EmailRecipient", "created_at"),
+    PartitionedTable("WhatsAppMessage", "created_at"),
+    PartitionedTable("TelegramMessage", "created_at"),
+]
+
+_UPPER_BOUND_RE = re.compile(r"TO \('([^']+)'\)")
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def _bound(month: date) -> str:
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def _q(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+def is_partitioned(table: str) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table])
+        return cursor.fetchone() is not None
+
+
+def partitions(table: str) -> list[tuple[str, datetime | None]]:
+    """(name, exclusive upper bound) of each attached partition; None for the default partition."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            """,
+            [table],
+        )
+        rows = cursor.fetchall()
+    result = []
+    for name, bound in rows:
+        match = _UPPER_BOUND_RE.search(bound or "")
+        upper = datetime.fromisoformat(match.group(1)) if match else None
+        if upper is not None and upper.tzinfo is None:
+            upper = upper.replace(tzinfo=dt_timezone.utc)
+        result.append((name, upper))
+    return result
+
+
+def partition_key_index_name(spec: PartitionedTable) -> str:
+    return f"{spec.table}_id_{spec.column}_uniq"[:56]
+
+
+def partition_key_index_sql(spec: PartitionedTable) -> list[str]:
+    """
+    Build the UNIQUE (id, <column>) index the parent's primary key needs on the plain table, before
+    converting it. CONCURRENTLY keeps writes flowing during the build, so these statements must run
+    outside a transaction; a leftover invalid index from an interrupted build is dropped first.
+    """
+    name = partition_key_index_name(spec)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT i.indisvalid FROM pg_index i WHERE i.indexrelid = to_regclass(%s)", [name])
+        row = cursor.fetchone()
+    if row and row[0]:
+        return []
+    sql = [f"DROP INDEX CONCURRENTLY IF EXISTS {_q(name)}"] if row else []
+    sql.append(f"CREATE UNIQUE INDEX CONCURRENTLY {_q(name)} ON {_q(spec.table)} (id, {_q(spec.column)})")
+    return sql
+
+
+def conversion_sql(spec: PartitionedTable, *, first_month: date) -> list[str]:
+    """
+    DDL turning spec.table into a partitioned table, run in one transaction under an ACCESS
+    EXCLUSIVE lock. The legacy heap is attached as-is and its existing indexes are adopted by the
+    parent's, so the cost under the lock is one full scan validating the rows against the range.
+    The parent's primary key adopts the UNIQUE (id, <column>) index that partition_key_index_sql
+    must have built beforehand (turned into a constraint here, which only touches the catalog).
+    """
+    table, column = spec.table, spec.column
+    legacy = f"{table}_legacy"
+    key_index = partition_key_index_name(spec)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s", [table])
+        indexes = cursor.fetchall()
+        cursor.execute(
+            """
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE conrelid = to_regclass(%s) AND contype = 'f'
+            """,
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+    sql = [
+        f"LOCK TABLE {_q(table)} IN ACCESS EXCLUSIVE MODE",
+        f"ALTER TABLE {_q(table)} RENAME TO {_q(legacy)}",
+    ]
+    # index names are schema-wide: the legacy copies step aside so the parent can reuse the originals
+    for name, _ in indexes:
+        if name != key_index:
+            sql.append(f"ALTER INDEX {_q(name)} RENAME TO {_q(name[:56] + '_legacy')}")
+    # ATTACH only adopts an index for the parent's key when a constraint owns it
+    sql.append(f"ALTER TABLE {_q(legacy)} ADD CONSTRAINT {_q(legacy + '_key')} UNIQUE USING INDEX {_q(key_index)}")
+    # ids keep counting from one sequence shared by all partitions
+    seq = f"{table}_id_seq"
+    sql += [
+        f"ALTER TABLE {_q(legacy)} ALTER COLUMN id DROP IDENTITY IF EXISTS",
+        f"ALTER TABLE {_q(legacy)} ALTER COLUMN id DROP DEFAULT",
+        f"CREATE SEQUENCE IF NOT EXISTS {_q(seq)}",
+        f"SELECT setval('{seq}', COALESCE((SELECT MAX(id) FROM {_q(legacy)}), 0) + 1, false)",
+        f"CREATE TABLE {_q(table)} (LIKE {_q(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) "
+        f"PARTITION BY RANGE ({_q(column)})",
+        f"ALTER SEQUENCE {_q(seq)} OWNED BY {_q(table)}.id",
+        f"ALTER TABLE {_q(table)} ALTER COLUMN id SET DEFAULT nextval('{seq}')",
+        # a partitioned table's unique keys must contain the partition column
+        f"ALTER TABLE {_q(table)} ADD CONSTRAINT {_q(table + '_pkey')} PRIMARY KEY (id, {_q(column)})",
+    ]
+    for name, definition in indexes:
+        # unique indexes without the partition column (the old pkey) can't exist on the parent;
+        # they stay on the legacy partition only
+        if definition.startswith("CREATE UNIQUE"):
+            continue
+        sql.append(definition)
+    for name, definition in foreign_keys:
+        sql.append(f"ALTER TABLE {_q(table)} ADD CONSTRAINT {_q(name)} {definition}")
+    sql += [
+        f"ALTER TABLE {_q(legacy)} ADD CONSTRAINT {_q(legacy + '_range')} "
+        f"CHECK ({_q(column)} IS NOT NULL AND {_q(column)} < {_bound(first_month)}) NOT VALID",
+        f"ALTER TABLE {_q(legacy)} VALIDATE CONSTRAINT {_q(legacy + '_range')}",
+        f"ALTER TABLE {_q(table)} ATTACH PARTITION {_q(legacy)} FOR VALUES FROM (MINVALUE) TO ({_bound(first_month)})",
+        f"CREATE TABLE {_q(table + '_default')} PARTITION OF {_q(table)} DEFAULT",
+    ]
+    return sql
+
+
+def _stranded_rows(table: str, column: str, month: date) -> int:
+    """Rows of `month` sitting in the default partition (written while that month had no partition)."""
+    default = f"{table}_default"
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [default])
+        if not cursor.fetchone()[0]:
+            return 0
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {_q(default)} WHERE {_q(column)} >= {_bound(month)} "
+            f"AND {_q(column)} < {_bound(add_months(month, 1))}"
+        )
+        return cursor.fetchone()[0]
+
+
+def create_partitions_sql(table: str, start: date, end: date, existing: set[str], column: str | None = None) -> list[str]:
+    """
+    CREATE statements for the missing monthly partitions covering [start, end). Postgres refuses
+    to create a partition while the default partition holds rows of its range, so with `column`
+    given such a month is built as a plain table, the rows are moved into it and it is attached;
+    run the result in one transaction.
+    """
+    sql = []
+    month = month_start(start)
+    while month < end:
+        name = partition_name(table, month)
+        bounds = f"FOR VALUES FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})"
+        stranded = _stranded_rows(table, column, month) if column and name not in existing else 0
+        if stranded:
+            logger.warning("partitioning.default_rows table=%s month=%s rows=%s", table, f"{month:%Y-%m}", stranded)
+            range_q = f"{_q(column)} >= {_bound(month)} AND {_q(column)} < {_bound(add_months(month, 1))}"
+            sql += [
+                f"CREATE TABLE {_q(name)} (LIKE {_q(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+                f"WITH moved AS (DELETE FROM {_q(table + '_default')} WHERE {range_q} RETURNING *) "
+                f"INSERT INTO {_q(name)} SELECT * FROM moved",
+                f"ALTER TABLE {_q(table)} ATTACH PARTITION {_q(name)} {bounds}",
+            ]
+        elif name not in existing:
+            sql.append(f"CREATE TABLE IF NOT EXISTS {_q(name)} PARTITION OF {_q(table)} {bounds}")
+        month = add_months(month, 1)
+    return sql
+
+
+def detach_sql(table: str, older_than: date, archive_schema: str | None) -> list[str]:
+    """Detach partitions whose whole range ends on or before `older_than`, optionally moving them to an archive schema."""
+    cutoff = datetime(older_than.year, older_than.month, older_than.day, tzinfo=dt_timezone.utc)
+    sql = []
+    for name, upper in partitions(table):
+        if upper is None or upper > cutoff:
+            continue
+        sql.append(f"ALTER TABLE {_q(table)} DETACH PARTITION {_q(name)}")
+        if archive_schema:
+            sql.append(f"ALTER TABLE {_q(name)} SET SCHEMA {_q(archive_schema)}")
+    if sql and archive_schema:
+        sql.insert(0, f"CREATE SCHEMA IF NOT EXISTS {_q(archive_schema)}")
+    return sql
+
+
+def first_partition_month(spec: PartitionedTable, today: date) -> date:
+    """Month boundary after both the newest existing row and today: the legacy partition holds everything before it."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MAX({_q(spec.column)}) FROM {_q(spec.table)}")
+        newest = cursor.fetchone()[0]
+    latest = max(today, newest.date()) if newest else today
+    return add_months(month_start(latest), 1)
+
+
+def ensure_future_partitions(months_ahead: int, today: date | None = None) -> list[str]:
+    """
+    Create the missing monthly partitions up to `months_ahead` for every converted table; returns the
+    DDL run. A table that fails is logged and skipped so the others (and the next run) still proceed.
+    """
+    if connection.vendor != "postgresql":
+        return []
+    today = today or date.today()
+    executed = []
+    for spec in PARTITIONED_TABLES:
+        try:
+            if not is_partitioned(spec.table):
+                continue
+            existing = {name for name, _ in partitions(spec.table)}
+            horizon = add_months(month_start(today), months_ahead + 1)
+            statements = create_partitions_sql(spec.table, today, horizon, existing, column=spec.column)
+            with transaction.atomic(), connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+        except DatabaseError:
+            logger.exception("partitioning.ensure_failed table=%s", spec.table)
+            continue
+        executed += statements
+    return executed
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Sequence
+
+from django.conf import settings
+
+DIRECTIONS = ("inbound", "outbound", "template")
+ZERO = Decimal("0")
+# Campaign.estimated_cost precision
+COST_QUANTUM = Decimal("0.0001")
+
+
+class PricingUnavailable(Exception):
+    """Raised when the cost table cannot be loaded."""
+
+
+@dataclass
+class CostEstimate:
+    count: int
+    unit_actual: Decimal
+    unit_markup: Decimal
+    currency: str
+
+    @property
+    def actual(self) -> Decimal:
+        return self.unit_actual * self.count
+
+    @property
+    def billable(self) -> Decimal:
+        return self.unit_markup * self.count
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "currency": self.currency,
+            "unit_actual": str(self.unit_actual),
+            "unit_markup": str(self.unit_markup),
+            "actual": str(self.actual),
+            "billable": str(self.billable),
+        }
+
+
+class PricingTable:
+    """cost.json parsed once and re-read only when its mtime changes."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._mtime: int | None = None
+        self._data: dict | None = None
+        self._lock = threading.Lock()
+
+    def data(self) -> dict:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as exc:
+            raise PricingUnavailable("Cost file missing") from exc
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        with open(self.path, "r") as fh:
+                            self._data = json.load(fh, parse_float=Decimal)
+                    except (OSError, ValueError) as exc:
+                        raise PricingUnavailable(f"Cost file unreadable: {exc}") from exc
+                    self._mtime = mtime
+        return self._data
+
+    def unit_rate(self, channel: str, direction: str, category: str | None = None) -> tuple[Decimal, Decimal, str]:
+        """(actual, markup, currency) per message; unpriced channels/directions cost nothing."""
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Unknown pricing direction: {direction}")
+        data = self.data()
+        channel_cfg = (data.get("channels") or {}).get(channel) or {}
+        currency = channel_cfg.get("currency") or data.get("default_currency") or "USD"
+        pricing = (channel_cfg.get("pricing") or {}).get(direction)
+        if not pricing:
+            return ZERO, ZERO, currency
+        amount = pricing.get("amount") or {}
+        if category:
+            amount = (pricing.get("categories") or {}).get(category.lower()) or amount
+        return Decimal(amount.get("actual") or 0), Decimal(amount.get("markup") or 0), currency
+
+    def estimate(self, channel: str, direction: str, counts: int | Sequence[int], category: str | None = None):
+        """Price one count or a sequence of counts with a single rate lookup."""
+        actual, markup, currency = self.unit_rate(channel, direction, category)
+        if isinstance(counts, int):
+            return CostEstimate(counts, actual, markup, currency)
+        return [CostEstimate(int(c), actual, markup, currency) for c in counts]
+
+
+_table = PricingTable(getattr(settings, "COST_TABLE_PATH", os.path.join(settings.BASE_DIR, "cost.json")))
+
+
+def cost_table() -> dict:
+    return _table.data()
+
+
+def estimate(channel: str, direction: str, counts: int | Sequence[int], category: str | None = None):
+    return _table.estimate(channel, direction, counts, category)
+
+
+def campaign_direction(channel: str, template=None) -> tuple[str, str | None]:
+    """Campaign sends bill at the channel's template rate when it has one, else as plain outbound."""
+    try:
+        has_template_rate = bool(((cost_table().get("channels") or {}).get(channel) or {}).get("pricing", {}).get("template"))
+    except PricingUnavailable:
+        has_template_rate = False
+    if template is not None and has_template_rate:
+        return "template", (template.category or None)
+    return "outbound", None
+
+
+def estimate_campaign(channel: str, count: int, template=None) -> CostEstimate | None:
+    """Billable estimate for a campaign audience; None when the cost table is unavailable."""
+    direction, category = campaign_direction(channel, template)
+    try:
+        return estimate(channel, direction, count, category)
+    except PricingUnavailable:
+        return None
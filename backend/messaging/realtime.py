@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import json
+import logging
+
+from django.conf import settings
+from django.core.signing import TimestampSigner
+from django.db import transaction
+
+from .conversations import inbound_text, message_snippet
+
+logger = logging.getLogger(__name__)
+
+REALTIME_REDIS_URL = getattr(settings, "REALTIME_REDIS_URL", "")
+REALTIME_TOKEN_MAX_AGE = int(getattr(settings, "REALTIME_TOKEN_MAX_AGE", 3600))
+REALTIME_HEARTBEAT_SECONDS = int(getattr(settings, "REALTIME_HEARTBEAT_SECONDS", 15))
+
+_signer = TimestampSigner(salt="messaging.realtime")
+_client = None
+
+
+def org_channel(org_id: int) -> str:
+    return f"realtime:org:{org_id}"
+
+
+def contact_channel(org_id: int, contact_id: int) -> str:
+    return f"realtime:org:{org_id}:contact:{contact_id}"
+
+
+def sign_stream_token(org_id: int, user_id: int) -> str:
+    # EventSource cannot send an Authorization header, so the stream URL carries this instead
+    return _signer.sign_object({"org": org_id, "user": user_id})
+
+
+def unsign_stream_token(token: str) -> dict:
+    """Raises BadSignature/SignatureExpired."""
+    return _signer.unsign_object(token, max_age=REALTIME_TOKEN_MAX_AGE)
+
+
+def _redis():
+    global _client
+    if _client is None:
+        import redis
+
+        _client = redis.Redis.from_url(REALTIME_REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+    return _client
+
+
+def message_event(message, channel: str) -> dict:
+    """Compact wire form of a channel message: enough to render a bubble without refetching history."""
+    return {
+        "type": "message",
+        "channel": channel,
+        "id": message.id,
+        "contact_id": message.contact_id,
+        "direction": message.direction.lower(),
+        "message_type": message.message_type.lower(),
+        "text": message_snippet(message.text, message.message_type),
+        "status": message.status,
+        "created_at": message.created_at.isoformat(),
+    }
+
+
+def status_event(message, channel: str) -> dict:
+    """Delivery outcome for a message the client already has (sent/failed/delivered)."""
+    return {
+        "type": "status",
+        "channel": channel,
+        "id": message.id,
+        "contact_id": message.contact_id,
+        "status": message.status,
+        "error": getattr(message, "error_reason", "") or "",
+    }
+
+
+def inbound_event(message) -> dict:
+    return {
+        "type": "message",
+        "channel": message.channel,
+        "id": message.id,
+        "contact_id": message.contact_id,
+        "direction": "inbound",
+        "text": message_snippet(inbound_text(message.payload)),
+        "created_at": message.received_at.isoformat(),
+    }
+
+
+def publish(org_id: int, contact_id: int | None, event: dict) -> None:
+    """
+    Fan an event out to the org's stream and the contact's stream once the surrounding transaction
+    commits. Best effort: a Redis outage is logged and never fails the caller (webhooks must still ack).
+    """
+    if not REALTIME_REDIS_URL:
+        return
+    payload = json.dumps(event, separators=(",", ":"))
+
+    def _send():
+        try:
+            pipe = _redis().pipeline(transaction=False)
+            pipe.publish(org_channel(org_id), payload)
+            if contact_id:
+                pipe.publish(contact_channel(org_id, contact_id), payload)
+            pipe.execute()
+        except Exception:  # noqa: BLE001
+            logger.warning("realtime.publish_failed org=%s contact=%s", org_id, contact_id, exc_info=True)
+
+    transaction.on_commit(_send)
+
+
+def publish_message(message, channel: str) -> None:
+    publish(message.organization_id, message.contact_id, message_event(message, channel))
+
+
+async def event_stream(org_id: int, contact_id: int | None = None):
+    """
+    Server-sent events for one subscriber: a single Redis SUBSCRIBE per connection and a `ping`
+    event right away and every REALTIME_HEARTBEAT_SECONDS. The ping keeps proxies from timing the
+    connection out and, unlike a comment line, reaches the client, which polls once pings stop.
+    """
+    import redis.asyncio as aioredis
+
+    client = aioredis.Redis.from_url(REALTIME_REDIS_URL)
+    pubsub = client.pubsub()
+    await pubsub.subscribe(contact_channel(org_id, contact_id) if contact_id else org_channel(org_id))
+    try:
+        yield "retry: 3000\n\nevent: ping\ndata: {}\n\n"
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=REALTIME_HEARTBEAT_SECONDS)
+            if message is None:
+                yield "event: ping\ndata: {}\n\n"
+                continue
+            data = message["data"]
+            yield f"event: message\ndata: {data.decode() if isinstance(data, bytes) else data}\n\n"
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
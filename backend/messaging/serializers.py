@@ -2,12 +2,14 @@ from __future__ import annotations
 
 from rest_framework import serializers
 from django.conf import settings
+from django.db.models import Exists, OuterRef
 
 from contacts.models import Contact
+from contacts.segments import segments_q
 from contacts.serializers import ContactSerializer
 from templates_app.models import MessageTemplate
 from templates_app.serializers import MessageTemplateSerializer
-from .models import InboundMessage, OutboundMessage, EmailJob, EmailRecipient, EmailAttachment, TelegramInviteToken, TelegramMessage, WhatsAppMessage, InstagramMessage, Campaign, CampaignRecipient
+from .models import InboundMessage, OutboundMessage, EmailJob, EmailRecipient, EmailAttachment, TelegramInviteToken, TelegramMessage, WhatsAppMessage, InstagramMessage, Conversation, Campaign, CampaignRecipient, ExportJob, Suppression
 from urllib.parse import urlparse
 import logging
 from organizations.utils import get_current_org
@@ -170,14 +172,37 @@ class EmailJobSerializer(serializers.ModelSerializer):
         }
 
 
-class EmailJobCreateSerializer(serializers.Serializer):
+class EmailAudienceSerializer(serializers.Serializer):
+    contact_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=True)
+    group_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=True)
+    segment_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=True)
+
+    def validate(self, attrs):
+        if not attrs.get("contact_ids") and not attrs.get("group_ids") and not attrs.get("segment_ids"):
+            raise serializers.ValidationError("Select at least one contact, group or segment.")
+        return attrs
+
+    def preview(self) -> dict:
+        """Recipient count and exclusion breakdown for the selected contacts/groups/segments."""
+        from .audience import audience_preview
+
+        org = get_current_org(self.context.get("request"))
+        return audience_preview(
+            org,
+            "email",
+            contact_ids=self.validated_data.get("contact_ids") or None,
+            group_ids=self.validated_data.get("group_ids") or [],
+            segment_ids=self.validated_data.get("segment_ids") or [],
+            union=True,
+        )
+
+
+class EmailJobCreateSerializer(EmailAudienceSerializer):
     subject = serializers.CharField(max_length=255)
     body_html = serializers.CharField()
     body_text = serializers.CharField(required=False, allow_blank=True, default="")
     attachments = serializers.ListField(child=serializers.DictField(), required=False, allow_empty=True)
     attachment_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=True)
-    contact_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=True)
-    group_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=True)
     template_id = serializers.PrimaryKeyRelatedField(
         source="template",
         queryset=MessageTemplate.objects.all(),
@@ -185,17 +210,13 @@ class EmailJobCreateSerializer(serializers.Serializer):
         allow_null=True,
     )
 
-    def validate(self, attrs):
-        if not attrs.get("contact_ids") and not attrs.get("group_ids"):
-            raise serializers.ValidationError("Select at least one contact or group.")
-        return attrs
-
     def create(self, validated_data):
         request = self.context.get("request")
         org = get_current_org(request)
         user = request.user if request and request.user.is_authenticated else None
         contact_ids = validated_data.get("contact_ids") or []
         group_ids = validated_data.get("group_ids") or []
+        segment_ids = validated_data.get("segment_ids") or []
         template = validated_data.get("template")
 
         contacts = Contact.objects.none()
@@ -203,7 +224,14 @@ class EmailJobCreateSerializer(serializers.Serializer):
             contacts = contacts | Contact.objects.filter(organization=org, status=Contact.STATUS_ACTIVE, id__in=contact_ids)
         if group_ids:
             contacts = contacts | Contact.objects.filter(groups__id__in=group_ids, organization=org, status=Contact.STATUS_ACTIVE)
-        contacts = contacts.distinct()
+        if segment_ids:
+            contacts = contacts | Contact.objects.filter(segments_q(org, segment_ids), organization=org, status=Contact.STATUS_ACTIVE)
+        # same suppression rule as the audience preview, so its count matches the created job
+        contacts = contacts.distinct().annotate(
+            suppressed=Exists(
+                Suppression.objects.filter(organization=org, channel="email", identifier=OuterRef("email"))
+            )
+        )
 
         valid_contacts = []
         exclusions = []
@@ -224,6 +252,8 @@ class EmailJobCreateSerializer(serializers.Serializer):
                     reason = "unsubscribed"
                 elif c.status == Contact.STATUS_BOUNCED:
                     reason = "bounced"
+                elif c.suppressed:
+                    reason = "suppressed"
             if reason:
                 excluded += 1
                 exclusions.append({"contact_id": c.id, "email": c.email, "reason": reason})
@@ -279,6 +309,7 @@ class EmailJobCreateSerializer(serializers.Serializer):
                         "content_type": a.content_type,
                         "size": a.size,
                         "path": a.file.name,
+                        "sha256": a.sha256,
                     }
                 )
         return attachments
@@ -317,9 +348,10 @@ class TelegramMessageSerializer(serializers.ModelSerializer):
             "attachments",
             "telegram_message_id",
             "status",
+            "error_reason",
             "created_at",
         ]
-        read_only_fields = ["id", "chat_id", "direction", "message_type", "telegram_message_id", "status", "created_at"]
+        read_only_fields = ["id", "chat_id", "direction", "message_type", "telegram_message_id", "status", "error_reason", "created_at"]
 
 
 class WhatsAppMessageSerializer(serializers.ModelSerializer):
@@ -366,6 +398,25 @@ class InstagramMessageSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "direction", "message_type", "provider_message_id", "status", "error_reason", "created_at"]
 
 
+class ConversationSerializer(serializers.ModelSerializer):
+    contact_name = serializers.CharField(source="contact.full_name", read_only=True)
+
+    class Meta:
+        model = Conversation
+        fields = [
+            "id",
+            "contact",
+            "contact_name",
+            "channel",
+            "last_message_at",
+            "last_snippet",
+            "last_direction",
+            "unread_count",
+            "last_read_at",
+        ]
+        read_only_fields = fields
+
+
 class CampaignRecipientSerializer(serializers.ModelSerializer):
     contact_name = serializers.CharField(source="contact.full_name", read_only=True)
     contact_email = serializers.EmailField(source="contact.email", read_only=True)
@@ -381,6 +432,8 @@ class CampaignSerializer(serializers.ModelSerializer):
     template_name = serializers.CharField(source="template.name", read_only=True)
     throttle_per_minute = serializers.SerializerMethodField()
     group_ids = serializers.JSONField(read_only=True)
+    segment_ids = serializers.JSONField(read_only=True)
+    filters = serializers.JSONField(read_only=True)
     upload_used = serializers.BooleanField(read_only=True)
     created_by_name = serializers.CharField(source="created_by.username", read_only=True)
 
@@ -395,31 +448,42 @@ class CampaignSerializer(serializers.ModelSerializer):
             "created_by",
             "created_by_name",
             "group_ids",
+            "segment_ids",
+            "filters",
             "upload_used",
             "target_count",
+            "prepared_count",
             "sent_count",
             "delivered_count",
             "read_count",
             "failed_count",
+            "skipped_count",
             "unsubscribed_count",
             "estimated_cost",
+            "pacing",
             "status",
+            "started_at",
             "created_at",
             "throttle_per_minute",
             "recipients",
         ]
         read_only_fields = [
             "target_count",
+            "prepared_count",
             "sent_count",
             "delivered_count",
             "read_count",
             "failed_count",
+            "skipped_count",
             "unsubscribed_count",
             "estimated_cost",
+            "pacing",
             "status",
+            "started_at",
             "created_at",
             "recipients",
             "group_ids",
+            "segment_ids",
             "upload_used",
             "created_by",
             "created_by_name",
@@ -430,3 +494,22 @@ class CampaignSerializer(serializers.ModelSerializer):
         per_channel = getattr(settings, "CHANNEL_THROTTLE_PER_MIN", {})
         default_limit = getattr(settings, "OUTBOUND_PER_MINUTE_LIMIT", 60)
         return per_channel.get(obj.channel, default_limit)
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ["id", "kind", "params", "output", "gzip", "status", "row_count", "error", "download_url", "created_at", "completed_at"]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != ExportJob.STATUS_COMPLETED or not obj.file:
+            return None
+        from django.urls import reverse
+        from .exports import sign_export
+
+        url = f"{reverse('export-download')}?token={sign_export(obj)}"
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
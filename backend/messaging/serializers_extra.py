@@ -1,15 +1,18 @@
 from rest_framework import serializers
-from .models import EmailAttachment
+from .attachments import store_attachment
+from .models import AttachmentUpload, EmailAttachment
 from organizations.utils import get_current_org
 
 ALLOWED_TYPES = {"application/pdf", "image/jpeg", "image/png", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "application/zip"}
 MAX_ATTACHMENT_SIZE = 10 * 1024 * 1024
+# provider ceilings for chunked uploads bound to a channel (Telegram bot API ~20MB, Twilio WhatsApp 16MB)
+CHANNEL_ATTACHMENT_LIMITS = {"telegram": 20 * 1024 * 1024, "whatsapp": 16 * 1024 * 1024}
 
 class EmailAttachmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = EmailAttachment
-        fields = ["id", "filename", "content_type", "size", "file", "created_at"]
-        read_only_fields = ["filename", "content_type", "size", "created_at"]
+        fields = ["id", "filename", "content_type", "size", "sha256", "file", "created_at"]
+        read_only_fields = ["filename", "content_type", "size", "sha256", "created_at"]
 
     def create(self, validated_data):
         request = self.context.get("request")
@@ -21,10 +24,22 @@ class EmailAttachmentSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"file": "File too large (max 10MB)."})
         if file.content_type not in ALLOWED_TYPES:
             raise serializers.ValidationError({"file": "Unsupported file type."})
-        return EmailAttachment.objects.create(
-            organization=org,
-            file=file,
-            filename=file.name,
-            content_type=file.content_type,
-            size=file.size,
-        )
+        return store_attachment(org, file, filename=file.name, content_type=file.content_type)
+
+
+class AttachmentUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AttachmentUpload
+        fields = ["id", "filename", "content_type", "channel", "size", "received", "status", "attachment", "created_at"]
+        read_only_fields = ["received", "status", "attachment", "created_at"]
+
+    def validate(self, attrs):
+        if attrs.get("content_type") not in ALLOWED_TYPES:
+            raise serializers.ValidationError({"content_type": "Unsupported file type."})
+        limit = CHANNEL_ATTACHMENT_LIMITS.get(attrs.get("channel") or "", MAX_ATTACHMENT_SIZE)
+        # rejected up front, before any bytes are sent
+        if attrs["size"] > limit:
+            raise serializers.ValidationError({"size": f"File too large (max {limit // (1024 * 1024)}MB)."})
+        if attrs["size"] <= 0:
+            raise serializers.ValidationError({"size": "File is empty."})
+        return attrs
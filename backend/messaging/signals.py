@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .attachments import release_blob
+from .conversations import THREADED_CHANNELS, record_channel_message, record_inbound_message
+from .models import EmailAttachment, InboundMessage, InstagramMessage, TelegramMessage, WhatsAppMessage
+from .realtime import inbound_event, publish, publish_message
+
+_CHANNEL_MODELS = {WhatsAppMessage: "whatsapp", TelegramMessage: "telegram", InstagramMessage: "instagram"}
+
+
+@receiver(post_save, sender=WhatsAppMessage)
+@receiver(post_save, sender=TelegramMessage)
+@receiver(post_save, sender=InstagramMessage)
+def update_conversation(sender, instance, created, raw=False, **kwargs):
+    # only new messages move the thread; status updates on existing rows don't
+    if created and not raw:
+        record_channel_message(instance, _CHANNEL_MODELS[sender])
+        if instance.direction == instance.DIR_INBOUND:
+            publish_message(instance, _CHANNEL_MODELS[sender])
+
+
+@receiver(post_save, sender=InboundMessage)
+def update_inbound_conversation(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_inbound_message(instance)
+        # threaded channels are published from their own table's row
+        if instance.contact_id and instance.channel not in THREADED_CHANNELS:
+            publish(instance.organization_id, instance.contact_id, inbound_event(instance))
+
+
+@receiver(post_delete, sender=EmailAttachment)
+def release_attachment_blob(sender, instance, **kwargs):
+    if instance.blob_id:
+        release_blob(instance.blob_id)
@@ -6,11 +6,13 @@ import string
 from typing import Any
 
 from celery import shared_task
+from django.db import models
 from django.utils import timezone
 
 from contacts.models import Contact
 from .channels import get_sender
-from .models import OutboundMessage, Suppression, EmailJob, EmailRecipient, EmailAttachment, ContactEngagement
+from .pacing import defer_until, effective_profile, next_release_time
+from .models import OutboundMessage, Suppression, EmailJob, EmailRecipient, EmailAttachment, ContactEngagement, Campaign
 from django.conf import settings
 from django.core.signing import TimestampSigner
 from integrations.models import Integration
@@ -156,11 +158,11 @@ def process_email_job(self, job_id: int, batch_size: int = EMAIL_BATCH_SIZE, del
     batch_size = int(getattr(settings, "EMAIL_BATCH_SIZE", batch_size))
     delay_seconds = int(getattr(settings, "EMAIL_BATCH_DELAY_SECONDS", delay_seconds))
     try:
-        job = EmailJob.objects.get(pk=job_id)
+        job = EmailJob.objects.select_related("campaign").get(pk=job_id)
     except EmailJob.DoesNotExist:
         return
     job.status = EmailJob.STATUS_SENDING
-    job.started_at = timezone.now()
+    job.started_at = job.started_at or timezone.now()
     job.save(update_fields=["status", "started_at", "updated_at"])
 
     try:
@@ -177,16 +179,28 @@ def process_email_job(self, job_id: int, batch_size: int = EMAIL_BATCH_SIZE, del
 
     sender = get_sender("email")
     recipients_qs = job.recipients.filter(status=EmailRecipient.STATUS_QUEUED)
-    total = recipients_qs.count()
     sent = failed = skipped = 0
 
-    offset = 0
-    while offset < total:
-        batch = list(recipients_qs.order_by("id")[offset : offset + batch_size])
-        offset += batch_size
+    # campaign pacing replaces the fixed inter-batch delay with scheduled release times
+    profile = effective_profile(job.campaign.pacing if job.campaign_id else None)
+    channel_limit = getattr(settings, "CHANNEL_THROTTLE_PER_MIN", {}).get("email")
+    processed = job.recipients.exclude(status=EmailRecipient.STATUS_QUEUED).count()
+
+    # read (and base64-encode) each attachment once per run, not once per recipient
+    attachments = _load_attachments(job.attachments)
+    last_id = 0
+    while True:
+        batch = list(recipients_qs.filter(id__gt=last_id).order_by("id")[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        if profile.is_active:
+            release = next_release_time(profile, job.total_recipients, processed, job.started_at, channel_limit)
+            if defer_until(process_email_job, [job.id], release):
+                _add_job_counts(job, sent, failed, skipped)
+                return
         for r in batch:
             rendered_body = _render_body(job, r)
-            attachments = _load_attachments(job.attachments)
             result = sender.send(to=r.email, body=rendered_body, credentials=credentials, attachments=attachments)
             if result.success:
                 r.status = EmailRecipient.STATUS_SENT
@@ -222,16 +236,114 @@ def process_email_job(self, job_id: int, batch_size: int = EMAIL_BATCH_SIZE, del
                         error=r.error,
                     )
             r.save(update_fields=["status", "error", "sent_at", "provider_message_id", "signed_token", "updated_at"])
-        if delay_seconds:
+        processed += len(batch)
+        if delay_seconds and not profile.is_active:
             import time
             time.sleep(delay_seconds)
 
-    job.sent_count += sent
-    job.failed_count += failed
-    job.skipped_count += skipped
-    job.status = EmailJob.STATUS_COMPLETED if failed == 0 else EmailJob.STATUS_FAILED
+    _add_job_counts(job, sent, failed, skipped)
+    job.refresh_from_db(fields=["sent_count", "failed_count", "skipped_count"])
+    job.status = EmailJob.STATUS_COMPLETED if job.failed_count == 0 else EmailJob.STATUS_FAILED
     job.completed_at = timezone.now()
-    job.save(update_fields=["sent_count", "failed_count", "skipped_count", "status", "completed_at", "updated_at"])
+    job.save(update_fields=["status", "completed_at", "updated_at"])
+
+
+@shared_task
+def build_campaign_audience(campaign_id: int):
+    """
+    Materialize recipients for a large campaign in chunks, reporting progress on the campaign.
+    An uploaded audience is read from its staged CampaignUploadContact rows.
+    """
+    from .audience import audience_queryset, launch_campaign, materialize_recipients_chunked
+    from .models import CampaignUploadContact
+
+    try:
+        campaign = Campaign.objects.select_related("organization", "template").get(pk=campaign_id)
+    except Campaign.DoesNotExist:
+        return
+    if campaign.status != Campaign.STATUS_PREPARING:
+        return
+    staged = CampaignUploadContact.objects.filter(campaign=campaign)
+    contact_ids = staged.values("contact_id") if campaign.upload_used else None
+    qs = audience_queryset(
+        campaign.organization,
+        campaign.channel,
+        group_ids=campaign.group_ids,
+        segment_ids=campaign.segment_ids,
+        contact_ids=contact_ids,
+        filters=campaign.filters,
+    )
+
+    def _progress(written: int):
+        Campaign.objects.filter(pk=campaign.id).update(prepared_count=written)
+
+    try:
+        written = materialize_recipients_chunked(campaign, qs, on_progress=_progress)
+    except Exception as exc:
+        campaign.status = Campaign.STATUS_FAILED
+        campaign.save(update_fields=["status"])
+        record_alert(
+            organization=campaign.organization,
+            category="campaign_audience_failed",
+            message=f"Campaign {campaign.id} audience build failed: {exc}",
+            severity=MonitoringAlert.SEVERITY_ERROR,
+            metadata={"campaign_id": campaign.id},
+        )
+        raise
+    staged.delete()
+    campaign.target_count = written
+    campaign.prepared_count = written
+    campaign.status = Campaign.STATUS_QUEUED
+    campaign.save(update_fields=["target_count", "prepared_count", "status"])
+    launch_campaign(campaign)
+
+
+@shared_task
+def send_channel_messages(channel: str, message_ids: list[int]):
+    """Deliver PENDING WhatsApp/Telegram/Instagram messages created by the message endpoints."""
+    from .dispatcher import send_pending_messages
+
+    sent, failed = send_pending_messages(channel, message_ids)
+    return {"sent": sent, "failed": failed}
+
+
+@shared_task
+def dispatch_campaign(campaign_id: int, resume: bool = False):
+    """
+    Send a WhatsApp/Telegram/Instagram campaign's queued recipients. Only the paced continuation
+    (`resume`) may pick up a campaign that is already sending; a duplicate start is dropped.
+    """
+    from .dispatcher import run_campaign
+
+    try:
+        campaign = Campaign.objects.select_related("organization", "template").get(pk=campaign_id)
+    except Campaign.DoesNotExist:
+        return
+    if resume:
+        if campaign.status != Campaign.STATUS_SENDING:
+            return
+    elif not Campaign.objects.filter(pk=campaign.pk, status=Campaign.STATUS_QUEUED).update(status=Campaign.STATUS_SENDING):
+        return
+    try:
+        run_campaign(campaign)
+    except Exception as exc:
+        Campaign.objects.filter(pk=campaign.pk).update(status=Campaign.STATUS_FAILED)
+        record_alert(
+            organization=campaign.organization,
+            category="campaign_dispatch_failed",
+            message=f"Campaign {campaign.id} dispatch failed: {exc}",
+            severity=MonitoringAlert.SEVERITY_ERROR,
+            metadata={"campaign_id": campaign.id},
+        )
+        raise
+
+
+def _add_job_counts(job: EmailJob, sent: int, failed: int, skipped: int) -> None:
+    EmailJob.objects.filter(pk=job.pk).update(
+        sent_count=models.F("sent_count") + sent,
+        failed_count=models.F("failed_count") + failed,
+        skipped_count=models.F("skipped_count") + skipped,
+    )
 
 
 def _render_body(job: EmailJob, recipient: EmailRecipient) -> str:
@@ -303,24 +415,66 @@ def _load_attachments(attachments_meta: list[dict]) -> list:
     loaded = []
     if not attachments_meta:
         return loaded
+    encoded = {}  # content key -> base64, so identical files in one job are read once
     for meta in attachments_meta:
         path = meta.get("path")
         filename = meta.get("filename") or (path.split("/")[-1] if path else "attachment")
-        try:
-            att = EmailAttachment.objects.get(file=path)
-            with att.file.open("rb") as fh:
-                content = fh.read()
-        except EmailAttachment.DoesNotExist:
+        # deduplicated uploads share one stored file, so several rows can match the path
+        att = EmailAttachment.objects.filter(file=path).first() if path else None
+        if att is None:
             continue
-        except Exception:
-            continue
-        import base64
+        key = att.content_key
+        if key not in encoded:
+            try:
+                with att.file.open("rb") as fh:
+                    encoded[key] = base64.b64encode(fh.read()).decode()
+            except Exception:
+                continue
 
         loaded.append(
             {
                 "filename": filename,
                 "type": meta.get("content_type") or "application/octet-stream",
-                "content": base64.b64encode(content).decode(),
+                "content": encoded[key],
             }
         )
     return loaded
+
+
+@shared_task
+def run_export(export_id: int):
+    """Write a queued ExportJob to storage."""
+    from .exports import run_export_job
+    from .models import ExportJob
+
+    try:
+        job = ExportJob.objects.select_related("organization").get(pk=export_id)
+    except ExportJob.DoesNotExist:
+        return
+    if job.status != ExportJob.STATUS_QUEUED:
+        return
+    ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.STATUS_RUNNING)
+    try:
+        run_export_job(job)
+    except Exception as exc:
+        ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.STATUS_FAILED, error=str(exc)[:2000], completed_at=timezone.now())
+        raise
+
+
+@shared_task
+def expire_attachment_uploads():
+    """Periodic cleanup of abandoned chunked uploads and their staged bytes."""
+    from datetime import timedelta
+
+    from .attachments import expire_uploads
+
+    hours = int(getattr(settings, "ATTACHMENT_UPLOAD_TTL_HOURS", 24))
+    return expire_uploads(timedelta(hours=hours))
+
+
+@shared_task
+def maintain_message_partitions():
+    """Keep future monthly partitions ready for the tables converted by `manage.py partition_messages`."""
+    from .partitioning import ensure_future_partitions
+
+    return len(ensure_future_partitions(int(getattr(settings, "MESSAGE_PARTITION_MONTHS_AHEAD", 3))))
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import io
+import os
+
+from django.core.files.storage import default_storage
+from django.test import TestCase
+
+from corbi.testing import OrgAPITestMixin, TempMediaMixin
+from messaging.attachments import UploadRangeError, finalize_upload, open_upload, write_chunk
+from messaging.models import AttachmentUpload, EmailAttachment
+
+PAYLOAD = b"%PDF-" + bytes(range(256)) * 4
+
+
+class ChunkedUploadTests(TempMediaMixin, OrgAPITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.upload = open_upload(self.org, self.user, filename="a.pdf", content_type="application/pdf", size=len(PAYLOAD))
+
+    def _put(self, start, end, body=None, total=None):
+        body = PAYLOAD[start : end + 1] if body is None else body
+        return self.client.put(
+            f"/api/attachment-uploads/{self.upload.id}/",
+            data=body,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{end}/{total or len(PAYLOAD)}",
+        )
+
+    def test_chunks_resume_and_complete_into_one_attachment(self):
+        self.assertEqual(self._put(0, 99).json()["received"], 100)
+        # a retried chunk overlapping received bytes is accepted
+        self.assertEqual(self._put(50, 199).json()["received"], 200)
+        self.assertEqual(self._put(200, len(PAYLOAD) - 1).json()["received"], len(PAYLOAD))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/api/attachment-uploads/{self.upload.id}/complete/")
+        self.assertEqual(response.status_code, 201)
+        attachment = EmailAttachment.objects.get()
+        with attachment.file.open("rb") as fh:
+            self.assertEqual(fh.read(), PAYLOAD)
+        self.assertFalse(default_storage.exists(self.upload.staged_name))
+        again = self.client.post(f"/api/attachment-uploads/{self.upload.id}/complete/")
+        self.assertEqual((again.status_code, again.json()["id"]), (200, attachment.id))
+        self.assertEqual(self._put(0, 9).status_code, 409)
+
+    def test_gaps_and_overruns_are_rejected(self):
+        self._put(0, 99)
+        gap = self._put(200, 299)
+        self.assertEqual((gap.status_code, gap.json()["received"]), (409, 100))
+        self.assertEqual(self._put(100, len(PAYLOAD)).status_code, 409)
+        self.assertEqual(self._put(100, 199, total=len(PAYLOAD) + 1).status_code, 400)
+        no_range = self.client.put(f"/api/attachment-uploads/{self.upload.id}/", data=b"x", content_type="text/plain")
+        self.assertEqual(no_range.status_code, 400)
+
+    def test_incomplete_upload_cannot_complete(self):
+        self._put(0, 99)
+        response = self.client.post(f"/api/attachment-uploads/{self.upload.id}/complete/")
+        self.assertEqual((response.status_code, response.json()["received"]), (400, 100))
+
+    def test_finalize_rechecks_the_locked_session(self):
+        write_chunk(self.upload, 0, len(PAYLOAD), io.BytesIO(PAYLOAD))
+        stale = AttachmentUpload.objects.get(pk=self.upload.pk)
+        first = finalize_upload(self.upload)
+        # a second complete holding the pre-completion row returns the same attachment
+        self.assertEqual(finalize_upload(stale).id, first.id)
+        self.assertEqual(EmailAttachment.objects.count(), 1)
+        with self.assertRaises(UploadRangeError):
+            write_chunk(stale, 0, 1, io.BytesIO(b"x"))
+        short = open_upload(self.org, self.user, filename="b.pdf", content_type="application/pdf", size=10)
+        with self.assertRaises(UploadRangeError):
+            finalize_upload(short)
+        self.assertFalse(os.path.exists(default_storage.path(short.staged_name)))
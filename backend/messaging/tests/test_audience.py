@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.test import TestCase
+
+from contacts.models import Contact, ContactGroup
+from corbi.testing import OrgAPITestMixin
+from messaging.models import Campaign, CampaignRecipient, CampaignUploadContact, EmailJob, Suppression
+from messaging.tasks import build_campaign_audience
+from templates_app.models import MessageTemplate
+
+
+class CampaignAudienceBuildTests(OrgAPITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.template = MessageTemplate.objects.create(organization=self.org, name="t", channel="whatsapp", body="hi")
+
+    def _create(self, **data):
+        payload = {"name": "Spring", "channel": "whatsapp", "template_id": self.template.id, **data}
+        return self.client.post("/api/campaigns/", payload, format="json")
+
+    @mock.patch("messaging.views.AUDIENCE_SYNC_LIMIT", 1)
+    def test_large_upload_is_staged_and_task_gets_only_the_campaign_id(self):
+        upload = [{"phone": f"+1555000{i:04d}", "name": f"c{i}"} for i in range(3)]
+        with mock.patch("messaging.views.build_campaign_audience.delay") as delay:
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self._create(upload_contacts=upload)
+            self.assertEqual(response.status_code, 201, response.content)
+            delay.assert_not_called()
+            for callback in callbacks:
+                callback()
+        campaign = Campaign.objects.get()
+        delay.assert_called_once_with(campaign.id)
+        self.assertEqual(campaign.status, Campaign.STATUS_PREPARING)
+        self.assertEqual(CampaignUploadContact.objects.filter(campaign=campaign).count(), 3)
+
+        with mock.patch("messaging.tasks.dispatch_campaign.delay"):
+            build_campaign_audience(campaign.id)
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.status, Campaign.STATUS_QUEUED)
+        self.assertEqual(campaign.prepared_count, 3)
+        self.assertEqual(CampaignRecipient.objects.filter(campaign=campaign).count(), 3)
+        self.assertFalse(CampaignUploadContact.objects.exists())
+
+    @mock.patch("messaging.views.AUDIENCE_SYNC_LIMIT", 1)
+    def test_upload_restricts_the_async_audience(self):
+        group = ContactGroup.objects.create(organization=self.org, name="g")
+        for i in range(3):
+            Contact.objects.create(organization=self.org, full_name=f"g{i}", phone_whatsapp=f"+1777000{i:04d}").groups.add(group)
+        upload = [{"phone": "+15550000001"}, {"phone": "+15550000002"}]
+        with mock.patch("messaging.views.build_campaign_audience.delay"):
+            response = self._create(upload_contacts=upload, group_ids=[group.id])
+        campaign = Campaign.objects.get(pk=response.data["id"])
+        with mock.patch("messaging.tasks.dispatch_campaign.delay"):
+            build_campaign_audience(campaign.id)
+        recipients = CampaignRecipient.objects.filter(campaign=campaign)
+        self.assertEqual(
+            set(recipients.values_list("contact__phone_whatsapp", flat=True)), {"+15550000001", "+15550000002"}
+        )
+
+
+class AudiencePreviewTests(OrgAPITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.group = ContactGroup.objects.create(organization=self.org, name="g")
+        for i in range(3):
+            contact = Contact.objects.create(organization=self.org, full_name=f"c{i}", email=f"c{i}@example.com")
+            contact.groups.add(self.group)
+        Contact.objects.create(organization=self.org, full_name="outside", email="outside@example.com")
+
+    def test_malformed_group_ids_are_rejected_not_widened(self):
+        response = self.client.post(
+            "/api/campaigns/preview/", {"channel": "email", "group_ids": ["abc"]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        template = MessageTemplate.objects.create(organization=self.org, name="t", channel="email", body="hi")
+        response = self.client.post(
+            "/api/campaigns/",
+            {"name": "c", "channel": "email", "template_id": template.id, "group_ids": ["abc"]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Campaign.objects.exists())
+
+    def test_campaign_preview_counts_the_group(self):
+        response = self.client.post(
+            "/api/campaigns/preview/", {"channel": "email", "group_ids": [self.group.id]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual((response.data["eligible"], response.data["total"]), (3, 3))
+
+    def test_email_job_preview_matches_the_created_job(self):
+        Suppression.objects.create(organization=self.org, channel="email", identifier="c0@example.com")
+        selection = {"group_ids": [self.group.id]}
+        preview = self.client.post("/api/email-jobs/preview/", selection, format="json")
+        self.assertEqual(preview.status_code, 200, preview.content)
+        self.assertEqual(preview.data["eligible"], 2)
+        self.assertEqual(preview.data["excluded"]["suppressed"], 1)
+        with mock.patch("messaging.views.process_email_job.delay"):
+            created = self.client.post(
+                "/api/email-jobs/", {**selection, "subject": "Hi", "body_html": "<p>Hi</p>"}, format="json"
+            )
+        self.assertEqual(created.status_code, 201, created.content)
+        job = EmailJob.objects.get(pk=created.data["id"])
+        self.assertEqual(job.total_recipients, preview.data["eligible"])
+        self.assertIn("suppressed", [e["reason"] for e in job.exclusions])
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.test import TestCase
+
+from contacts.models import Contact
+from corbi.testing import OrgAPITestMixin
+from messaging.audience import launch_campaign
+from messaging.channels import SendResult
+from messaging.dispatcher import claim_batch
+from messaging.models import Campaign, CampaignRecipient, Suppression, WhatsAppMessage
+from messaging.tasks import dispatch_campaign
+from templates_app.models import MessageTemplate
+
+
+class TwilioStatusCountersTests(OrgAPITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.contact = Contact.objects.create(organization=self.org, full_name="A", phone_whatsapp="+15550001111")
+        self.campaign = Campaign.objects.create(
+            organization=self.org, name="c", channel="whatsapp", status=Campaign.STATUS_SENDING, sent_count=1
+        )
+        self.recipient = CampaignRecipient.objects.create(
+            campaign=self.campaign, contact=self.contact, status=CampaignRecipient.STATUS_SENT, provider_message_id="SM1"
+        )
+        WhatsAppMessage.objects.create(
+            organization=self.org, contact=self.contact, direction="OUTBOUND", text="hi", twilio_message_sid="SM1"
+        )
+
+    def _callback(self, status):
+        return self.client.post("/api/callbacks/twilio/whatsapp/status/", {"MessageSid": "SM1", "MessageStatus": status})
+
+    def test_failure_after_send_moves_the_count_from_sent_to_failed(self):
+        self.assertEqual(self._callback("failed").status_code, 200)
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.sent_count, self.campaign.failed_count), (0, 1))
+        self.recipient.refresh_from_db()
+        self.assertEqual(self.recipient.status, CampaignRecipient.STATUS_FAILED)
+
+    def test_repeated_callbacks_count_once(self):
+        self._callback("delivered")
+        self._callback("delivered")
+        self._callback("failed")
+        self._callback("failed")
+        self.campaign.refresh_from_db()
+        self.assertEqual(
+            (self.campaign.sent_count, self.campaign.delivered_count, self.campaign.failed_count), (0, 0, 1)
+        )
+
+
+class CampaignTerminalStatusTests(OrgAPITestMixin, TestCase):
+    def test_create_requires_a_template(self):
+        Contact.objects.create(organization=self.org, full_name="A", phone_whatsapp="+15550001111")
+        response = self.client.post("/api/campaigns/", {"name": "c", "channel": "whatsapp"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Campaign.objects.exists())
+
+    def test_launch_without_template_fails_the_campaign(self):
+        campaign = Campaign.objects.create(organization=self.org, name="c", channel="telegram", status=Campaign.STATUS_QUEUED)
+        self.assertIsNone(launch_campaign(campaign))
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.status, Campaign.STATUS_FAILED)
+
+    def test_dispatch_error_leaves_a_terminal_status(self):
+        template = MessageTemplate.objects.create(organization=self.org, name="t", channel="whatsapp", body="hi")
+        campaign = Campaign.objects.create(
+            organization=self.org, name="c", channel="whatsapp", template=template, status=Campaign.STATUS_QUEUED
+        )
+        with mock.patch("messaging.dispatcher.run_campaign", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                dispatch_campaign(campaign.id)
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.status, Campaign.STATUS_FAILED)
+
+
+@mock.patch("messaging.dispatcher.channel_credentials", return_value={"token": "t", "extra": {}, "integration_id": 1})
+class CampaignClaimTests(OrgAPITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        template = MessageTemplate.objects.create(organization=self.org, name="t", channel="whatsapp", body="hi")
+        self.campaign = Campaign.objects.create(
+            organization=self.org, name="c", channel="whatsapp", template=template, status=Campaign.STATUS_QUEUED, target_count=3
+        )
+        for i in range(3):
+            contact = Contact.objects.create(organization=self.org, full_name=f"C{i}", phone_whatsapp=f"+1555000{i:04d}")
+            CampaignRecipient.objects.create(campaign=self.campaign, contact=contact)
+
+    def _send(self):
+        return mock.patch("messaging.dispatcher._send_one", return_value=SendResult(success=True, provider_message_id="SM"))
+
+    def test_claim_moves_rows_to_sending_once(self, _credentials):
+        first = claim_batch(self.campaign, 2)
+        self.assertEqual([r.status for r in CampaignRecipient.objects.filter(id__in=[r.id for r in first])], ["sending"] * 2)
+        second = claim_batch(self.campaign, 2)
+        self.assertEqual(len(second), 1)
+        self.assertEqual(claim_batch(self.campaign, 2), [])
+
+    def test_duplicate_dispatch_does_not_resend(self, _credentials):
+        with self._send() as send:
+            dispatch_campaign(self.campaign.id)
+            dispatch_campaign(self.campaign.id)
+        self.assertEqual(send.call_count, 3)
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.status, self.campaign.sent_count), (Campaign.STATUS_COMPLETED, 3))
+
+    def test_only_a_continuation_resumes_a_sending_campaign(self, _credentials):
+        Campaign.objects.filter(pk=self.campaign.pk).update(status=Campaign.STATUS_SENDING)
+        with self._send() as send:
+            dispatch_campaign(self.campaign.id)
+            self.assertEqual(send.call_count, 0)
+            dispatch_campaign(self.campaign.id, True)
+        self.assertEqual(send.call_count, 3)
+
+    def test_rows_claimed_elsewhere_hold_the_campaign_open(self, _credentials):
+        claimed = claim_batch(self.campaign, 1)
+        with self._send():
+            dispatch_campaign(self.campaign.id)
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.status, self.campaign.sent_count), (Campaign.STATUS_SENDING, 2))
+        self.assertEqual(CampaignRecipient.objects.get(pk=claimed[0].pk).status, CampaignRecipient.STATUS_SENDING)
+
+    def test_recipients_that_became_ineligible_are_skipped(self, _credentials):
+        first, second, third = CampaignRecipient.objects.filter(campaign=self.campaign).select_related("contact").order_by("id")
+        Contact.objects.filter(pk=first.contact_id).update(status=Contact.STATUS_UNSUBSCRIBED)
+        Suppression.objects.create(organization=self.org, channel="whatsapp", identifier=second.contact.phone_whatsapp)
+        with self._send() as send:
+            dispatch_campaign(self.campaign.id)
+        self.assertEqual(send.call_count, 1)
+        rows = {r.pk: (r.status, r.error_message) for r in CampaignRecipient.objects.filter(campaign=self.campaign)}
+        self.assertEqual(rows[first.pk], (CampaignRecipient.STATUS_SKIPPED, "Contact unsubscribed"))
+        self.assertEqual(rows[second.pk], (CampaignRecipient.STATUS_SKIPPED, "Suppressed on whatsapp"))
+        self.assertEqual(rows[third.pk][0], CampaignRecipient.STATUS_SENT)
+        self.campaign.refresh_from_db()
+        self.assertEqual(
+            (self.campaign.status, self.campaign.sent_count, self.campaign.failed_count, self.campaign.skipped_count),
+            (Campaign.STATUS_COMPLETED, 1, 0, 2),
+        )
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.test import TestCase
+from django.utils import timezone
+
+from contacts.models import Contact
+from corbi.testing import OrgAPITestMixin
+from messaging.conversations import message_snippet, record_message, record_outbound_batch
+from messaging.models import Conversation
+
+
+class RecordMessageTests(OrgAPITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.contact = Contact.objects.create(organization=self.org, full_name="A", phone_whatsapp="+15550001111")
+        self.now = timezone.now()
+
+    def _record(self, at, snippet, inbound=True):
+        record_message(
+            organization_id=self.org.id, contact_id=self.contact.id, channel="sms", at=at, snippet=snippet, inbound=inbound
+        )
+
+    def test_newest_message_wins_and_inbound_counts_unread(self):
+        self._record(self.now, "hello")
+        self._record(self.now + timedelta(minutes=1), "reply", inbound=False)
+        self._record(self.now - timedelta(minutes=5), "late delivery")
+        conv = Conversation.objects.get(contact=self.contact, channel="sms")
+        self.assertEqual(conv.last_message_at, self.now + timedelta(minutes=1))
+        self.assertEqual((conv.last_snippet, conv.last_direction), ("reply", Conversation.DIR_OUTBOUND))
+        self.assertEqual(conv.unread_count, 2)
+
+    def test_outbound_batch_keeps_the_latest_message_per_contact(self):
+        other = Contact.objects.create(organization=self.org, full_name="B", phone_whatsapp="+15550002222")
+        self._record(self.now, "inbound")
+
+        def message(contact, at, text):
+            return SimpleNamespace(
+                organization_id=self.org.id, contact_id=contact.id, created_at=at, text=text, message_type="TEXT"
+            )
+
+        record_outbound_batch(
+            "sms",
+            [
+                message(self.contact, self.now + timedelta(seconds=2), "second"),
+                message(self.contact, self.now + timedelta(seconds=1), "first"),
+                message(other, self.now, "hi"),
+            ],
+        )
+        conv = Conversation.objects.get(contact=self.contact, channel="sms")
+        self.assertEqual((conv.last_snippet, conv.last_direction, conv.unread_count), ("second", Conversation.DIR_OUTBOUND, 1))
+        created = Conversation.objects.get(contact=other, channel="sms")
+        self.assertEqual((created.last_snippet, created.unread_count), ("hi", 0))
+
+    def test_snippet_collapses_whitespace_and_labels_media(self):
+        self.assertEqual(message_snippet("  a\n b  "), "a b")
+        self.assertEqual(message_snippet("", "IMAGE"), "[image]")
+        self.assertEqual(len(message_snippet("x" * 500)), 280)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.test import TestCase
+
+from contacts.models import Contact
+from corbi.testing import OrgAPITestMixin
+from integrations.models import Integration
+from integrations.utils import encrypt_token
+from messaging.channels import SendResult
+from messaging.dispatcher import send_pending_messages
+from messaging.models import TelegramMessage, WhatsAppMessage
+
+
+class DirectSendTests(OrgAPITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.contact = Contact.objects.create(
+            organization=self.org,
+            full_name="Ada",
+            phone_whatsapp="+15550001111",
+            telegram_chat_id="77",
+            telegram_status=Contact.TELEGRAM_STATUS_ONBOARDED,
+        )
+        Integration.objects.create(organization=self.org, provider="telegram", token_encrypted=encrypt_token("bot"), is_active=True)
+        Integration.objects.create(
+            organization=self.org,
+            provider="whatsapp",
+            token_encrypted=encrypt_token("auth"),
+            extra={"account_sid": "AC1", "from_whatsapp": "+15559990000"},
+            is_active=True,
+        )
+        patcher = mock.patch("messaging.dispatcher.get_sender")
+        self.sender = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.sender.send.return_value = SendResult(success=True, provider_message_id="42")
+
+    def _pending(self, **kwargs):
+        return TelegramMessage.objects.create(
+            organization=self.org,
+            contact=self.contact,
+            chat_id="77",
+            direction=TelegramMessage.DIR_OUTBOUND,
+            text="hi",
+            status=TelegramMessage.STATUS_PENDING,
+            **kwargs,
+        )
+
+    def test_create_accepts_and_marks_the_message_sent(self):
+        response = self.client.post("/api/telegram/messages/", {"contact_id": self.contact.id, "text": "hi"}, format="json")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.json()[0]["status"], response.json()[0]["telegram_message_id"]), ("sent", "42"))
+
+    def test_provider_failure_marks_the_message_failed(self):
+        self.sender.send.return_value = SendResult(success=False, error="21610 unsubscribed")
+        response = self.client.post("/api/whatsapp/messages/", {"contact_id": self.contact.id, "text": "hi"}, format="json")
+        self.assertEqual(response.status_code, 202)
+        message = WhatsAppMessage.objects.get()
+        self.assertEqual((message.status, message.error_reason), (WhatsAppMessage.STATUS_FAILED, "21610 unsubscribed"))
+
+    def test_missing_credentials_fail_without_a_provider_call(self):
+        message = self._pending()
+        Integration.objects.filter(provider="telegram").delete()
+        self.assertEqual(send_pending_messages("telegram", [message.id]), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.error_reason), ("failed", "Integration not configured for telegram"))
+        self.sender.send.assert_not_called()
+
+    def test_missing_attachment_fails_only_that_message(self):
+        broken = self._pending(attachments=[{"id": 999, "name": "a.pdf"}], message_type=TelegramMessage.TYPE_DOCUMENT)
+        plain = self._pending()
+        self.assertEqual(send_pending_messages("telegram", [broken.id, plain.id]), (1, 1))
+        broken.refresh_from_db()
+        self.assertEqual((broken.status, broken.error_reason), ("failed", "Attachment file missing for a.pdf"))
+        self.assertEqual(self.sender.send.call_count, 1)
+
+    def test_claimed_messages_are_not_sent_twice(self):
+        message = self._pending()
+        in_flight = self._pending()
+        TelegramMessage.objects.filter(pk=in_flight.pk).update(status=TelegramMessage.STATUS_SENDING)
+        self.assertEqual(send_pending_messages("telegram", [message.id, in_flight.id]), (1, 0))
+        # a redelivered task finds nothing left to claim
+        self.assertEqual(send_pending_messages("telegram", [message.id, in_flight.id]), (0, 0))
+        self.assertEqual(self.sender.send.call_count, 1)
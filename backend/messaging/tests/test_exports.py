@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import gzip
+import json
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+
+from django.test import TestCase
+
+from contacts.models import Contact, ContactGroup
+from corbi.testing import OrgAPITestMixin, TempMediaMixin
+from messaging.exports import encode_rows, export_source, stream_bytes
+from messaging.models import Campaign, CampaignRecipient, ExportJob
+from organizations.models import Organization
+
+
+class EncodingTests(TestCase):
+    ROWS = [{"id": 1, "tags": ["a", "b"], "meta": {"k": 1}, "at": datetime(2026, 1, 2, 3, 4, tzinfo=dt_timezone.utc), "none": None}]
+    FIELDS = ["id", "tags", "meta", "at", "none"]
+
+    def test_csv_flattens_cells(self):
+        text = "".join(encode_rows("csv", self.FIELDS, self.ROWS))
+        self.assertEqual(text.splitlines(), ["id,tags,meta,at,none", '1,a|b,"{""k"": 1}",2026-01-02T03:04:00+00:00,'])
+
+    def test_jsonl_writes_one_object_per_line(self):
+        (line,) = encode_rows("jsonl", self.FIELDS, self.ROWS)
+        self.assertTrue(line.endswith("\n"))
+        self.assertEqual(
+            json.loads(line), {"id": 1, "tags": ["a", "b"], "meta": {"k": 1}, "at": "2026-01-02T03:04:00+00:00", "none": None}
+        )
+
+    def test_gzip_output_is_one_member_across_flushes(self):
+        chunks = [f"row {i}\n" for i in range(20000)]
+        blocks = list(stream_bytes(chunks, gzip=True))
+        self.assertGreater(len(blocks), 1)
+        self.assertEqual(gzip.decompress(b"".join(blocks)).decode(), "".join(chunks))
+        self.assertEqual(b"".join(stream_bytes(chunks)).decode(), "".join(chunks))
+
+
+class ExportSourceTests(OrgAPITestMixin, TestCase):
+    def test_sources_are_scoped_to_the_organization(self):
+        other = Organization.objects.create(name="Other")
+        mine = Contact.objects.create(organization=self.org, full_name="Mine")
+        theirs = Contact.objects.create(organization=other, full_name="Theirs")
+        mine.groups.add(ContactGroup.objects.create(organization=self.org, name="VIP"))
+        their_campaign = Campaign.objects.create(organization=other, name="c", channel="whatsapp")
+        CampaignRecipient.objects.create(campaign=their_campaign, contact=theirs)
+
+        _, contacts, row_fn = export_source(self.org, ExportJob.KIND_CONTACTS, {})
+        self.assertEqual([row_fn(c)["full_name"] for c in contacts], ["Mine"])
+        self.assertEqual(row_fn(contacts.get())["groups"], ["VIP"])
+        _, recipients, _ = export_source(self.org, ExportJob.KIND_CAMPAIGN_RECIPIENTS, {"campaign_id": their_campaign.id})
+        self.assertFalse(recipients.exists())
+        with self.assertRaises(ValueError):
+            export_source(self.org, "unknown", {})
+
+
+class ExportEndpointTests(TempMediaMixin, OrgAPITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for name in ("Ada", "Grace"):
+            Contact.objects.create(organization=self.org, full_name=name)
+
+    def test_small_exports_stream_inline(self):
+        response = self.client.get("/api/contacts/export/?output=jsonl")
+        self.assertEqual((response.status_code, response["Content-Type"]), (200, "application/x-ndjson"))
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["full_name"] for line in lines], ["Ada", "Grace"])
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_exports_over_the_sync_limit_run_in_the_background(self):
+        with mock.patch("messaging.exports.EXPORT_SYNC_LIMIT", 1):
+            response = self.client.get("/api/contacts/export/?gzip=1")
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertEqual((body["status"], body["row_count"]), (ExportJob.STATUS_COMPLETED, 2))
+        download = self.client.get(body["download_url"])
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(gzip.decompress(b"".join(download.streaming_content)).decode().splitlines()[0].split(",")[0], "id")
+
+    def test_download_tokens_expire_and_reject_tampering(self):
+        body = self.client.get("/api/contacts/export/?background=1").json()
+        with mock.patch("messaging.exports.EXPORT_LINK_MAX_AGE", -1):
+            self.assertEqual(self.client.get(body["download_url"]).status_code, 410)
+        self.assertEqual(self.client.get(body["download_url"] + "x").status_code, 403)
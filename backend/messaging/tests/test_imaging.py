@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import io
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from PIL import Image
+
+from corbi.testing import OrgAPITestMixin, TempMediaMixin
+from messaging.attachments import store_attachment
+from messaging.imaging import IMAGE_PROFILES, optimized_image
+
+
+def _image_bytes(size, *, mode="RGB", fmt="JPEG", **save_kwargs) -> bytes:
+    image = Image.effect_noise(size, 40).convert(mode)
+    out = io.BytesIO()
+    image.save(out, fmt, **save_kwargs)
+    return out.getvalue()
+
+
+def _open(name):
+    with default_storage.open(name, "rb") as fh:
+        image = Image.open(fh)
+        image.load()
+    return image
+
+
+class OptimizedImageTests(TempMediaMixin, OrgAPITestMixin, TestCase):
+    def _attach(self, data: bytes, content_type="image/jpeg", filename="a.jpg"):
+        upload = SimpleUploadedFile(filename, data, content_type=content_type)
+        return store_attachment(self.org, upload, filename=filename, content_type=content_type)
+
+    def test_large_images_are_downscaled_once(self):
+        attachment = self._attach(_image_bytes((3200, 800), quality=95))
+        name = optimized_image(attachment, "whatsapp")
+        self.assertTrue(name.endswith(f"-{IMAGE_PROFILES['whatsapp'].key}.jpg"))
+        self.assertEqual(_open(name).size, (1600, 400))
+        with mock.patch("messaging.imaging._render") as render:
+            self.assertEqual(optimized_image(attachment, "whatsapp"), name)
+        render.assert_not_called()
+
+    def test_already_optimal_original_is_remembered(self):
+        attachment = self._attach(_image_bytes((64, 64), quality=30, optimize=True))
+        self.assertIsNone(optimized_image(attachment, "telegram"))
+        key = f"image-variant:{self.org.id}:{attachment.sha256}:{IMAGE_PROFILES['telegram'].key}"
+        self.assertEqual(cache.get(key), "")
+        with mock.patch("messaging.imaging._render") as render:
+            self.assertIsNone(optimized_image(attachment, "telegram"))
+        render.assert_not_called()
+
+    def test_alpha_images_stay_png(self):
+        attachment = self._attach(_image_bytes((3000, 300), mode="RGBA", fmt="PNG"), "image/png", "a.png")
+        name = optimized_image(attachment, "whatsapp")
+        self.assertTrue(name.endswith(".png"))
+        self.assertEqual(_open(name).mode, "RGBA")
+
+    def test_exif_is_stripped_after_applying_orientation(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotate 90 degrees clockwise on display
+        exif[0x010F] = "Camera Maker"
+        attachment = self._attach(_image_bytes((3200, 800), quality=95, exif=exif.tobytes()))
+        variant = _open(optimized_image(attachment, "whatsapp"))
+        self.assertEqual(variant.size, (400, 1600))
+        self.assertEqual(dict(variant.getexif()), {})
+
+    def test_deleting_the_last_reference_deletes_the_variants(self):
+        attachment = self._attach(_image_bytes((3200, 800), quality=95))
+        name = optimized_image(attachment, "whatsapp")
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertIsNone(cache.get(f"image-variant:{self.org.id}:{attachment.sha256}:{IMAGE_PROFILES['whatsapp'].key}"))
+
+    def test_non_images_are_sent_as_is(self):
+        attachment = self._attach(b"%PDF-1.4", "application/pdf", "a.pdf")
+        self.assertIsNone(optimized_image(attachment, "whatsapp"))
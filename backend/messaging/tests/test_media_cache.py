@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from messaging.channels import TelegramSender
+from messaging.media_cache import get_media_id, remember_media_id
+
+CREDENTIALS = {"token": "bot-token", "extra": {}, "integration_id": 7}
+
+
+class StubBot:
+    """Records what each send received; `stale` file ids are rejected the way Telegram rejects them."""
+
+    calls: list = []
+    stale: set = set()
+
+    def __init__(self, token):
+        self.token = token
+
+    async def send_photo(self, *, chat_id, photo, caption=None):
+        if isinstance(photo, str):
+            StubBot.calls.append(("file_id", photo))
+            if photo in StubBot.stale:
+                raise RuntimeError("Wrong file identifier/http url specified")
+        else:
+            StubBot.calls.append(("bytes", photo.read()))
+        return SimpleNamespace(message_id=len(StubBot.calls), photo=[SimpleNamespace(file_id="small"), SimpleNamespace(file_id="AgAD-new")])
+
+
+class TelegramMediaCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        StubBot.calls, StubBot.stale = [], set()
+        fd, self.path = tempfile.mkstemp(suffix=".jpg")
+        os.write(fd, b"jpeg-bytes")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        patcher = mock.patch("messaging.channels.Bot", StubBot)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _send(self):
+        return TelegramSender().send(
+            to="77", media_path=self.path, media_type="photo", credentials=CREDENTIALS, content_key="sha:telegram"
+        )
+
+    def test_first_upload_fills_the_cache(self):
+        self.assertTrue(self._send().success)
+        self.assertEqual(StubBot.calls, [("bytes", b"jpeg-bytes")])
+        self.assertEqual(get_media_id("telegram", 7, "sha:telegram"), "AgAD-new")
+
+    def test_cache_hit_sends_the_file_id(self):
+        remember_media_id("telegram", 7, "sha:telegram", "AgAD-cached")
+        os.remove(self.path)
+        self.addCleanup(open(self.path, "wb").close)
+        self.assertTrue(self._send().success)
+        self.assertEqual(StubBot.calls, [("file_id", "AgAD-cached")])
+
+    def test_stale_file_id_is_dropped_and_the_bytes_resent(self):
+        remember_media_id("telegram", 7, "sha:telegram", "AgAD-stale")
+        StubBot.stale = {"AgAD-stale"}
+        with mock.patch("messaging.channels.asyncio.sleep", mock.AsyncMock()):
+            result = self._send()
+        self.assertTrue(result.success)
+        self.assertEqual(StubBot.calls, [("file_id", "AgAD-stale"), ("bytes", b"jpeg-bytes")])
+        self.assertEqual(get_media_id("telegram", 7, "sha:telegram"), "AgAD-new")
+
+    def test_cache_is_scoped_to_the_bot(self):
+        remember_media_id("telegram", 8, "sha:telegram", "AgAD-other-bot")
+        self._send()
+        self.assertEqual(StubBot.calls, [("bytes", b"jpeg-bytes")])
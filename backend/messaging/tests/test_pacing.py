@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from messaging.pacing import PacingProfile, batch_release_times, defer_until, effective_profile, next_release_time
+
+
+class PacingProfileTests(SimpleTestCase):
+    def test_explicit_zero_is_rejected_not_ignored(self):
+        for key in ("window_minutes", "max_per_minute"):
+            with self.assertRaises(ValueError):
+                PacingProfile.from_dict({key: 0})
+        self.assertFalse(PacingProfile.from_dict({"ramp_up_minutes": 0}).is_active)
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            PacingProfile.from_dict({"unknown": 1})
+        with self.assertRaises(ValueError):
+            PacingProfile.from_dict({"window_minutes": "soon"})
+        with self.assertRaises(ValueError):
+            PacingProfile.from_dict({"window_minutes": 10, "ramp_up_minutes": 20})
+
+    def test_window_spreads_the_audience(self):
+        profile = PacingProfile(window_minutes=100)
+        self.assertEqual(profile.full_rate(1000), 10)
+        self.assertEqual(profile.full_rate(1000, channel_limit=5), 5)
+        self.assertEqual(profile.minutes_to_send(500, 10), 50)
+
+    def test_ramp_up_releases_slower_first_and_still_ends_in_the_window(self):
+        profile = PacingProfile(window_minutes=60, ramp_up_minutes=20, ramp_up_start=0.1)
+        rate = profile.full_rate(1200)
+        self.assertAlmostEqual(profile.minutes_to_send(1200, rate), 60)
+        # the first tenth of the audience needs more than a tenth of the window during the ramp
+        self.assertGreater(profile.minutes_to_send(120, rate), 6)
+
+    def test_batch_release_times(self):
+        start = timezone.now()
+        times = batch_release_times(PacingProfile(window_minutes=30), 300, 100, start)
+        self.assertEqual(times, [start, start + timedelta(minutes=10), start + timedelta(minutes=20)])
+        self.assertEqual(next_release_time(PacingProfile(window_minutes=30), 300, 200, start), times[2])
+
+
+class DeferTests(SimpleTestCase):
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_eager_mode_never_blocks(self):
+        task = mock.Mock()
+        with mock.patch("time.sleep") as sleep:
+            self.assertFalse(defer_until(task, [1], timezone.now() + timedelta(hours=3)))
+        sleep.assert_not_called()
+        task.apply_async.assert_not_called()
+        self.assertFalse(effective_profile({"window_minutes": 180}).is_active)
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=False)
+    def test_future_release_is_re_enqueued(self):
+        task = mock.Mock()
+        eta = timezone.now() + timedelta(minutes=5)
+        self.assertTrue(defer_until(task, [7], eta))
+        task.apply_async.assert_called_once_with(args=[7], eta=eta)
+        self.assertFalse(defer_until(task, [7], timezone.now() - timedelta(seconds=1)))
+        self.assertTrue(effective_profile({"window_minutes": 180}).is_active)
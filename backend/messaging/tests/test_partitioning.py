@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from datetime import date
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import SimpleTestCase
+
+from messaging import partitioning
+from messaging.partitioning import add_months, create_partitions_sql, ensure_future_partitions
+
+
+class PartitionPlanTests(SimpleTestCase):
+    def test_month_arithmetic(self):
+        self.assertEqual(add_months(date(2026, 11, 1), 3), date(2027, 2, 1))
+        self.assertEqual(add_months(date(2026, 1, 1), -1), date(2025, 12, 1))
+
+    def test_creates_only_missing_months(self):
+        sql = create_partitions_sql("t", date(2026, 10, 19), date(2027, 1, 1), {"t_p202611"})
+        self.assertEqual(len(sql), 2)
+        self.assertIn('"t_p202610" PARTITION OF "t"', sql[0])
+        self.assertIn("FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')", sql[1])
+
+    def test_rows_stranded_in_the_default_partition_are_moved(self):
+        def stranded(table, column, month):
+            return 3 if month.month == 11 else 0
+
+        with mock.patch.object(partitioning, "_stranded_rows", side_effect=stranded):
+            sql = create_partitions_sql("t", date(2026, 11, 1), date(2027, 1, 1), set(), column="created_at")
+        self.assertTrue(sql[0].startswith('CREATE TABLE "t_p202611" (LIKE "t"'))
+        self.assertIn('DELETE FROM "t_default"', sql[1])
+        self.assertIn('ATTACH PARTITION "t_p202611"', sql[2])
+        self.assertIn('"t_p202612" PARTITION OF "t"', sql[3])
+
+    def test_a_failing_table_does_not_stop_the_others(self):
+        fake_connection = mock.MagicMock(vendor="postgresql")
+        with mock.patch.object(partitioning, "connection", fake_connection), mock.patch.object(
+            partitioning, "is_partitioned", side_effect=[DatabaseError("boom")] + [False] * 10
+        ) as is_partitioned, self.assertLogs("messaging.partitioning", "ERROR"):
+            self.assertEqual(ensure_future_partitions(3, today=date(2026, 10, 19)), [])
+        self.assertEqual(is_partitioned.call_count, len(partitioning.PARTITIONED_TABLES))
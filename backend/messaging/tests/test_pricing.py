@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+from messaging import pricing
+from messaging.pricing import PricingTable, PricingUnavailable
+
+COSTS = {
+    "default_currency": "USD",
+    "channels": {
+        "whatsapp": {
+            "currency": "EUR",
+            "pricing": {
+                "outbound": {"amount": {"actual": 0.01, "markup": 0.0125}},
+                "template": {
+                    "amount": {"actual": 0.03, "markup": 0.0375},
+                    "categories": {"marketing": {"actual": 0.035, "markup": 0.04375}},
+                },
+            },
+        },
+        "telegram": {"pricing": {"outbound": None}},
+    },
+}
+
+
+class PricingTableTests(SimpleTestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(handle, "w") as fh:
+            json.dump(COSTS, fh)
+        self.addCleanup(os.remove, self.path)
+        self.table = PricingTable(self.path)
+
+    def test_estimate_uses_exact_decimals(self):
+        estimate = self.table.estimate("whatsapp", "outbound", 3)
+        self.assertEqual((estimate.actual, estimate.billable, estimate.currency), (Decimal("0.03"), Decimal("0.0375"), "EUR"))
+
+    def test_template_category_rate_and_fallback(self):
+        self.assertEqual(self.table.unit_rate("whatsapp", "template", "Marketing")[1], Decimal("0.04375"))
+        self.assertEqual(self.table.unit_rate("whatsapp", "template", "utility")[1], Decimal("0.0375"))
+
+    def test_unpriced_channels_cost_nothing(self):
+        self.assertEqual(self.table.unit_rate("telegram", "outbound"), (Decimal("0"), Decimal("0"), "USD"))
+        with self.assertRaises(ValueError):
+            self.table.unit_rate("whatsapp", "sideways")
+
+    def test_sequence_of_counts(self):
+        estimates = self.table.estimate("whatsapp", "outbound", [1, 10])
+        self.assertEqual([e.billable for e in estimates], [Decimal("0.0125"), Decimal("0.1250")])
+
+    def test_reloads_when_the_file_changes(self):
+        self.assertEqual(self.table.unit_rate("whatsapp", "outbound")[1], Decimal("0.0125"))
+        changed = json.loads(json.dumps(COSTS))
+        changed["channels"]["whatsapp"]["pricing"]["outbound"]["amount"]["markup"] = 0.02
+        with open(self.path, "w") as fh:
+            json.dump(changed, fh)
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        self.assertEqual(self.table.unit_rate("whatsapp", "outbound")[1], Decimal("0.02"))
+
+    def test_missing_or_broken_file(self):
+        with self.assertRaises(PricingUnavailable):
+            PricingTable(self.path + ".missing").data()
+        with open(self.path, "w") as fh:
+            fh.write("{not json")
+        with self.assertRaises(PricingUnavailable):
+            PricingTable(self.path).data()
+
+
+class CampaignEstimateTests(SimpleTestCase):
+    def setUp(self):
+        handle, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(handle, "w") as fh:
+            json.dump(COSTS, fh)
+        self.addCleanup(os.remove, path)
+        original = pricing._table
+        pricing._table = PricingTable(path)
+        self.addCleanup(setattr, pricing, "_table", original)
+
+    def test_templated_sends_bill_at_the_template_category_rate(self):
+        estimate = pricing.estimate_campaign("whatsapp", 100, SimpleNamespace(category="marketing"))
+        self.assertEqual(estimate.billable, Decimal("4.375"))
+        self.assertEqual(pricing.estimate_campaign("whatsapp", 100).billable, Decimal("1.25"))
+
+    def test_unavailable_table_gives_no_estimate(self):
+        pricing._table = PricingTable("/nonexistent/cost.json")
+        self.assertIsNone(pricing.estimate_campaign("whatsapp", 100))
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.test import TestCase
+
+from corbi.testing import OrgAPITestMixin
+from messaging.realtime import sign_stream_token
+
+
+class RealtimeStreamTests(OrgAPITestMixin, TestCase):
+    url = "/api/realtime/stream/"
+
+    def test_token_carries_the_heartbeat(self):
+        body = self.client.post("/api/realtime/token/").json()
+        self.assertIn("token=", body["url"])
+        self.assertEqual(body["heartbeat"], 15)
+
+    def test_stream_is_unavailable_until_configured(self):
+        token = sign_stream_token(self.org.id, self.user.id)
+        self.assertEqual(self.client.get(self.url, {"token": "forged"}).status_code, 403)
+        with mock.patch("messaging.views.REALTIME_REDIS_URL", ""):
+            self.assertEqual(self.client.get(self.url, {"token": token}).status_code, 503)
+
+    def test_stream_refuses_wsgi_requests(self):
+        token = sign_stream_token(self.org.id, self.user.id)
+        with mock.patch("messaging.views.REALTIME_REDIS_URL", "redis://localhost:6379/2"):
+            response = self.client.get(self.url, {"token": token})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("ASGI", response.json()["detail"])
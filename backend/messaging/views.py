@@ -4,24 +4,37 @@ from rest_framework import filters, viewsets, status, mixins, parsers
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.core.handlers.asgi import ASGIRequest
 from django.core.signing import BadSignature, SignatureExpired, TimestampSigner
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views import View
+from django.db import models, transaction
 import logging
-import os
-import json
+import re
 from organizations.utils import get_current_org
 from organizations.permissions import IsOrgMemberWithRole
-
-from .models import InboundMessage, OutboundMessage, EmailJob, EmailAttachment, EmailRecipient, TelegramInviteToken, TelegramMessage, WhatsAppMessage, InstagramMessage, Campaign, CampaignRecipient
-from .serializers import InboundMessageSerializer, OutboundMessageSerializer, EmailJobSerializer, EmailJobCreateSerializer, EmailRecipientSerializer, TelegramInviteTokenSerializer, TelegramMessageSerializer, WhatsAppMessageSerializer, InstagramMessageSerializer, CampaignSerializer
-from .serializers_extra import EmailAttachmentSerializer
-from .tasks import process_email_job
+from corbi.pagination import KeysetPagination
+
+from .models import InboundMessage, OutboundMessage, EmailJob, EmailAttachment, AttachmentUpload, EmailRecipient, TelegramInviteToken, TelegramMessage, WhatsAppMessage, InstagramMessage, Conversation, Campaign, CampaignRecipient, ExportJob
+from .serializers import InboundMessageSerializer, OutboundMessageSerializer, EmailJobSerializer, EmailAudienceSerializer, EmailJobCreateSerializer, EmailRecipientSerializer, TelegramInviteTokenSerializer, TelegramMessageSerializer, WhatsAppMessageSerializer, InstagramMessageSerializer, ConversationSerializer, CampaignSerializer, ExportJobSerializer
+from .serializers_extra import AttachmentUploadSerializer, EmailAttachmentSerializer
+from .attachments import UploadRangeError, finalize_upload, open_upload, write_chunk
+from .tasks import process_email_job, build_campaign_audience, send_channel_messages
+from .dispatcher import channel_credentials
+from .pacing import PacingProfile
+from .conversations import mark_read
+from .exports import export_or_queue, unsign_export
+from .realtime import REALTIME_HEARTBEAT_SECONDS, REALTIME_REDIS_URL, REALTIME_TOKEN_MAX_AGE, event_stream, publish, sign_stream_token, status_event, unsign_stream_token
+from .pricing import COST_QUANTUM, PricingUnavailable, cost_table, estimate_campaign
+from .audience import AUDIENCE_SYNC_LIMIT, CAMPAIGN_CHANNELS, audience_filters_q, audience_preview, audience_queryset, launch_campaign, materialize_recipients, stage_upload_contacts
 from .models import Suppression
 from django.utils import timezone
 import secrets
-from messaging.channels import EmailSender, TelegramSender, WhatsAppSender
+from messaging.channels import EmailSender
 from messaging.utils import build_media_url_from_request
 from contacts.models import Contact, ContactGroup
+from contacts.services import bulk_upsert_contacts
 from templates_app.models import MessageTemplate
 from django.conf import settings
 from contacts.serializers import ContactSerializer
@@ -31,11 +44,18 @@ audit_logger = logging.getLogger("corbi.audit")
 logger = logging.getLogger(__name__)
 
 
+class InboundPagination(KeysetPagination):
+    ordering = ("-received_at", "-id")
+
+
+class ContactNamePagination(KeysetPagination):
+    ordering = ("full_name", "id")
+
+
 class OutboundMessageViewSet(viewsets.ModelViewSet):
     queryset = OutboundMessage.objects.select_related("contact", "template").all()
     serializer_class = OutboundMessageSerializer
-    filter_backends = [filters.OrderingFilter]
-    ordering_fields = ["created_at", "status"]
+    pagination_class = KeysetPagination
     permission_classes = [IsOrgMemberWithRole]
 
     def get_queryset(self):
@@ -46,8 +66,7 @@ class OutboundMessageViewSet(viewsets.ModelViewSet):
 class InboundMessageViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = InboundMessage.objects.select_related("contact").all()
     serializer_class = InboundMessageSerializer
-    filter_backends = [filters.OrderingFilter]
-    ordering_fields = ["received_at"]
+    pagination_class = InboundPagination
     permission_classes = [IsOrgMemberWithRole]
 
     def get_queryset(self):
@@ -115,6 +134,19 @@ class EmailJobViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets
         process_email_job.delay(job.id)
         return Response(EmailJobSerializer(job).data, status=status.HTTP_201_CREATED)
 
+    @action(detail=True, methods=["get"], url_path="recipients/export")
+    def export_recipients(self, request, pk=None):
+        job = self.get_object()
+        return export_or_queue(
+            request, job.organization, ExportJob.KIND_EMAIL_RECIPIENTS, {"job_id": job.id}, f"email-job-{job.id}-recipients"
+        )
+
+    @action(detail=False, methods=["post"])
+    def preview(self, request):
+        serializer = EmailAudienceSerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.preview())
+
     @action(detail=True, methods=["post"])
     def retry_failed(self, request, pk=None):
         job = self.get_object()
@@ -137,6 +169,70 @@ class EmailAttachmentViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, vie
         return super().get_queryset().filter(organization=org)
 
 
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+class AttachmentUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable chunked upload: POST {filename, content_type, size[, channel]} opens a session,
+    PUT <id>/ with a raw body and `Content-Range: bytes start-end/size` appends bytes, GET <id>/
+    reports `received` for resuming, POST <id>/complete/ turns it into an EmailAttachment.
+    """
+
+    queryset = AttachmentUpload.objects.all()
+    serializer_class = AttachmentUploadSerializer
+    permission_classes = [IsOrgMemberWithRole]
+
+    def get_queryset(self):
+        org = get_current_org(self.request)
+        return super().get_queryset().filter(organization=org)
+
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        serializer.instance = open_upload(
+            get_current_org(self.request),
+            self.request.user,
+            filename=data["filename"],
+            content_type=data["content_type"],
+            size=data["size"],
+            channel=data.get("channel", ""),
+        )
+
+    def update(self, request, *args, **kwargs):
+        upload = self.get_object()
+        if upload.status != AttachmentUpload.STATUS_OPEN:
+            return Response({"detail": "Upload already completed"}, status=status.HTTP_409_CONFLICT)
+        match = CONTENT_RANGE_RE.match(request.headers.get("Content-Range", ""))
+        if not match:
+            return Response({"detail": "Content-Range: bytes <start>-<end>/<size> header required"}, status=400)
+        start, end, total = match.groups()
+        start, end = int(start), int(end)
+        if end < start or (total != "*" and int(total) != upload.size):
+            return Response({"detail": "Content-Range does not match this upload"}, status=400)
+        try:
+            # read straight from the request stream; the body is never parsed or buffered whole
+            received = write_chunk(upload, start, end - start + 1, request.stream)
+        except UploadRangeError as exc:
+            upload.refresh_from_db(fields=["received"])
+            return Response({"detail": str(exc), "received": upload.received}, status=status.HTTP_409_CONFLICT)
+        return Response({"id": upload.id, "size": upload.size, "received": received})
+
+    @action(detail=True, methods=["post"])
+    def complete(self, request, pk=None):
+        upload = self.get_object()
+        if upload.status == AttachmentUpload.STATUS_COMPLETED and upload.attachment_id:
+            return Response(EmailAttachmentSerializer(upload.attachment, context={"request": request}).data)
+        if upload.received < upload.size:
+            return Response({"detail": "Upload incomplete", "received": upload.received, "size": upload.size}, status=400)
+        try:
+            # re-checked under the session lock: a concurrent complete or chunk may have landed since
+            attachment = finalize_upload(upload)
+        except UploadRangeError as exc:
+            upload.refresh_from_db(fields=["received"])
+            return Response({"detail": str(exc), "received": upload.received, "size": upload.size}, status=400)
+        return Response(EmailAttachmentSerializer(attachment, context={"request": request}).data, status=status.HTTP_201_CREATED)
+
+
 @api_view(["GET"])
 def unsubscribe(request):
     token = request.GET.get("token")
@@ -192,9 +288,9 @@ class TelegramOnboardingViewSet(viewsets.ViewSet):
 
     def list(self, request):
         org = get_current_org(request)
-        contacts = Contact.objects.filter(organization=org).order_by("full_name")
-        serializer = ContactSerializer(contacts, many=True)
-        return Response(serializer.data)
+        paginator = ContactNamePagination()
+        contacts = paginator.paginate_queryset(Contact.objects.filter(organization=org), request, view=self)
+        return paginator.get_paginated_response(ContactSerializer(contacts, many=True).data)
 
     @action(detail=True, methods=["post"])
     def invite_link(self, request, pk=None):
@@ -342,6 +438,7 @@ class TelegramOnboardWebhook(APIView):
 class TelegramMessageViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
     permission_classes = [IsOrgMemberWithRole]
     serializer_class = TelegramMessageSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         org = get_current_org(self.request)
@@ -349,9 +446,10 @@ class TelegramMessageViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, vie
         contact_id = self.request.query_params.get("contact_id")
         if contact_id:
             qs = qs.filter(contact_id=contact_id)
-        return qs.order_by("created_at")
+        return qs
 
     def create(self, request, *args, **kwargs):
+        """Persist the message(s) as pending and send from a worker; delivery status follows via push events."""
         org = get_current_org(request)
         contact_id = request.data.get("contact_id")
         text = (request.data.get("text") or "").strip()
@@ -369,9 +467,12 @@ class TelegramMessageViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, vie
             return Response({"detail": "Contact not found"}, status=404)
         if contact.telegram_status != Contact.TELEGRAM_STATUS_ONBOARDED or not contact.telegram_chat_id:
             return Response({"detail": "Contact is not onboarded to Telegram"}, status=400)
+        try:
+            channel_credentials(org.id, "telegram")
+        except ValueError:
+            return Response({"detail": "Telegram integration not configured"}, status=400)
 
         attachments_payload = []
-        attachments_objs: list[EmailAttachment] = []
         if attachment_ids:
             if isinstance(attachment_ids, str):
                 try:
@@ -387,108 +488,48 @@ class TelegramMessageViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, vie
                     return Response({"detail": f"Attachment {attachment.filename} too large for Telegram (max ~20MB)"}, status=400)
                 if not attachment.file:
                     return Response({"detail": f"Attachment file missing for {attachment.filename}"}, status=400)
-                attachments_objs.append(attachment)
                 attachments_payload.append(
                     {
                         "id": attachment.id,
                         "name": attachment.filename,
                         "content_type": attachment.content_type,
                         "size": attachment.size,
+                        "sha256": attachment.sha256,
                         "url": build_media_url_from_request(attachment.file, request),
                     }
                 )
 
-        # send via Telegram
-        try:
-            integ = Integration.objects.get(organization=org, provider="telegram", is_active=True)
-            token_plain = decrypt_token(getattr(integ, "token", "") or getattr(integ, "token_encrypted", "") or "")
-            if not token_plain:
-                return Response({"detail": "Telegram integration token missing"}, status=400)
-            sender = TelegramSender()
-            created_messages = []
-
-            def _send_and_record(media_path=None, media_kind=None, text_value=text, attach_payload=None):
-                result = sender.send(
-                    to=contact.telegram_chat_id,
-                    body=text_value,
-                    media_path=media_path,
-                    media_type=media_kind,
-                    credentials={"token": token_plain},
-                    caption=text_value if media_path else None,
-                )
-                status_label = "sent" if result.success else "failed"
-                tg_message_id = result.provider_message_id or ""
-                msg = TelegramMessage.objects.create(
-                    organization=org,
-                    contact=contact,
-                    chat_id=contact.telegram_chat_id,
-                    direction=TelegramMessage.DIR_OUTBOUND,
-                    message_type=TelegramMessage.TYPE_TEXT if not media_kind else (TelegramMessage.TYPE_PHOTO if media_kind == "photo" else TelegramMessage.TYPE_DOCUMENT),
-                    text=text_value if not media_path else (text_value or ""),
-                    attachments=attach_payload or [],
-                    telegram_message_id=tg_message_id,
-                    status=status_label,
-                )
-                created_messages.append(msg)
-                if not result.success:
-                    logger.error(
-                        "Telegram send failed: %s (org=%s contact=%s chat_id=%s attachment=%s)",
-                        result.error or "unknown error",
-                        org.id,
-                        contact.id,
-                        contact.telegram_chat_id,
-                        media_path,
-                    )
-                return result
-
-            if attachments_objs:
-                # send each attachment as its own message; first attachment can carry caption text
-                for idx, att in enumerate(attachments_objs):
-                    mime = (att.content_type or "").lower()
-                    media_kind = "photo" if mime.startswith("image/") else "document"
-                    caption_text = text if idx == 0 else ""
-                    _send_and_record(media_path=att.file.path, media_kind=media_kind, text_value=caption_text, attach_payload=[attachments_payload[idx]])
-                if text and not attachments_objs:
-                    _send_and_record()
-            else:
-                _send_and_record()
-
-            if any(m.status == "failed" for m in created_messages):
-                return Response(
-                    {
-                        "detail": "One or more Telegram messages failed to send.",
-                        "messages": TelegramMessageSerializer(created_messages, many=True).data,
-                    },
-                    status=502,
-                )
-            return Response(TelegramMessageSerializer(created_messages, many=True).data, status=201)
-        except Integration.DoesNotExist:
-            return Response({"detail": "Telegram integration not configured"}, status=400)
-        except Exception as exc:  # noqa: BLE001
-            logger.error(
-                "Telegram send exception",
-                exc_info=True,
-                extra={"org": org.id, "contact": contact.id, "chat_id": contact.telegram_chat_id, "attachment": attachment_id},
+        def _pending(text_value, attachment=None):
+            message_type = TelegramMessage.TYPE_TEXT
+            if attachment:
+                is_image = (attachment["content_type"] or "").lower().startswith("image/")
+                message_type = TelegramMessage.TYPE_PHOTO if is_image else TelegramMessage.TYPE_DOCUMENT
+            return TelegramMessage.objects.create(
+                organization=org,
+                contact=contact,
+                chat_id=contact.telegram_chat_id,
+                direction=TelegramMessage.DIR_OUTBOUND,
+                message_type=message_type,
+                text=text_value,
+                attachments=[attachment] if attachment else [],
+                status=TelegramMessage.STATUS_PENDING,
             )
-            return Response({"detail": f"Telegram send error: {exc}"}, status=500)
 
-        msg = TelegramMessage.objects.create(
-            organization=org,
-            contact=contact,
-            chat_id=contact.telegram_chat_id,
-            direction=TelegramMessage.DIR_OUTBOUND,
-            message_type=message_type,
-            text=text,
-            attachments=attachments_payload,
-            telegram_message_id=tg_message_id,
-            status=status_label,
-        )
-        return Response(TelegramMessageSerializer(msg).data, status=201)
+        # each attachment is its own Telegram message; the first one carries the text as its caption
+        if attachments_payload:
+            messages = [_pending(text if idx == 0 else "", att) for idx, att in enumerate(attachments_payload)]
+        else:
+            messages = [_pending(text)]
+        send_channel_messages.delay("telegram", [msg.id for msg in messages])
+        for msg in messages:
+            msg.refresh_from_db(fields=["status", "telegram_message_id", "error_reason"])
+        return Response(TelegramMessageSerializer(messages, many=True).data, status=status.HTTP_202_ACCEPTED)
 
 
 class WhatsAppMessageViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
     permission_classes = [IsOrgMemberWithRole]
     serializer_class = WhatsAppMessageSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         org = get_current_org(self.request)
@@ -496,9 +537,10 @@ class WhatsAppMessageViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, vie
         contact_id = self.request.query_params.get("contact_id")
         if contact_id:
             qs = qs.filter(contact_id=contact_id)
-        return qs.order_by("created_at")
+        return qs
 
     def create(self, request, *args, **kwargs):
+        """Persist the message as pending and send from a worker; delivery status follows via callbacks and push events."""
         org = get_current_org(request)
         contact_id = request.data.get("contact_id")
         text = (request.data.get("text") or "").strip()
@@ -515,9 +557,17 @@ class WhatsAppMessageViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, vie
             return Response({"detail": "Contact is blocked on WhatsApp"}, status=400)
         if not contact.phone_whatsapp:
             return Response({"detail": "Contact missing WhatsApp phone number"}, status=400)
+        try:
+            credentials = channel_credentials(org.id, "whatsapp")
+        except ValueError:
+            credentials = None
+        if not credentials or not all(credentials["extra"].values()):
+            return Response(
+                {"detail": "WhatsApp is not configured for this organization. Missing token/account_sid/from number."},
+                status=400,
+            )
 
         attachments_payload = []
-        media_urls = []
         if attachment_ids:
             if isinstance(attachment_ids, str):
                 try:
@@ -542,66 +592,23 @@ class WhatsAppMessageViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, vie
                         "name": attachment.filename,
                         "content_type": attachment.content_type,
                         "size": attachment.size,
+                        "sha256": attachment.sha256,
                         "url": url,
                     }
                 )
-                media_urls.append(url)
 
-        try:
-            integ = Integration.objects.get(organization=org, provider="whatsapp", is_active=True)
-            token_plain = decrypt_token(getattr(integ, "token", "") or getattr(integ, "token_encrypted", "") or "")
-            extra = getattr(integ, "extra", {}) if hasattr(integ, "extra") else {}
-            account_sid = (
-                extra.get("account_sid")
-                or extra.get("twilio_account_sid")
-                or extra.get("TWILIO_ACCOUNT_SID")
-                or extra.get("accountSid")
-            )
-            from_whatsapp = (
-                extra.get("from_whatsapp")
-                or extra.get("twilio_whatsapp_from")
-                or extra.get("TWILIO_WHATSAPP_FROM")
-                or extra.get("fromWhatsApp")
-            )
-            if not token_plain or not account_sid or not from_whatsapp:
-                return Response(
-                    {"detail": "WhatsApp is not configured for this organization. Missing token/account_sid/from number."},
-                    status=400,
-                )
-            sender = WhatsAppSender()
-            msg_record = WhatsAppMessage.objects.create(
-                organization=org,
-                contact=contact,
-                direction=WhatsAppMessage.DIR_OUTBOUND,
-                message_type=WhatsAppMessage.TYPE_TEXT if not media_urls else WhatsAppMessage.TYPE_DOCUMENT,
-                text=text,
-                attachments=attachments_payload,
-                status=WhatsAppMessage.STATUS_PENDING,
-            )
-            send_res = sender.send(
-                to=contact.phone_whatsapp,
-                body=text,
-                media_urls=media_urls if media_urls else None,
-                credentials={"token": token_plain, "extra": {"account_sid": account_sid, "from_whatsapp": from_whatsapp}},
-            )
-            if send_res.success:
-                msg_record.status = WhatsAppMessage.STATUS_SENT
-                msg_record.twilio_message_sid = send_res.provider_message_id or ""
-                msg_record.save(update_fields=["status", "twilio_message_sid"])
-                return Response(WhatsAppMessageSerializer(msg_record).data, status=201)
-            msg_record.status = WhatsAppMessage.STATUS_FAILED
-            msg_record.error_reason = send_res.error or "unknown error"
-            msg_record.save(update_fields=["status", "error_reason"])
-            return Response({"detail": f"WhatsApp send failed: {msg_record.error_reason}"}, status=502)
-        except Integration.DoesNotExist:
-            return Response({"detail": "WhatsApp is not configured for this organization."}, status=400)
-        except Exception as exc:  # noqa: BLE001
-            logger.error(
-                "WhatsApp send exception",
-                exc_info=True,
-                extra={"org": org.id, "contact": contact.id, "phone": contact.phone_whatsapp},
-            )
-            return Response({"detail": f"WhatsApp send error: {exc}"}, status=500)
+        msg = WhatsAppMessage.objects.create(
+            organization=org,
+            contact=contact,
+            direction=WhatsAppMessage.DIR_OUTBOUND,
+            message_type=WhatsAppMessage.TYPE_TEXT if not attachments_payload else WhatsAppMessage.TYPE_DOCUMENT,
+            text=text,
+            attachments=attachments_payload,
+            status=WhatsAppMessage.STATUS_PENDING,
+        )
+        send_channel_messages.delay("whatsapp", [msg.id])
+        msg.refresh_from_db(fields=["status", "twilio_message_sid", "error_reason"])
+        return Response(WhatsAppMessageSerializer(msg).data, status=status.HTTP_202_ACCEPTED)
 
 
 class TwilioWhatsAppWebhook(APIView):
@@ -706,6 +713,29 @@ class TwilioWhatsAppStatusWebhook(APIView):
             for k, v in updates.items():
                 setattr(msg, k, v)
             msg.save(update_fields=list(updates.keys()))
+            publish(msg.organization_id, msg.contact_id, status_event(msg, "whatsapp"))
+
+        # campaign sends share the Twilio sid with their CampaignRecipient row
+        campaign_status = {
+            WhatsAppMessage.STATUS_DELIVERED: CampaignRecipient.STATUS_DELIVERED,
+            WhatsAppMessage.STATUS_FAILED: CampaignRecipient.STATUS_FAILED,
+        }.get(mapped_status)
+        if campaign_status:
+            recipient = CampaignRecipient.objects.filter(provider_message_id=sid).exclude(status=campaign_status).first()
+            # only the request that moves the row from its previous status adjusts the campaign totals
+            if recipient and CampaignRecipient.objects.filter(pk=recipient.pk, status=recipient.status).update(
+                status=campaign_status, error_message=updates.get("error_reason", recipient.error_message)
+            ):
+                if campaign_status == CampaignRecipient.STATUS_DELIVERED:
+                    counters = {"delivered_count": models.F("delivered_count") + 1}
+                else:
+                    # a send counted as sent (and maybe delivered) moves over to failed
+                    counters = {"failed_count": models.F("failed_count") + 1}
+                    if recipient.status in (CampaignRecipient.STATUS_SENT, CampaignRecipient.STATUS_DELIVERED):
+                        counters["sent_count"] = models.F("sent_count") - 1
+                    if recipient.status == CampaignRecipient.STATUS_DELIVERED:
+                        counters["delivered_count"] = models.F("delivered_count") - 1
+                Campaign.objects.filter(id=recipient.campaign_id).update(**counters)
 
         return Response({"status": "ok"})
 
@@ -713,6 +743,7 @@ class TwilioWhatsAppStatusWebhook(APIView):
 class InstagramMessageViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
     permission_classes = [IsOrgMemberWithRole]
     serializer_class = InstagramMessageSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         org = get_current_org(self.request)
@@ -720,9 +751,10 @@ class InstagramMessageViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, vi
         contact_id = self.request.query_params.get("contact_id")
         if contact_id:
             qs = qs.filter(contact_id=contact_id)
-        return qs.order_by("created_at")
+        return qs
 
     def create(self, request, *args, **kwargs):
+        """Persist the message as pending and send from a worker; delivery status follows via push events."""
         org = get_current_org(request)
         contact_id = request.data.get("contact_id")
         text = (request.data.get("text") or "").strip()
@@ -738,47 +770,24 @@ class InstagramMessageViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, vi
             return Response({"detail": "Contact is blocked on Instagram"}, status=400)
         if not contact.instagram_user_id:
             return Response({"detail": "Contact is not onboarded to Instagram"}, status=400)
-
         try:
-            integ = Integration.objects.get(organization=org, provider="instagram", is_active=True)
-            token_plain = decrypt_token(getattr(integ, "token", "") or getattr(integ, "token_encrypted", "") or "")
-            extra = getattr(integ, "extra", {}) if hasattr(integ, "extra") else {}
-            business_id = extra.get("instagram_business_account_id") or extra.get("business_id") or extra.get("instagram_scoped_id")
-            if not token_plain or not business_id:
-                return Response({"detail": "Instagram is not configured for this organization."}, status=400)
-            msg = InstagramMessage.objects.create(
-                organization=org,
-                contact=contact,
-                direction=InstagramMessage.DIR_OUTBOUND,
-                message_type=InstagramMessage.TYPE_TEXT,
-                text=text,
-                status=InstagramMessage.STATUS_SENT,
-            )
-            sender = InstagramSender()
-            send_res = sender.send(
-                to=contact.instagram_user_id,
-                body=text,
-                credentials={"token": token_plain, "extra": {"instagram_scoped_id": business_id}},
-            )
-            if send_res.success:
-                msg.provider_message_id = send_res.provider_message_id or ""
-                msg.save(update_fields=["provider_message_id"])
-                contact.instagram_last_outbound_at = timezone.now()
-                contact.save(update_fields=["instagram_last_outbound_at"])
-                return Response(InstagramMessageSerializer(msg).data, status=201)
-            msg.status = InstagramMessage.STATUS_FAILED
-            msg.error_reason = send_res.error or "unknown error"
-            msg.save(update_fields=["status", "error_reason"])
-            return Response({"detail": f"Instagram send failed: {msg.error_reason}"}, status=502)
-        except Integration.DoesNotExist:
+            credentials = channel_credentials(org.id, "instagram")
+        except ValueError:
+            credentials = None
+        if not credentials or not credentials["extra"].get("instagram_scoped_id"):
             return Response({"detail": "Instagram is not configured for this organization."}, status=400)
-        except Exception as exc:  # noqa: BLE001
-            logger.error(
-                "Instagram send exception",
-                exc_info=True,
-                extra={"org": org.id, "contact": contact.id, "ig_user": contact.instagram_user_id},
-            )
-            return Response({"detail": f"Instagram send error: {exc}"}, status=500)
+
+        msg = InstagramMessage.objects.create(
+            organization=org,
+            contact=contact,
+            direction=InstagramMessage.DIR_OUTBOUND,
+            message_type=InstagramMessage.TYPE_TEXT,
+            text=text,
+            status=InstagramMessage.STATUS_PENDING,
+        )
+        send_channel_messages.delay("instagram", [msg.id])
+        msg.refresh_from_db(fields=["status", "provider_message_id", "error_reason"])
+        return Response(InstagramMessageSerializer(msg).data, status=status.HTTP_202_ACCEPTED)
 
 
 class InstagramWebhook(APIView):
@@ -838,6 +847,48 @@ class InstagramWebhook(APIView):
         return Response({"status": "ok"})
 
 
+class ConversationPagination(KeysetPagination):
+    ordering = ("-last_message_at", "-id")
+
+
+class ConversationViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Cross-channel inbox: one row per contact thread, most recent first. Filters: channel, contact_id, unread."""
+
+    permission_classes = [IsOrgMemberWithRole]
+    serializer_class = ConversationSerializer
+    pagination_class = ConversationPagination
+
+    def get_queryset(self):
+        org = get_current_org(self.request)
+        qs = Conversation.objects.filter(organization=org).select_related("contact")
+        params = self.request.query_params
+        if params.get("channel"):
+            qs = qs.filter(channel=params["channel"])
+        if params.get("contact_id"):
+            qs = qs.filter(contact_id=params["contact_id"])
+        if params.get("unread") in ("1", "true", "True"):
+            qs = qs.filter(unread_count__gt=0)
+        return qs
+
+    @action(detail=True, methods=["post"])
+    def read(self, request, pk=None):
+        conversation = self.get_object()
+        mark_read(conversation)
+        return Response(self.get_serializer(conversation).data)
+
+
+def _parse_ids(value) -> list[int]:
+    """Integer ids from a list or a single value; raises ValueError rather than dropping a bad id (which would widen the audience)."""
+    if isinstance(value, (str, int)):
+        value = [value]
+    if not isinstance(value, (list, tuple)):
+        raise ValueError("ids must be a list")
+    try:
+        return [int(gid) for gid in value]
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid ids: {value}") from None
+
+
 class CampaignViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
     permission_classes = [IsOrgMemberWithRole]
     serializer_class = CampaignSerializer
@@ -862,17 +913,57 @@ class CampaignViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.C
             }
         )
 
+    @action(detail=True, methods=["get"], url_path="recipients/export")
+    def export_recipients(self, request, pk=None):
+        campaign = self.get_object()
+        return export_or_queue(
+            request,
+            campaign.organization,
+            ExportJob.KIND_CAMPAIGN_RECIPIENTS,
+            {"campaign_id": campaign.id},
+            f"campaign-{campaign.id}-recipients",
+        )
+
     @action(detail=False, methods=["get"])
     def costs(self, request):
         """
-        Serve hard-coded channel pricing for campaign estimation.
+        Serve channel pricing for campaign estimation from the cached cost table.
+        """
+        try:
+            return Response(cost_table())
+        except PricingUnavailable as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=["post"])
+    def preview(self, request):
+        """
+        Eligible audience size, exclusion breakdown, sample and cost for a prospective campaign.
+        Nothing is materialized; results are cached briefly per selection.
         """
-        cost_path = os.path.join(settings.BASE_DIR, "cost.json")
-        if not os.path.exists(cost_path):
-            return Response({"detail": "Cost file missing"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        with open(cost_path, "r") as fh:
-            data = json.load(fh)
-        return Response(data)
+        org = get_current_org(request)
+        channel = request.data.get("channel")
+        if channel not in CAMPAIGN_CHANNELS:
+            return Response({"detail": "Channel is required"}, status=400)
+        template = None
+        template_id = request.data.get("template_id")
+        if template_id:
+            template = MessageTemplate.objects.filter(id=template_id, channel=channel, organization=org).first()
+            if not template:
+                return Response({"detail": "Template not found for this channel"}, status=404)
+        contact_ids = request.data.get("contact_ids")
+        try:
+            data = audience_preview(
+                org,
+                channel,
+                group_ids=_parse_ids(request.data.get("group_ids") or []),
+                segment_ids=_parse_ids(request.data.get("segment_ids") or []),
+                contact_ids=[int(cid) for cid in contact_ids] if contact_ids else None,
+                filters=request.data.get("filters") or {},
+            )
+        except (TypeError, ValueError) as exc:
+            return Response({"detail": f"Invalid audience: {exc}"}, status=400)
+        estimate = estimate_campaign(channel, data["eligible"], template)
+        return Response({**data, "estimated_cost": estimate.to_dict() if estimate else None})
 
     def create(self, request, *args, **kwargs):
         org = get_current_org(request)
@@ -885,118 +976,146 @@ class CampaignViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.C
             return Response({"detail": "Campaign name is required"}, status=400)
         if len(name) > 100:
             return Response({"detail": "Campaign name too long"}, status=400)
-        if channel not in ["email", "whatsapp", "telegram", "instagram"]:
+        if channel not in CAMPAIGN_CHANNELS:
             return Response({"detail": "Channel is required"}, status=400)
+        try:
+            pacing = PacingProfile.from_dict(request.data.get("pacing"))
+        except ValueError as exc:
+            return Response({"detail": f"Invalid pacing: {exc}"}, status=400)
+        filters = request.data.get("filters") or {}
+        try:
+            audience_filters_q(filters)
+        except ValueError as exc:
+            return Response({"detail": f"Invalid filters: {exc}"}, status=400)
 
-        template = None
-        if template_id:
-            template = MessageTemplate.objects.filter(id=template_id, channel=channel, organization=org).first()
-            if not template:
-                return Response({"detail": "Template not found for this channel"}, status=404)
-
-        contacts_qs = Contact.objects.filter(organization=org)
-        eligible = []
+        if not template_id:
+            return Response({"detail": "Template is required"}, status=400)
+        template = MessageTemplate.objects.filter(id=template_id, channel=channel, organization=org).first()
+        if not template:
+            return Response({"detail": "Template not found for this channel"}, status=404)
 
-        if group_ids:
-            if isinstance(group_ids, str):
-                try:
-                    group_ids = [int(group_ids)]
-                except Exception:
-                    group_ids = []
-            contacts_qs = contacts_qs.filter(groups__id__in=group_ids)
+        try:
+            group_ids = _parse_ids(group_ids)
+            segment_ids = _parse_ids(request.data.get("segment_ids") or [])
+        except ValueError as exc:
+            return Response({"detail": f"Invalid audience: {exc}"}, status=400)
 
+        contact_ids = None
         if upload_contacts:
-            # simple normalization: expect list of dicts with name/email/phone
-            for entry in upload_contacts:
-                email = (entry.get("email") or "").lower().strip()
-                phone = (entry.get("phone") or entry.get("phone_whatsapp") or "").strip()
-                full_name = entry.get("name") or "Uploaded Contact"
-                contact = None
-                if email:
-                    contact = contacts_qs.filter(email=email).first()
-                if not contact and phone:
-                    contact = contacts_qs.filter(phone_whatsapp=phone).first()
-                if not contact:
-                    contact = Contact.objects.create(
-                        organization=org,
-                        full_name=full_name,
-                        email=email or None,
-                        phone_whatsapp=phone or None,
-                    )
-                eligible.append(contact)
-        else:
-            eligible = list(contacts_qs)
-
-        # channel eligibility filter
-        filtered = []
-        for c in eligible:
-            if c.status in [Contact.STATUS_UNSUBSCRIBED, Contact.STATUS_BOUNCED, Contact.STATUS_BLOCKED]:
-                continue
-            if channel == "email":
-                if c.email:
-                    filtered.append(c)
-            elif channel == "whatsapp":
-                if c.phone_whatsapp and not c.whatsapp_blocked:
-                    filtered.append(c)
-            elif channel == "telegram":
-                if c.telegram_status == Contact.TELEGRAM_STATUS_ONBOARDED and c.telegram_chat_id:
-                    filtered.append(c)
-            elif channel == "instagram":
-                if getattr(c, "instagram_opt_in", False) and getattr(c, "instagram_user_id", None) and not getattr(c, "instagram_blocked", False):
-                    filtered.append(c)
-
-        filtered = list({c.id: c for c in filtered}.values())  # dedupe
-        target_count = len(filtered)
+            contact_ids = bulk_upsert_contacts(org, upload_contacts).unique_ids
+
+        audience = audience_queryset(
+            org, channel, group_ids=group_ids, segment_ids=segment_ids, contact_ids=contact_ids, filters=filters
+        )
+        target_count = audience.count()
         if target_count == 0:
             return Response({"detail": "No eligible contacts found for this channel"}, status=400)
 
-        # estimate cost
-        if channel == "email":
-            estimated_cost = target_count * 0.001
-        elif channel == "whatsapp":
-            estimated_cost = target_count * 0.005 * 1.25
-        else:
-            estimated_cost = 0
-
-        campaign = Campaign.objects.create(
-            organization=org,
-            name=name,
-            channel=channel,
-            template=template,
-            target_count=target_count,
-            estimated_cost=estimated_cost,
-            status=Campaign.STATUS_QUEUED,
-            created_by=request.user if request.user.is_authenticated else None,
-            group_ids=group_ids,
-            upload_used=bool(upload_contacts),
-        )
-        CampaignRecipient.objects.bulk_create(
-            [CampaignRecipient(campaign=campaign, contact=c) for c in filtered]
-        )
+        estimate = estimate_campaign(channel, target_count, template)
+        estimated_cost = estimate.billable.quantize(COST_QUANTUM) if estimate else 0
 
-        # If email campaign, kick off an EmailJob using the same template/contacts
-        if channel == "email" and template:
-            subject = template.subject or campaign.name
-            recipients = [c for c in filtered if c.email]
-            job = EmailJob.objects.create(
+        build_async = target_count > AUDIENCE_SYNC_LIMIT
+        with transaction.atomic():
+            campaign = Campaign.objects.create(
                 organization=org,
-                campaign=campaign,
+                name=name,
+                channel=channel,
                 template=template,
-                subject=subject,
-                body_html=template.body or "",
-                body_text=template.body or "",
-                status=EmailJob.STATUS_QUEUED,
+                target_count=target_count,
+                estimated_cost=estimated_cost,
+                status=Campaign.STATUS_PREPARING if build_async else Campaign.STATUS_QUEUED,
+                created_by=request.user if request.user.is_authenticated else None,
+                group_ids=group_ids,
+                segment_ids=segment_ids,
+                filters=filters,
+                upload_used=bool(upload_contacts),
+                pacing=pacing.to_dict() if pacing.is_active else {},
             )
-            EmailRecipient.objects.bulk_create(
-                [EmailRecipient(job=job, contact=c, email=c.email or "", status=EmailRecipient.STATUS_QUEUED) for c in recipients]
-            )
-            job.total_recipients = len(recipients)
-            job.save(update_fields=["total_recipients", "updated_at"])
-            # reflect initial queued count on campaign for visibility
-            campaign.sent_count = len(recipients)
-            campaign.save(update_fields=["sent_count"])
-            process_email_job.delay(job.id)
+            if build_async and contact_ids is not None:
+                # the worker reads the upload back from the database rather than from the task message
+                stage_upload_contacts(campaign, contact_ids)
+        if build_async:
+            # large audiences are materialized by a worker; progress is exposed via prepared_count
+            transaction.on_commit(lambda: build_campaign_audience.delay(campaign.id))
+        else:
+            campaign.prepared_count = materialize_recipients(campaign, audience)
+            campaign.save(update_fields=["prepared_count"])
+            launch_campaign(campaign)
 
         data = CampaignSerializer(campaign).data
         data["throttle_per_minute"] = getattr(settings, "OUTBOUND_PER_MINUTE_LIMIT", 60)
         return Response(data, status=201)
+
+
+class ExportJobViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    queryset = ExportJob.objects.all()
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsOrgMemberWithRole]
+
+    def get_queryset(self):
+        org = get_current_org(self.request)
+        return super().get_queryset().filter(organization=org)
+
+
+class ExportDownloadView(APIView):
+    """Serve a finished export; the signed, expiring token is the credential."""
+
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        try:
+            export_id = unsign_export(request.query_params.get("token", ""))
+        except SignatureExpired:
+            return Response({"detail": "Download link expired"}, status=status.HTTP_410_GONE)
+        except (BadSignature, ValueError):
+            return Response({"detail": "Invalid download link"}, status=status.HTTP_403_FORBIDDEN)
+        job = ExportJob.objects.filter(pk=export_id, status=ExportJob.STATUS_COMPLETED).first()
+        if not job or not job.file:
+            return Response({"detail": "Export not found"}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(job.file.open("rb"), as_attachment=True, filename=job.file.name.rsplit("/", 1)[-1])
+
+
+class RealtimeTokenView(APIView):
+    """Short-lived credential for the event stream (EventSource cannot send an Authorization header)."""
+
+    permission_classes = [IsOrgMemberWithRole]
+
+    def post(self, request):
+        org = get_current_org(request)
+        token = sign_stream_token(org.id, request.user.id)
+        url = f"{request.build_absolute_uri(reverse('realtime-stream'))}?token={token}"
+        return Response({"token": token, "url": url, "expires_in": REALTIME_TOKEN_MAX_AGE, "heartbeat": REALTIME_HEARTBEAT_SECONDS})
+
+
+class RealtimeStreamView(View):
+    """
+    Server-sent events for new inbound WhatsApp/Telegram/Instagram (and other channel) messages.
+    GET ?token=<from RealtimeTokenView>[&contact_id=] -- the whole org, or one contact's thread.
+    Async so an idle connection holds no worker thread; needs an ASGI server (uvicorn/daphne), since
+    WSGI buffers an async stream and never flushes it.
+    """
+
+    async def get(self, request):
+        try:
+            claims = unsign_stream_token(request.GET.get("token", ""))
+        except SignatureExpired:
+            return JsonResponse({"detail": "Stream token expired"}, status=401)
+        except BadSignature:
+            return JsonResponse({"detail": "Invalid stream token"}, status=403)
+        if not REALTIME_REDIS_URL:
+            return JsonResponse({"detail": "Real-time push is not configured"}, status=503)
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({"detail": "Real-time push requires an ASGI server"}, status=503)
+        contact_id = request.GET.get("contact_id")
+        if contact_id:
+            try:
+                contact_id = int(contact_id)
+            except ValueError:
+                return JsonResponse({"detail": "contact_id must be an integer"}, status=400)
+            if not await Contact.objects.filter(pk=contact_id, organization_id=claims["org"]).aexists():
+                return JsonResponse({"detail": "Contact not found"}, status=404)
+        response = StreamingHttpResponse(event_stream(claims["org"], contact_id or None), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
@@ -18,7 +18,7 @@ def record_alert(*, organization, category: str, message: str, severity: str = M
         message=message,
         metadata=metadata or {},
     )
-    logger.warning("monitoring.alert", extra={"org": organization.id, "category": category, "severity": severity, "message": message})
+    logger.warning("monitoring.alert", extra={"org": organization.id, "category": category, "severity": severity, "alert_message": message})
     _maybe_email_alert(alert)
     return alert
 
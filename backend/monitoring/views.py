@@ -11,6 +11,8 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from corbi.pagination import KeysetPagination
+
 
 class HealthcheckView(APIView):
     authentication_classes = []
@@ -300,6 +302,11 @@ class MonitoringDetailView(APIView):
         )
 
 
+class ProviderEventPagination(KeysetPagination):
+    ordering = ("-received_at", "-id")
+    page_size = 100
+
+
 class MonitoringEventsView(APIView):
     authentication_classes = [JWTAuthentication, SessionAuthentication, BasicAuthentication]
     permission_classes = [IsAuthenticated]
@@ -307,11 +314,10 @@ class MonitoringEventsView(APIView):
     def get(self, request):
         from messaging.models import ProviderEvent
         from organizations.utils import get_current_org
-        from datetime import timedelta
+        from datetime import datetime, time, timedelta
 
         org = get_current_org(request)
-        limit = int(request.query_params.get("limit", 100))
-        today = timezone.now().date()
+        today = timezone.localdate()
         range_param = request.query_params.get("range", "today")
         if range_param == "7d":
             start_date = today - timedelta(days=7)
@@ -320,7 +326,15 @@ class MonitoringEventsView(APIView):
         else:
             start_date = today
 
-        events = ProviderEvent.objects.filter(organization=org, received_at__date__gte=start_date).order_by("-received_at")[:limit]
+        paginator = ProviderEventPagination()
+        events = paginator.paginate_queryset(
+            # a bare datetime bound (not __date) keeps the range on the (organization, received_at, id) index
+            ProviderEvent.objects.filter(
+                organization=org, received_at__gte=timezone.make_aware(datetime.combine(start_date, time.min))
+            ),
+            request,
+            view=self,
+        )
         data = [
             {
                 "id": event.id,
@@ -332,7 +346,7 @@ class MonitoringEventsView(APIView):
             }
             for event in events
         ]
-        return Response(data)
+        return paginator.get_paginated_response(data)
 
 
 class MonitoringAlertsView(APIView):
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_rename_notifications_org_created_idx_notificatio_organiz_b709e0_idx_and_more'),
+        ('organizations', '0005_apikey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificationrecipient',
+            index=models.Index(fields=['organization', 'user', 'created_at', 'id'], name='notif_rcpt_user_created_idx'),
+        ),
+    ]
@@ -62,6 +62,7 @@ class NotificationRecipient(models.Model):
         indexes = [
             models.Index(fields=["organization", "user", "read_at", "created_at"]),
             models.Index(fields=["organization", "user", "read_at"]),
+            models.Index(fields=["organization", "user", "created_at", "id"], name="notif_rcpt_user_created_idx"),
         ]
 
     def __str__(self):
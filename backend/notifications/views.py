@@ -8,6 +8,7 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from corbi.pagination import KeysetPagination
 from organizations.permissions import IsOrgMemberWithRole, IsOrgAdmin
 from organizations.utils import get_current_org
 
@@ -47,13 +48,10 @@ class NotificationViewSet(viewsets.ViewSet):
             qs = qs.filter(read_at__isnull=False)
         elif read == "false":
             qs = qs.filter(read_at__isnull=True)
-        page = int(request.query_params.get("page", 1))
-        page_size = int(request.query_params.get("page_size", 20))
-        start = (page - 1) * page_size
-        end = start + page_size
-        total = qs.count()
-        data = NotificationRecipientSerializer(qs[start:end], many=True).data
-        return Response({"results": data, "count": total, "page": page, "page_size": page_size})
+        paginator = KeysetPagination()
+        paginator.page_size = 20
+        page = paginator.paginate_queryset(qs, request, view=self)
+        return paginator.get_paginated_response(NotificationRecipientSerializer(page, many=True).data)
 
     @action(detail=False, methods=["post"], url_path="mark-all-read")
     def mark_all_read(self, request):
@@ -132,6 +132,7 @@ export function CampaignDetail() {
             <div className="flex justify-between"><span>Sent</span><span className="text-gray-900">{campaign.sent_count}</span></div>
             <div className="flex justify-between"><span>Delivered</span><span className="text-gray-900">{campaign.delivered_count}</span></div>
             <div className="flex justify-between"><span>Failed</span><span className="text-gray-900">{campaign.failed_count}</span></div>
+            <div className="flex justify-between"><span>Skipped</span><span className="text-gray-900">{campaign.skipped_count}</span></div>
             <div className="flex justify-between"><span>Estimated Cost</span><span className="text-gray-900">${Number(campaign.estimated_cost || 0).toFixed(3)}</span></div>
             {campaign.throttle_per_minute && (
               <div className="flex justify-between"><span>Throttle</span><span className="text-gray-900">{campaign.throttle_per_minute} msgs/min</span></div>
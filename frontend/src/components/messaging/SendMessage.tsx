@@ -22,6 +22,7 @@ import {
   sendWhatsAppMessage,
   WhatsAppMessage,
   fetchInstagramMessages,
+  watchMessages,
   sendInstagramMessage,
   InstagramMessage,
 } from '../../lib/api';
@@ -102,9 +103,8 @@ export function SendMessage() {
     load();
   }, []);
 
-  // Poll telegram messages for selected contact
+  // Load telegram messages for selected contact; refresh on push events
   useEffect(() => {
-    let timer: any;
     const poll = async () => {
       if (channel !== 'telegram' || !selectedTelegramContactId) return;
       setTelegramLoading(true);
@@ -119,17 +119,12 @@ export function SendMessage() {
       }
     };
     poll();
-    if (channel === 'telegram' && selectedTelegramContactId) {
-      timer = setInterval(poll, 3000);
-    }
-    return () => {
-      if (timer) clearInterval(timer);
-    };
+    const stop = channel === 'telegram' && selectedTelegramContactId ? watchMessages(selectedTelegramContactId, 'telegram', poll) : undefined;
+    return () => stop?.();
   }, [channel, selectedTelegramContactId]);
 
-  // Poll WhatsApp messages
+  // Load WhatsApp messages; refresh on push events
   useEffect(() => {
-    let timer: any;
     const poll = async () => {
       if (channel !== 'whatsapp' || !selectedWhatsAppContactId) return;
       setWhatsAppLoading(true);
@@ -144,17 +139,12 @@ export function SendMessage() {
       }
     };
     poll();
-    if (channel === 'whatsapp' && selectedWhatsAppContactId) {
-      timer = setInterval(poll, 3000);
-    }
-    return () => {
-      if (timer) clearInterval(timer);
-    };
+    const stop = channel === 'whatsapp' && selectedWhatsAppContactId ? watchMessages(selectedWhatsAppContactId, 'whatsapp', poll) : undefined;
+    return () => stop?.();
   }, [channel, selectedWhatsAppContactId]);
 
-  // Poll Instagram messages
+  // Load Instagram messages; refresh on push events
   useEffect(() => {
-    let timer: any;
     const poll = async () => {
       if (channel !== 'instagram' || !selectedInstagramContactId) return;
       setInstagramLoading(true);
@@ -169,12 +159,8 @@ export function SendMessage() {
       }
     };
     poll();
-    if (channel === 'instagram' && selectedInstagramContactId) {
-      timer = setInterval(poll, 3000);
-    }
-    return () => {
-      if (timer) clearInterval(timer);
-    };
+    const stop = channel === 'instagram' && selectedInstagramContactId ? watchMessages(selectedInstagramContactId, 'instagram', poll) : undefined;
+    return () => stop?.();
   }, [channel, selectedInstagramContactId]);
 
   const onboardedContacts = useMemo(
@@ -57,7 +57,7 @@ export function NotificationBell({ orgId, onNavigate }: Props) {
   const loadItems = async () => {
     setLoading(true);
     try {
-      const data = await fetchNotifications({ page: 1, page_size: 20 });
+      const data = await fetchNotifications({ page_size: 20 });
       setItems(data.results || []);
     } finally {
       setLoading(false);
@@ -28,7 +28,7 @@ export function NotificationList() {
     setLoading(true);
     try {
       const [list, summary] = await Promise.all([
-        fetchNotifications({ page: 1, page_size: 50 }),
+        fetchNotifications({ page_size: 50 }),
         fetchNotificationSummary(),
       ]);
       setItems(list.results || []);
@@ -75,6 +75,7 @@ export interface Campaign {
   delivered_count: number;
   read_count: number;
   failed_count: number;
+  skipped_count: number;
   unsubscribed_count: number;
   estimated_cost: number;
   status: string;
@@ -472,8 +473,8 @@ export async function deleteContact(id: number | string) {
 
 // Telegram onboarding
 export async function fetchTelegramOnboardingContacts(): Promise<Contact[]> {
-  const { data } = await api.get("/telegram/onboarding/");
-  return data;
+  const { data } = await api.get<CursorPage<Contact>>("/telegram/onboarding/?limit=200");
+  return data.results;
 }
 
 export async function generateTelegramInviteLink(contactId: number): Promise<{ link: string }> {
@@ -487,8 +488,9 @@ export async function sendTelegramInviteEmail(contactId: number): Promise<{ stat
 }
 
 export async function fetchTelegramMessages(contactId: number): Promise<TelegramMessage[]> {
-  const { data } = await api.get(`/telegram/messages/?contact_id=${contactId}`);
-  return data;
+  // newest page first; shown oldest -> newest
+  const { data } = await api.get<CursorPage<TelegramMessage>>(`/telegram/messages/?contact_id=${contactId}&limit=200`);
+  return [...data.results].reverse();
 }
 
 export async function sendTelegramMessage(
@@ -500,8 +502,9 @@ export async function sendTelegramMessage(
 }
 
 export async function fetchWhatsAppMessages(contactId: number): Promise<WhatsAppMessage[]> {
-  const { data } = await api.get(`/whatsapp/messages/?contact_id=${contactId}`);
-  return data;
+  // newest page first; shown oldest -> newest
+  const { data } = await api.get<CursorPage<WhatsAppMessage>>(`/whatsapp/messages/?contact_id=${contactId}&limit=200`);
+  return [...data.results].reverse();
 }
 
 export async function sendWhatsAppMessage(
@@ -513,8 +516,9 @@ export async function sendWhatsAppMessage(
 }
 
 export async function fetchInstagramMessages(contactId: number): Promise<InstagramMessage[]> {
-  const { data } = await api.get(`/instagram/messages/?contact_id=${contactId}`);
-  return data;
+  // newest page first; shown oldest -> newest
+  const { data } = await api.get<CursorPage<InstagramMessage>>(`/instagram/messages/?contact_id=${contactId}&limit=200`);
+  return [...data.results].reverse();
 }
 
 export async function sendInstagramMessage(contactId: number, payload: { text: string }): Promise<InstagramMessage> {
@@ -522,6 +526,62 @@ export async function sendInstagramMessage(contactId: number, payload: { text: s
   return data;
 }
 
+// Real-time message events (server-sent events)
+export interface RealtimeMessageEvent {
+  type: "message";
+  channel: string;
+  id: number;
+  contact_id: number;
+  direction: string;
+  text: string;
+  created_at: string;
+  message_type?: string;
+  status?: string;
+}
+
+// Calls `refresh` whenever a message for the contact arrives; falls back to polling when push is unavailable
+// or goes quiet (no message or ping within the server's heartbeat interval, e.g. a buffering proxy or WSGI server).
+export function watchMessages(contactId: number, channel: string, refresh: () => void, pollMs = 3000): () => void {
+  let source: EventSource | null = null;
+  let timer: ReturnType<typeof setInterval> | null = null;
+  let watchdog: ReturnType<typeof setTimeout> | null = null;
+  let stopped = false;
+  const fallback = () => {
+    source?.close();
+    if (watchdog) clearTimeout(watchdog);
+    if (!stopped && !timer) timer = setInterval(refresh, pollMs);
+  };
+  api
+    .post<{ url: string; heartbeat?: number }>("/realtime/token/")
+    .then(({ data }) => {
+      if (stopped) return;
+      // a little slack over the heartbeat for network jitter
+      const quietMs = ((data.heartbeat ?? 15) + 5) * 1000;
+      const alive = () => {
+        if (watchdog) clearTimeout(watchdog);
+        watchdog = setTimeout(fallback, quietMs);
+      };
+      source = new EventSource(`${data.url}&contact_id=${contactId}`);
+      alive();
+      source.addEventListener("ping", alive);
+      source.onmessage = (e) => {
+        alive();
+        const event: RealtimeMessageEvent = JSON.parse(e.data);
+        if (event.channel === channel) refresh();
+      };
+      source.onerror = () => {
+        if (source?.readyState === EventSource.CLOSED) fallback();
+      };
+    })
+    .catch(fallback);
+  return () => {
+    stopped = true;
+    source?.close();
+    if (watchdog) clearTimeout(watchdog);
+    if (timer) clearInterval(timer);
+  };
+}
+
 export async function fetchCampaigns(): Promise<Campaign[]> {
   const { data } = await api.get("/campaigns/");
   return data;
@@ -554,15 +614,15 @@ export async function fetchNotificationSummary(): Promise<NotificationSummary> {
 }
 
 export async function fetchNotifications(params?: {
-  page?: number;
   page_size?: number;
   type?: string[] | string;
   severity?: string[] | string;
   read?: "true" | "false" | "all";
-}): Promise<{ results: NotificationRecipient[]; count: number; page: number; page_size: number }> {
+  cursor?: string;
+}): Promise<CursorPage<NotificationRecipient>> {
   const query = new URLSearchParams();
-  if (params?.page) query.set("page", String(params.page));
-  if (params?.page_size) query.set("page_size", String(params.page_size));
+  if (params?.cursor) query.set("cursor", params.cursor);
+  if (params?.page_size) query.set("limit", String(params.page_size));
   if (params?.type) {
     const types = Array.isArray(params.type) ? params.type : [params.type];
     types.forEach((t) => query.append("type", t));
@@ -721,15 +781,45 @@ export async function uploadEmailAttachment(file: File): Promise<{ id: number; f
   return data;
 }
 
-export async function uploadTelegramAttachment(file: File): Promise<{ id: number; filename: string; size: number; content_type: string }> {
-  const form = new FormData();
-  form.append("file", file);
-  const { data } = await api.post("/telegram/attachments/", form, {
-    headers: { "Content-Type": "multipart/form-data" },
+const UPLOAD_CHUNK_SIZE = 2 * 1024 * 1024;
+
+// Chunked, resumable upload: a failed chunk is retried from the server's `received` offset.
+export async function uploadAttachmentResumable(
+  file: File,
+  channel = "",
+  onProgress?: (received: number, size: number) => void,
+): Promise<{ id: number; filename: string; size: number; content_type: string }> {
+  const { data: session } = await api.post("/attachment-uploads/", {
+    filename: file.name,
+    content_type: file.type,
+    size: file.size,
+    channel,
   });
+  let received = 0;
+  let failures = 0;
+  while (received < file.size) {
+    const end = Math.min(received + UPLOAD_CHUNK_SIZE, file.size) - 1;
+    try {
+      const { data } = await api.put(`/attachment-uploads/${session.id}/`, file.slice(received, end + 1), {
+        headers: { "Content-Type": "application/octet-stream", "Content-Range": `bytes ${received}-${end}/${file.size}` },
+      });
+      received = data.received;
+      failures = 0;
+    } catch (err) {
+      if (++failures > 3) throw err;
+      const { data } = await api.get(`/attachment-uploads/${session.id}/`);
+      received = data.received;
+    }
+    onProgress?.(received, file.size);
+  }
+  const { data } = await api.post(`/attachment-uploads/${session.id}/complete/`);
   return data;
 }
 
+export async function uploadTelegramAttachment(file: File): Promise<{ id: number; filename: string; size: number; content_type: string }> {
+  return uploadAttachmentResumable(file, "telegram");
+}
+
 export async function fetchEmailJob(id: number): Promise<EmailJob> {
   const { data } = await api.get(`/email-jobs/${id}/`);
   return data;
@@ -741,13 +831,13 @@ export async function retryEmailJob(id: number): Promise<{ status: string }> {
 }
 
 export async function fetchOutbound(): Promise<OutboundMessage[]> {
-  const { data } = await api.get("/outbound/");
-  return data;
+  const { data } = await api.get<CursorPage<OutboundMessage>>("/outbound/?limit=200");
+  return data.results;
 }
 
 export async function fetchInbound(): Promise<InboundMessage[]> {
-  const { data } = await api.get("/inbound/");
-  return data;
+  const { data } = await api.get<CursorPage<InboundMessage>>("/inbound/?limit=200");
+  return data.results;
 }
 
 export async function replyToInbound(id: number | string, payload: { channel?: string; body: string }) {
@@ -760,6 +850,14 @@ export async function linkInboundContact(id: number | string, payload: { contact
   return data;
 }
 
+// keyset-paginated list endpoints: follow next_cursor (or next) for older rows
+export interface CursorPage<T> {
+  next: string | null;
+  next_cursor: string | null;
+  count?: number;
+  results: T[];
+}
+
 export interface Paginated<T> {
   count: number;
   next: string | null;
@@ -812,7 +910,7 @@ export async function fetchMonitoringDetails(range: string = "today"): Promise<{
 
 export async function fetchMonitoringEvents(limit = 50) {
   const { data } = await api.get(`/monitoring/events/?limit=${limit}`);
-  return data;
+  return data.results;
 }
 
 export async function fetchMonitoringAlerts(limit = 20) {